@@ -0,0 +1,195 @@
+"""
+公共目录接口的共享响应缓存
+
+热门、最新、相似小说和无筛选条件的搜索对所有访客返回相同的内容，每次请求都重新查询数据库并用 NovelSerializer 序列化。
+这里把渲染好的 JSON 字节按 (接口, 归一化后的参数) 缓存在 Django 的 'responses' 缓存中：
+- 默认使用文件缓存（FileBasedCache），同一台机器上的所有工作进程共享；也可以配置为 memcached/redis 等
+- 缓存键带有目录版本号，小说上下架、导入、离线任务换代时 invalidate_catalog() 更换版本号，
+  旧条目随 TTL 过期，不需要逐个删除
+- 收藏、评分只改变单本小说的计数，invalidate_novel() 只删除该小说的卡片和相似列表，
+  列表类接口（热门、最新、搜索）不失效，靠 TTL 刷新
+- 单飞（single-flight）：同一个键在进程内由一把锁串行化，跨进程用 cache.add() 抢占构建标记，
+  没抢到的请求轮询等待结果，避免缓存失效瞬间大量请求同时查询数据库
+
+只缓存 200 响应。阅读量和 updated_at 随详情页浏览变化，不触发失效，靠较短的 TTL 刷新。
+
+相似小说接口按小说缓存ID列表（recommendations/similar.py），小说数据来自卡片缓存（novels/cards.py），
+两者使用同一个缓存和目录版本号，进程内的 LocalLRU 放在共享缓存前面。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+CACHE_ALIAS = 'responses'
+VERSION_KEY = 'catalog:version'
+# 按小说缓存的条目（novels/cards.py 的卡片、recommendations/similar.py 的相似列表）的键前缀
+CARD_PREFIX = 'card'
+SIMILAR_PREFIX = 'similar'
+# 构建标记的过期时间（秒），构建进程崩溃时其他请求最多等待这么久
+BUILD_LOCK_TIMEOUT = 10
+# 等待其他进程构建结果的最长时间（秒），超时后自行构建
+WAIT_TIMEOUT = 2.0
+POLL_INTERVAL = 0.05
+
+_LOCK_STRIPES = [threading.Lock() for _ in range(64)]
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def catalog_version() -> str:
+    """当前的目录版本号（一次共享缓存读取）；需要生成多个键时读取一次后传给 catalog_key"""
+    version = _cache().get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        # 其他进程可能同时初始化，以先写入的为准
+        if not _cache().add(VERSION_KEY, version, timeout=None):
+            version = _cache().get(VERSION_KEY) or version
+    return version
+
+
+def invalidate_catalog():
+    """使所有已缓存的目录响应失效（更换版本号）"""
+    _cache().set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_catalog_on_commit():
+    """在当前事务提交后使目录响应失效（没有事务时立即执行）"""
+    transaction.on_commit(invalidate_catalog)
+
+
+def catalog_key(*parts, version: str | None = None) -> str:
+    """带目录版本号的缓存键，invalidate_catalog() 之后自动失效
+
+    Args:
+        version: catalog_version() 的结果；为 None 时读取一次
+    """
+    if version is None:
+        version = catalog_version()
+    return ':'.join(['catalog', version, *map(str, parts)])
+
+
+def invalidate_novel(novel_id):
+    """只删除一本小说的卡片和相似列表（收藏数、评分变化时）"""
+    version = catalog_version()
+    _cache().delete_many([
+        catalog_key(CARD_PREFIX, novel_id, version=version),
+        catalog_key(SIMILAR_PREFIX, novel_id, version=version),
+    ])
+
+
+def invalidate_novel_on_commit(novel_id):
+    """在当前事务提交后删除一本小说的缓存条目（没有事务时立即执行）"""
+    transaction.on_commit(lambda: invalidate_novel(novel_id))
+
+
+def response_cache():
+    """共享的 'responses' 缓存"""
+    return _cache()
+
+
+class LocalLRU:
+    """进程内的 LRU 缓存（线程安全），条目在 ttl 秒后过期
+
+    放在共享缓存前面，最热的条目不需要每次读取共享缓存
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def cache_key(endpoint: str, params: dict) -> str:
+    query = urlencode(sorted((key, str(value)) for key, value in params.items()))
+    digest = hashlib.sha1(f'{endpoint}?{query}'.encode('utf-8')).hexdigest()
+    return f'resp:{catalog_version()}:{digest}'
+
+
+def _json_response(body: bytes, hit: bool) -> HttpResponse:
+    response = HttpResponse(body, content_type='application/json')
+    response['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response
+
+
+def cached_response(endpoint: str, params: dict, view: Callable[[], Response]) -> HttpResponse | Response:
+    """返回 view() 的响应，200 响应以渲染好的 JSON 字节缓存 RESPONSE_CACHE_TTL 秒
+
+    Args:
+        endpoint: 接口名，与 params 一起组成缓存键
+        params: 影响响应内容的参数（已归一化，例如已经过 limit 的范围限制）
+        view: 生成响应的函数，未命中缓存时调用
+    """
+    ttl = getattr(settings, 'RESPONSE_CACHE_TTL', 0)
+    if ttl <= 0:
+        return view()
+
+    cache = _cache()
+    key = cache_key(endpoint, params)
+    body = cache.get(key)
+    if body is not None:
+        return _json_response(body, hit=True)
+
+    with _LOCK_STRIPES[hash(key) % len(_LOCK_STRIPES)]:
+        body = cache.get(key)
+        if body is not None:
+            return _json_response(body, hit=True)
+
+        lock_key = f'{key}:building'
+        owner = cache.add(lock_key, 1, timeout=BUILD_LOCK_TIMEOUT)
+        if not owner:
+            deadline = time.monotonic() + WAIT_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL)
+                body = cache.get(key)
+                if body is not None:
+                    return _json_response(body, hit=True)
+
+        try:
+            response = view()
+            if response.status_code != 200:
+                return response
+            body = JSONRenderer().render(response.data)
+            cache.set(key, body, timeout=ttl)
+        finally:
+            if owner:
+                cache.delete(lock_key)
+    return _json_response(body, hit=False)
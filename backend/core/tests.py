@@ -1,9 +1,21 @@
 from __future__ import annotations
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
+from analytics.models import SearchEvent
 from core.pagination import paginate_queryset
+from core.response_cache import invalidate_catalog
 from core.responses import api_ok, api_error
+from novels.models import Novel
+from users.models import User
+
+
+# 测试使用进程内缓存，不读写开发环境的文件响应缓存
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "responses": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "responses"},
+}
 
 
 class PaginationTests(TestCase):
@@ -40,3 +52,85 @@ class ResponsesTests(TestCase):
         self.assertEqual(resp.status_code, 400)
         self.assertFalse(resp.data["success"])
         self.assertEqual(resp.data["message"], "Something failed")
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ResponseCacheTests(TestCase):
+    """公共目录接口的共享响应缓存"""
+
+    def setUp(self):
+        invalidate_catalog()
+        self.client = APIClient()
+        self.novels = [
+            Novel.objects.create(title=f"缓存小说{i}", author="作者", category="玄幻", favorites_count=i)
+            for i in range(3)
+        ]
+
+    def test_hit_after_miss(self):
+        first = self.client.get("/api/recommendations/latest", {"limit": 3})
+        second = self.client.get("/api/recommendations/latest", {"limit": 3})
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(len(second.json()["data"]), 3)
+
+        # limit 不同是不同的缓存条目
+        self.assertEqual(self.client.get("/api/recommendations/latest", {"limit": 2})["X-Cache"], "MISS")
+
+    def test_filtered_search_not_cached(self):
+        self.client.get("/api/novels/search", {"q": "缓存"})
+        resp = self.client.get("/api/novels/search", {"q": "缓存"})
+        self.assertNotIn("X-Cache", resp)
+
+        self.client.get("/api/novels/search", {"page": 1})
+        resp = self.client.get("/api/novels/search", {"page": 1})
+        self.assertEqual(resp["X-Cache"], "HIT")
+        # 命中缓存时仍记录搜索事件
+        self.assertEqual(SearchEvent.objects.count(), 4)
+
+    def test_invalidated_by_status_change(self):
+        self.client.get("/api/novels/search")
+        novel = self.novels[0]
+        novel.status = "shelved"
+        with self.captureOnCommitCallbacks(execute=True):
+            novel.save(update_fields=["status"])
+        resp = self.client.get("/api/novels/search")
+        self.assertEqual(resp["X-Cache"], "MISS")
+        self.assertEqual(resp.json()["data"]["total"], 2)
+
+    def test_favorite_invalidates_only_that_novel(self):
+        self.client.get("/api/novels/search")
+        self.client.get("/api/recommendations/home", {"sections": "latest"})
+
+        user = User.objects.create_user(email="cache@test.com", password="testpass123", username="cache")
+        self.client.force_authenticate(user=user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/novels/{self.novels[1].id}/favorite")
+
+        # 列表接口不失效，随 TTL 刷新
+        self.assertEqual(self.client.get("/api/novels/search")["X-Cache"], "HIT")
+        # 只重新读取这本小说的卡片
+        with self.assertNumQueries(1):
+            novels = self.client.get("/api/recommendations/home", {"sections": "latest"}).json()["data"]["novels"]
+        self.assertEqual(novels[str(self.novels[1].id)]["favorites"], 2)
+        self.assertEqual(novels[str(self.novels[2].id)]["favorites"], 2)
+
+    def test_cards_read_version_once(self):
+        from unittest import mock
+
+        from core import response_cache
+        from novels.cards import novel_cards
+
+        version = mock.Mock(wraps=response_cache.catalog_version)
+        with mock.patch("novels.cards.catalog_version", version), mock.patch.object(
+            response_cache, "catalog_version", version
+        ):
+            cards = novel_cards(str(novel.id) for novel in self.novels)
+        self.assertEqual(len(cards), 3)
+        self.assertEqual(version.call_count, 1)
+
+    @override_settings(RESPONSE_CACHE_TTL=0)
+    def test_disabled(self):
+        self.client.get("/api/recommendations/hot")
+        resp = self.client.get("/api/recommendations/hot")
+        self.assertNotIn("X-Cache", resp)
@@ -42,6 +42,7 @@ urlpatterns = [
     path("recommendations/personalized", recommendations_api.personalized),
     path("recommendations/hot", recommendations_api.hot),
     path("recommendations/latest", recommendations_api.latest),
+    path("recommendations/home", recommendations_api.home),
     path("recommendations/similar/<str:novelId>", recommendations_api.similar_novels),
 
     # Admin
@@ -7,10 +7,12 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 
 from core.pagination import paginate_queryset
+from core.response_cache import invalidate_novel_on_commit
 from core.responses import api_error, api_ok
 from interactions.models import Comment, Favorite, Rating, ReadHistory
 from interactions.serializers import CommentSerializer, CommentThreadSerializer, ReadHistorySerializer
 from novels.models import Novel
+from recommendations.refresh import notify_interaction
 
 
 @api_view(["POST", "DELETE"])
@@ -26,17 +28,23 @@ def favorite_toggle(request, novelId: str):
         if request.method == "POST":
             if fav.deleted_at is not None:
                 fav.deleted_at = None
-                fav.save(update_fields=["deleted_at"])
+                fav.save(update_fields=["deleted_at", "updated_at"])
                 Novel.objects.filter(id=novel.id).update(favorites_count=F("favorites_count") + 1)
+                invalidate_novel_on_commit(novel.id)
+                notify_interaction(request.user.id)
             elif created:
                 Novel.objects.filter(id=novel.id).update(favorites_count=F("favorites_count") + 1)
+                invalidate_novel_on_commit(novel.id)
+                notify_interaction(request.user.id)
             return api_ok({"success": True})
 
         # DELETE
         if fav.deleted_at is None:
             fav.deleted_at = timezone.now()
-            fav.save(update_fields=["deleted_at"])
+            fav.save(update_fields=["deleted_at", "updated_at"])
             Novel.objects.filter(id=novel.id, favorites_count__gt=0).update(favorites_count=F("favorites_count") - 1)
+            invalidate_novel_on_commit(novel.id)
+            notify_interaction(request.user.id)
         return api_ok({"success": True})
 
 
@@ -65,6 +73,9 @@ def rate_novel(request, novelId: str):
             avg_rating=float(agg["avg"] or 0),
             updated_at=timezone.now(),
         )
+        # 只删除这本小说的卡片缓存，热门/最新/搜索列表随 TTL 刷新
+        invalidate_novel_on_commit(novel.id)
+        notify_interaction(request.user.id)
 
     return api_ok({"success": True})
 
@@ -196,6 +207,7 @@ def read_history(request):
     if progress_value is not None:
         history.progress = progress_value
     history.save()
+    notify_interaction(request.user.id)
 
     return api_ok({"historyId": str(history.id), "created": created})
 
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0004_rename_interaction_user_la_46f3fd_idx_interaction_user_id_35ac5d_idx'),
+        ('novels', '0003_add_source_url'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['updated_at'], name='interaction_updated_b467ae_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['updated_at'], name='interaction_updated_5692b6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='readhistory',
+            index=models.Index(fields=['last_read_at'], name='interaction_last_re_fd2496_idx'),
+        ),
+    ]
@@ -13,6 +13,7 @@ class Favorite(models.Model):
 	user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 	novel = models.ForeignKey(Novel, on_delete=models.CASCADE)
 	created_at = models.DateTimeField(auto_now_add=True)
+	updated_at = models.DateTimeField(auto_now=True)
 	deleted_at = models.DateTimeField(blank=True, null=True)
 
 	class Meta:
@@ -22,6 +23,7 @@ class Favorite(models.Model):
 		indexes = [
 			models.Index(fields=["user", "deleted_at"]),
 			models.Index(fields=["novel", "deleted_at"]),
+			models.Index(fields=["updated_at"]),
 		]
 
 
@@ -37,6 +39,9 @@ class Rating(models.Model):
 		constraints = [
 			models.UniqueConstraint(fields=["user", "novel"], name="uq_rating_user_novel"),
 		]
+		indexes = [
+			models.Index(fields=["updated_at"]),
+		]
 
 
 class Comment(models.Model):
@@ -71,4 +76,5 @@ class ReadHistory(models.Model):
 		]
 		indexes = [
 			models.Index(fields=["user", "last_read_at"]),
+			models.Index(fields=["last_read_at"]),
 		]
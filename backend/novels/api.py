@@ -7,6 +7,7 @@ from rest_framework.permissions import AllowAny
 
 from analytics.models import NovelViewEvent, SearchEvent
 from core.pagination import paginate_queryset
+from core.response_cache import cached_response
 from core.responses import api_error, api_ok
 from interactions.models import Favorite, Rating
 from novels.models import Novel
@@ -62,15 +63,21 @@ def search_novels(request):
         },
     )
 
-    result = paginate_queryset(qs, page=page, page_size=page_size)
-    return api_ok(
-        {
-            "items": NovelSerializer(result.items, many=True).data,
-            "total": result.total,
-            "page": result.page,
-            "pageSize": result.page_size,
-        }
-    )
+    def build():
+        result = paginate_queryset(qs, page=page, page_size=page_size)
+        return api_ok(
+            {
+                "items": NovelSerializer(result.items, many=True).data,
+                "total": result.total,
+                "page": result.page,
+                "pageSize": result.page_size,
+            }
+        )
+
+    if q or title or author or category or tag:
+        return build()
+    # 无筛选条件的浏览页对所有访客相同，走共享响应缓存（搜索事件照常记录）
+    return cached_response("search", {"sort": sort, "page": page, "pageSize": page_size}, build)
 
 
 @api_view(["GET"])
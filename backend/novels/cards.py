@@ -0,0 +1,53 @@
+"""
+小说卡片缓存
+
+列表类接口（相似小说、首页等）返回的每本小说都是同一份 NovelSerializer 输出（卡片）。
+这里按小说ID把卡片缓存在共享的 'responses' 缓存中（键带目录版本号，随 invalidate_catalog() 整体失效，
+收藏、评分变化时由 invalidate_novel() 单独删除），
+一次 get_many 读取全部卡片，只有未命中的小说才用一条 SQL 读取并序列化。
+"""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+from django.conf import settings
+
+from core.response_cache import CARD_PREFIX, catalog_key, catalog_version, response_cache
+from novels.models import Novel
+from novels.serializers import NovelSerializer
+
+
+def _serialize(novel_ids: list[str]) -> dict[str, dict]:
+    novels = list(Novel.objects.filter(id__in=novel_ids, status="published"))
+    return {str(novel.id): card for novel, card in zip(novels, NovelSerializer(novels, many=True).data)}
+
+
+def novel_cards(novel_ids: Iterable[str]) -> dict[str, dict]:
+    """按小说ID返回已发布小说的卡片，不存在或未发布的小说不在结果中"""
+    novel_ids = list(dict.fromkeys(str(novel_id) for novel_id in novel_ids))
+    if not novel_ids:
+        return {}
+    ttl = getattr(settings, "RESPONSE_CACHE_TTL", 0)
+    if ttl <= 0:
+        return _serialize(novel_ids)
+
+    cache = response_cache()
+    version = catalog_version()
+    keys = {novel_id: catalog_key(CARD_PREFIX, novel_id, version=version) for novel_id in novel_ids}
+    found = cache.get_many(keys.values())
+    cards = {novel_id: found[key] for novel_id, key in keys.items() if key in found}
+
+    missing = [novel_id for novel_id in novel_ids if novel_id not in cards]
+    if missing:
+        fresh = _serialize(missing)
+        cache.set_many({keys[novel_id]: card for novel_id, card in fresh.items()}, timeout=ttl)
+        cards.update(fresh)
+    return cards
+
+
+def cards_in_order(novel_ids: Iterable[str]) -> list[dict]:
+    """按 novel_ids 的顺序返回卡片列表，跳过不存在或未发布的小说"""
+    novel_ids = [str(novel_id) for novel_id in novel_ids]
+    cards = novel_cards(novel_ids)
+    return [cards[novel_id] for novel_id in novel_ids if novel_id in cards]
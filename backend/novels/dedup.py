@@ -0,0 +1,179 @@
+"""
+小说近似重复检测（MinHash + LSH）
+
+导入数据只按 source_book_id 生成确定性的 UUID，同一本书换了来源ID、标题多了空格或简介略有改动时
+会被当成不同的小说重复导入。这里把 标题 / 作者 / 简介 归一化后切成字符 k-gram，
+用 MinHash 签名近似两本小说 k-gram 集合的 Jaccard 相似度，再按 LSH 分段建桶：
+- 每插入或查询一条记录只需要查 bands 个桶，与目录规模无关（亚线性），可以在导入时流式处理
+- 只对落入同一个桶的候选比较签名，估计的相似度不低于阈值才算重复
+
+字符 k-gram 不依赖分词，对中文标题和简介同样适用。
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+from typing import Hashable, Iterable
+
+import numpy as np
+
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 16
+DEFAULT_THRESHOLD = 0.8
+SHINGLE_SIZE = 3
+
+# 大于 2^32 的素数；系数小于 2^31，a * x + b 不会超出 uint64
+_PRIME = np.uint64((1 << 32) + 15)
+_MAX_COEFFICIENT = 1 << 31
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize_text(text: str | None) -> str:
+    """全角转半角、转小写，去掉空白和标点"""
+    if not text:
+        return ''
+    return _NON_WORD.sub('', unicodedata.normalize('NFKC', text).lower())
+
+
+def shingles(title: str | None, author: str | None, intro: str | None, k: int = SHINGLE_SIZE) -> set[int]:
+    """小说文本 -> 字符 k-gram 的哈希集合（CRC32）
+
+    标题和作者较短，整体各加一个元素，保证简介为空时也有可比较的内容
+    """
+    fields = [normalize_text(title), normalize_text(author), normalize_text(intro)]
+    result = {zlib.crc32(f'{i}:{field}'.encode('utf-8')) for i, field in enumerate(fields[:2]) if field}
+    text = '|'.join(fields)
+    for start in range(max(len(text) - k + 1, 1)):
+        result.add(zlib.crc32(text[start:start + k].encode('utf-8')))
+    return result
+
+
+class MinHasher:
+    """MinHash 签名：num_perm 个随机线性哈希 (a * x + b) mod p 在集合上的最小值"""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, _MAX_COEFFICIENT, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MAX_COEFFICIENT, num_perm, dtype=np.uint64)
+
+    def signature(self, values: set[int]) -> np.ndarray:
+        if not values:
+            return np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        x = np.fromiter(values, dtype=np.uint64, count=len(values))
+        hashed = (np.outer(x, self._a) + self._b) % _PRIME
+        return hashed.min(axis=0)
+
+
+def estimate_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """两个签名相同位置取值相等的比例，即 Jaccard 相似度的估计"""
+    return float(np.count_nonzero(a == b)) / a.size
+
+
+class LSHIndex:
+    """把签名分成 bands 段，任意一段完全相同的记录互为候选
+
+    每段 rows = num_perm / bands 个值，Jaccard 相似度为 s 的两条记录成为候选的概率为
+    1 - (1 - s^rows)^bands，默认 128 / 16 时约在 s = 0.7 处陡增
+    """
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, bands: int = DEFAULT_BANDS):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets: list[dict[bytes, list[Hashable]]] = [defaultdict(list) for _ in range(bands)]
+        self.signatures: dict[Hashable, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def _band_keys(self, signature: np.ndarray) -> Iterable[tuple[int, bytes]]:
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def insert(self, key: Hashable, signature: np.ndarray):
+        self.signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band][band_key].append(key)
+
+    def candidates(self, signature: np.ndarray) -> set[Hashable]:
+        found = set()
+        for band, band_key in self._band_keys(signature):
+            found.update(self._buckets[band].get(band_key, ()))
+        return found
+
+    def query(self, signature: np.ndarray, threshold: float) -> list[tuple[Hashable, float]]:
+        """估计相似度不低于 threshold 的已插入记录，按相似度从高到低排序"""
+        matches = []
+        for key in self.candidates(signature):
+            similarity = estimate_similarity(signature, self.signatures[key])
+            if similarity >= threshold:
+                matches.append((key, similarity))
+        matches.sort(key=lambda item: item[1], reverse=True)
+        return matches
+
+
+class DuplicateDetector:
+    """流式近似重复检测：逐条检查并加入索引，返回与之前记录的最佳匹配"""
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        num_perm: int = DEFAULT_NUM_PERM,
+        bands: int = DEFAULT_BANDS,
+    ):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.index = LSHIndex(num_perm, bands)
+
+    def signature(self, title: str | None, author: str | None, intro: str | None) -> np.ndarray:
+        return self.hasher.signature(shingles(title, author, intro))
+
+    def add(self, key: Hashable, title: str | None, author: str | None, intro: str | None):
+        """只加入索引，不检查（例如已有目录中的小说）"""
+        self.index.insert(key, self.signature(title, author, intro))
+
+    def check(
+        self,
+        key: Hashable,
+        title: str | None,
+        author: str | None,
+        intro: str | None,
+        add: bool = True,
+    ) -> tuple[Hashable, float] | None:
+        """查找与之前记录的最佳匹配
+
+        Args:
+            key: 记录的标识（如小说ID），与自身同 key 的已有记录不算重复（重复导入同一本书）
+            add: 检查后把该记录加入索引
+
+        Returns:
+            (匹配记录的 key, 估计的相似度)；没有达到阈值的记录时返回 None
+        """
+        signature = self.signature(title, author, intro)
+        match = next(
+            ((other, similarity) for other, similarity in self.index.query(signature, self.threshold) if other != key),
+            None,
+        )
+        if add and key not in self.index.signatures:
+            self.index.insert(key, signature)
+        return match
+
+
+def add_catalog(detector: DuplicateDetector, chunk_size: int = 2000) -> int:
+    """把数据库中已有的小说流式加入索引（key 为小说ID字符串），返回加入的数量"""
+    from novels.models import Novel
+
+    rows = Novel.objects.exclude(status='deleted').order_by('created_at', 'id').values_list(
+        'id', 'title', 'author', 'intro'
+    )
+    count = 0
+    for novel_id, title, author, intro in rows.iterator(chunk_size=chunk_size):
+        detector.add(str(novel_id), title, author, intro)
+        count += 1
+    return count
@@ -0,0 +1,56 @@
+"""
+热度分数（Novel.hot_score）
+
+热度 = 0.5 · 收藏数 + 0.3 · 阅读量 + 0.2 · 平均评分，各项按已发布小说中的最小/最大值归一化到 [0, 1]。
+分数存放在带索引的 hot_score 列中，热门接口按索引顺序读取前 N 条；
+由 refresh_hot_scores 命令（或定时任务）定期重算：一次聚合求最小/最大值，再用一条 UPDATE 语句在数据库中整体计算，
+之后使目录接口的响应缓存失效。
+QuerySet.update() 不会修改 updated_at，刷新热度不影响“最新”排序和内容推荐的增量水位线。
+"""
+
+from __future__ import annotations
+
+from django.db.models import ExpressionWrapper, F, FloatField, Max, Min, Value
+
+FAVORITES_WEIGHT = 0.5
+VIEWS_WEIGHT = 0.3
+RATING_WEIGHT = 0.2
+
+
+def _normalized(field: str, low, high):
+    span = (high or 0) - (low or 0)
+    if span == 0:
+        return Value(0.0)
+    return ExpressionWrapper((F(field) - Value(low)) / Value(span), output_field=FloatField())
+
+
+def refresh_hot_scores() -> int:
+    """重算全部已发布小说的热度分数，未发布的小说置为 0
+
+    Returns:
+        更新的已发布小说数量
+    """
+    from novels.models import Novel
+
+    published = Novel.objects.filter(status='published')
+    stats = published.aggregate(
+        fav_min=Min('favorites_count'),
+        fav_max=Max('favorites_count'),
+        view_min=Min('views'),
+        view_max=Max('views'),
+        rating_min=Min('avg_rating'),
+        rating_max=Max('avg_rating'),
+    )
+    hot_score = ExpressionWrapper(
+        Value(FAVORITES_WEIGHT) * _normalized('favorites_count', stats['fav_min'], stats['fav_max'])
+        + Value(VIEWS_WEIGHT) * _normalized('views', stats['view_min'], stats['view_max'])
+        + Value(RATING_WEIGHT) * _normalized('avg_rating', stats['rating_min'], stats['rating_max']),
+        output_field=FloatField(),
+    )
+    updated = published.update(hot_score=hot_score)
+    Novel.objects.exclude(status='published').exclude(hot_score=0).update(hot_score=0)
+
+    # 热门接口的响应缓存按旧分数排序
+    from core.response_cache import invalidate_catalog
+    invalidate_catalog()
+    return updated
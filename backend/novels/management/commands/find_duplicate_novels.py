@@ -0,0 +1,102 @@
+"""
+检测目录中近似重复的小说（MinHash + LSH，见 novels/dedup.py）
+
+用法：
+    python manage.py find_duplicate_novels                      # 列出疑似重复的小说
+    python manage.py find_duplicate_novels --threshold=0.9      # 只报告估计相似度不低于 0.9 的
+    python manage.py find_duplicate_novels --output=dups.csv    # 同时写入 CSV
+    python manage.py find_duplicate_novels --shelve             # 把后入库的重复小说下架
+
+按入库时间顺序流式处理一遍，每本小说只与之前入库的小说比较：先入库的视为原本，后入库的视为重复。
+"""
+
+import csv
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from core.response_cache import invalidate_catalog
+from novels.dedup import DEFAULT_BANDS, DEFAULT_NUM_PERM, DEFAULT_THRESHOLD, DuplicateDetector
+from novels.models import Novel
+
+CHUNK_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = '用 MinHash + LSH 检测目录中近似重复的小说（标题/作者/简介）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help='估计的 Jaccard 相似度不低于该值视为重复'
+        )
+        parser.add_argument(
+            '--num-perm',
+            type=int,
+            default=DEFAULT_NUM_PERM,
+            help='MinHash 签名长度'
+        )
+        parser.add_argument(
+            '--bands',
+            type=int,
+            default=DEFAULT_BANDS,
+            help='LSH 分段数（须整除签名长度；越大召回越高、候选越多）'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='把重复对写入该 CSV 文件'
+        )
+        parser.add_argument(
+            '--shelve',
+            action='store_true',
+            help='把重复小说（后入库的一方）的状态改为 shelved'
+        )
+
+    def handle(self, *args, **options):
+        detector = DuplicateDetector(options['threshold'], options['num_perm'], options['bands'])
+
+        rows = Novel.objects.exclude(status='deleted').order_by('created_at', 'id').values_list(
+            'id', 'title', 'author', 'intro'
+        )
+        titles: dict[str, tuple[str, str]] = {}
+        duplicates: list[tuple[str, str, float]] = []
+        scanned = 0
+        for novel_id, title, author, intro in rows.iterator(chunk_size=CHUNK_SIZE):
+            novel_id = str(novel_id)
+            titles[novel_id] = (title, author)
+            match = detector.check(novel_id, title, author, intro)
+            if match is not None:
+                original_id, similarity = match
+                duplicates.append((novel_id, original_id, similarity))
+            scanned += 1
+
+        for novel_id, original_id, similarity in duplicates:
+            self.stdout.write(
+                f'{"/".join(titles[novel_id])} ({novel_id}) ~ {"/".join(titles[original_id])} ({original_id}) '
+                f'similarity={similarity:.2f}'
+            )
+
+        if options['output']:
+            with Path(options['output']).open('w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['novel_id', 'title', 'author', 'original_id', 'original_title', 'original_author', 'similarity'])
+                for novel_id, original_id, similarity in duplicates:
+                    writer.writerow([novel_id, *titles[novel_id], original_id, *titles[original_id], f'{similarity:.4f}'])
+
+        if options['shelve'] and duplicates:
+            duplicate_ids = [novel_id for novel_id, _, _ in duplicates]
+            shelved = 0
+            for start in range(0, len(duplicate_ids), CHUNK_SIZE):
+                shelved += Novel.objects.filter(
+                    id__in=duplicate_ids[start:start + CHUNK_SIZE], status='published'
+                ).update(status='shelved')
+            # QuerySet.update() 不发送信号，手动使目录响应缓存失效
+            if shelved:
+                invalidate_catalog()
+            self.stdout.write(self.style.WARNING(f'Shelved {shelved} duplicate novels'))
+
+        self.stdout.write(self.style.SUCCESS(f'Scanned {scanned} novels, found {len(duplicates)} near-duplicates'))
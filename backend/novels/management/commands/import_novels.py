@@ -10,6 +10,8 @@ import logging
 from django.core.management.base import BaseCommand
 from django.db import connection, transaction
 
+from core.response_cache import invalidate_catalog
+from novels.dedup import DEFAULT_THRESHOLD, DuplicateDetector
 from novels.models import Novel
 
 logger = logging.getLogger(__name__)
@@ -31,10 +33,23 @@ class Command(BaseCommand):
             default=0,
             help='限制导入数量（0表示全部）'
         )
+        parser.add_argument(
+            '--dedup',
+            choices=['off', 'flag', 'skip'],
+            default='flag',
+            help='近似重复检测（标题/作者/简介的 MinHash + LSH）：flag 只报告，skip 不导入重复的行'
+        )
+        parser.add_argument(
+            '--dedup-threshold',
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help='估计的 Jaccard 相似度不低于该值视为重复'
+        )
 
     def handle(self, *args, **options):
         batch_size = options['batch_size']
         limit = options['limit']
+        dedup = options['dedup']
 
         self.stdout.write(self.style.NOTICE('Starting novel data import...'))
 
@@ -61,15 +76,29 @@ class Command(BaseCommand):
 
         self.stdout.write(f'Found {len(rows)} novels to import')
 
-        # 批量导入
+        # 批量导入（目标表为空，只需与之前的行比较）
+        detector = DuplicateDetector(threshold=options['dedup_threshold']) if dedup != 'off' else None
         batch = []
         imported = 0
+        duplicates = 0
 
         for row in rows:
             (source_book_id, title, author, category, intro, tags_json,
              favorites_count, views_proxy, status, updated_at,
              rating_count, avg_rating, created_at) = row
 
+            if detector is not None:
+                match = detector.check(source_book_id, title, author, intro)
+                if match is not None:
+                    duplicates += 1
+                    original_id, similarity = match
+                    self.stdout.write(self.style.WARNING(
+                        f'Possible duplicate: {title}/{author} (source {source_book_id}) '
+                        f'~ source {original_id} (similarity {similarity:.2f})'
+                    ))
+                    if dedup == 'skip':
+                        continue
+
             # 解析 tags
             tags = []
             if tags_json:
@@ -115,4 +144,9 @@ class Command(BaseCommand):
                 Novel.objects.bulk_create(batch)
             imported += len(batch)
 
+        # bulk_create 不发送 post_save 信号，手动使目录响应缓存失效
+        invalidate_catalog()
+
+        if detector is not None:
+            self.stdout.write(f'Found {duplicates} possible duplicates')
         self.stdout.write(self.style.SUCCESS(f'Successfully imported {imported} novels!'))
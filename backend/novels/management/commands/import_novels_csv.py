@@ -9,6 +9,8 @@ from pathlib import Path
 from django.core.management.base import BaseCommand, CommandError
 from django.db import connection
 
+from core.response_cache import invalidate_catalog
+from novels.dedup import DEFAULT_THRESHOLD, DuplicateDetector, add_catalog
 from novels.models import Novel
 
 
@@ -75,12 +77,26 @@ class Command(BaseCommand):
             action="store_true",
             help="Delete existing Novel rows before import",
         )
+        parser.add_argument(
+            "--dedup",
+            choices=["off", "flag", "skip"],
+            default="flag",
+            help="Near-duplicate detection (MinHash/LSH on title/author/intro) against the existing catalog "
+            "and earlier rows: flag = report only, skip = do not import the duplicate row (default: flag)",
+        )
+        parser.add_argument(
+            "--dedup-threshold",
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help=f"Estimated Jaccard similarity at which two novels count as duplicates (default: {DEFAULT_THRESHOLD})",
+        )
 
     def handle(self, *args, **options):
         csv_path = Path(options["path"]).resolve()
         batch_size: int = options["batch_size"]
         limit: int = options["limit"]
         truncate: bool = options["truncate"]
+        dedup: str = options["dedup"]
 
         if not csv_path.exists():
             raise CommandError(f"CSV not found: {csv_path}")
@@ -89,7 +105,14 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING("Deleting existing Novel rows..."))
             Novel.objects.all().delete()
 
+        detector = None
+        if dedup != "off":
+            detector = DuplicateDetector(threshold=options["dedup_threshold"])
+            indexed = add_catalog(detector)
+            self.stdout.write(f"Indexed {indexed} existing novels for duplicate detection")
+
         imported = 0
+        duplicates = 0
         buffer: list[Novel] = []
 
         update_fields = [
@@ -182,6 +205,19 @@ class Command(BaseCommand):
                     avg_rating=float(row.get("avg_rating") or 0) if str(row.get("avg_rating") or "").strip() else 0.0,
                 )
 
+                if detector is not None:
+                    match = detector.check(str(novel.id), novel.title, novel.author, novel.intro)
+                    if match is not None:
+                        duplicates += 1
+                        original_id, similarity = match
+                        self.stdout.write(self.style.WARNING(
+                            f"Possible duplicate: {novel.title}/{novel.author} (source {source_book_id}) "
+                            f"~ {original_id} (similarity {similarity:.2f})"
+                            + (", skipped" if dedup == "skip" else "")
+                        ))
+                        if dedup == "skip":
+                            continue
+
                 # We cannot directly set updated_at/created_at because the model uses auto_now/auto_now_add.
                 # However, we still parse the value so it's easy to adapt later if needed.
                 _ = _parse_datetime(row.get("updated_at"))
@@ -194,4 +230,9 @@ class Command(BaseCommand):
 
             flush()
 
+        # bulk_create does not send post_save, so drop the cached catalog responses explicitly
+        invalidate_catalog()
+
+        if detector is not None:
+            self.stdout.write(f"Found {duplicates} possible duplicates.")
         self.stdout.write(self.style.SUCCESS(f"Done. Imported/updated {imported} novels."))
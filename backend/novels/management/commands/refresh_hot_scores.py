@@ -0,0 +1,23 @@
+"""
+重算小说热度分数（Novel.hot_score）
+
+用法：python manage.py refresh_hot_scores
+
+热门推荐接口按 hot_score 索引读取，收藏数/阅读量/评分变化后需要定期执行（如每 10 分钟）才会反映到排序中。
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from novels.hot import refresh_hot_scores
+
+
+class Command(BaseCommand):
+    help = '重算全部已发布小说的热度分数'
+
+    def handle(self, *args, **options):
+        start_time = time.time()
+        updated = refresh_hot_scores()
+        elapsed = time.time() - start_time
+        self.stdout.write(self.style.SUCCESS(f'Refreshed hot scores for {updated} novels in {elapsed:.2f}s'))
@@ -0,0 +1,53 @@
+from django.db import migrations, models
+
+
+def compute_hot_scores(apps, schema_editor):
+    # 热度 = 0.5 · 收藏数 + 0.3 · 阅读量 + 0.2 · 平均评分，各项按已发布小说中的最小/最大值归一化；
+    # 公式写死在迁移中，不依赖之后可能修改的 novels/hot.py。未发布的小说保持默认值 0
+    from django.db.models import ExpressionWrapper, F, FloatField, Max, Min, Value
+
+    Novel = apps.get_model("novels", "Novel")
+    published = Novel.objects.filter(status="published")
+    stats = published.aggregate(
+        fav_min=Min("favorites_count"),
+        fav_max=Max("favorites_count"),
+        view_min=Min("views"),
+        view_max=Max("views"),
+        rating_min=Min("avg_rating"),
+        rating_max=Max("avg_rating"),
+    )
+
+    def normalized(field, low, high):
+        span = (high or 0) - (low or 0)
+        if span == 0:
+            return Value(0.0)
+        return ExpressionWrapper((F(field) - Value(low)) / Value(span), output_field=FloatField())
+
+    published.update(
+        hot_score=ExpressionWrapper(
+            Value(0.5) * normalized("favorites_count", stats["fav_min"], stats["fav_max"])
+            + Value(0.3) * normalized("views", stats["view_min"], stats["view_max"])
+            + Value(0.2) * normalized("avg_rating", stats["rating_min"], stats["rating_max"]),
+            output_field=FloatField(),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("novels", "0003_add_source_url"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="novel",
+            name="hot_score",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="novel",
+            index=models.Index(fields=["status", "-hot_score", "-updated_at"], name="novels_nove_status_385591_idx"),
+        ),
+        migrations.RunPython(compute_hot_scores, migrations.RunPython.noop),
+    ]
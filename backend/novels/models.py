@@ -31,12 +31,15 @@ class Novel(models.Model):
 	favorites_count = models.PositiveIntegerField(default=0)
 	rating_count = models.PositiveIntegerField(default=0)
 	avg_rating = models.FloatField(default=0)
+	# 物化的热度分数，由 refresh_hot_scores 命令定期重算（见 novels/hot.py）
+	hot_score = models.FloatField(default=0)
 
 	class Meta:
 		indexes = [
 			models.Index(fields=["status", "updated_at"]),
 			models.Index(fields=["favorites_count"]),
 			models.Index(fields=["views"]),
+			models.Index(fields=["status", "-hot_score", "-updated_at"]),
 		]
 
 	def __str__(self) -> str:
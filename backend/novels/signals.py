@@ -0,0 +1,18 @@
+"""
+小说变更时使公共目录接口的响应缓存失效（见 core/response_cache.py）
+
+只覆盖通过 Model.save()/delete() 的修改（如后台修改状态、编辑小说）；
+QuerySet.update() 和 bulk_create() 不发送信号，由调用方自行调用 invalidate_catalog。
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.response_cache import invalidate_catalog_on_commit
+from novels.models import Novel
+
+
+@receiver(post_save, sender=Novel)
+@receiver(post_delete, sender=Novel)
+def invalidate_catalog_responses(sender, **kwargs):
+    invalidate_catalog_on_commit()
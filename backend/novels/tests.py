@@ -1,11 +1,18 @@
 from __future__ import annotations
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from rest_framework.test import APIClient
 
 from novels.models import Novel
 
 
+# 测试使用进程内缓存，不读写开发环境的文件响应缓存
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "responses": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "responses"},
+}
+
+
 class NovelSearchTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -51,3 +58,89 @@ class NovelDetailTests(TestCase):
         resp = self.client.get("/api/novels/00000000-0000-0000-0000-000000000000")
         self.assertEqual(resp.status_code, 404)
         self.assertFalse(resp.json()["success"])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class DuplicateDetectionTests(TestCase):
+    def setUp(self):
+        self.original = Novel.objects.create(
+            title="斗破苍穹",
+            author="天蚕土豆",
+            category="玄幻",
+            tags=["热血"],
+            intro="这里是属于斗气的世界，没有花俏艳丽的魔法，有的，仅仅是繁衍到巅峰的斗气！",
+        )
+        self.duplicate = Novel.objects.create(
+            title="斗破苍穹 ",
+            author="天蚕土豆",
+            category="玄幻",
+            tags=["热血"],
+            intro="这里是属于斗气的世界，没有花俏艳丽的魔法，有的仅仅是繁衍到巅峰的斗气!",
+        )
+        self.other = Novel.objects.create(
+            title="凡人修仙传",
+            author="忘语",
+            category="仙侠",
+            tags=["修仙"],
+            intro="一个普通山村小子，偶然下进入到当地江湖小门派，成了一名记名弟子。",
+        )
+
+    def test_detector_flags_near_duplicates_only(self):
+        from novels.dedup import DuplicateDetector
+
+        detector = DuplicateDetector()
+        for novel in (self.original, self.duplicate, self.other):
+            match = detector.check(str(novel.id), novel.title, novel.author, novel.intro)
+            if novel is self.duplicate:
+                self.assertEqual(match[0], str(self.original.id))
+                self.assertGreaterEqual(match[1], 0.8)
+            else:
+                self.assertIsNone(match)
+
+        # 同一本书重复导入不算重复
+        self.assertIsNone(detector.check(str(self.other.id), self.other.title, self.other.author, self.other.intro))
+
+    def test_find_duplicates_command_shelves_later_copy(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        from core.response_cache import catalog_version
+
+        version = catalog_version()
+        out = StringIO()
+        call_command("find_duplicate_novels", "--shelve", stdout=out)
+
+        self.assertIn("found 1 near-duplicates", out.getvalue())
+        self.duplicate.refresh_from_db()
+        self.original.refresh_from_db()
+        self.assertEqual(self.duplicate.status, "shelved")
+        self.assertEqual(self.original.status, "published")
+        # 下架后目录响应缓存失效
+        self.assertNotEqual(catalog_version(), version)
+
+    def test_csv_import_skips_duplicates_of_catalog(self):
+        import csv
+        import tempfile
+        from io import StringIO
+        from pathlib import Path
+
+        from django.core.management import call_command
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "novels.csv"
+            with path.open("w", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=["source_book_id", "title", "author", "category", "intro"])
+                writer.writeheader()
+                writer.writerow({
+                    "source_book_id": "1001", "title": "凡人修仙传", "author": "忘语", "category": "仙侠",
+                    "intro": "一个普通山村小子，偶然下进入到当地江湖小门派，成了一名记名弟子！",
+                })
+                writer.writerow({
+                    "source_book_id": "1002", "title": "遮天", "author": "辰东", "category": "仙侠",
+                    "intro": "冰冷与黑暗并存的宇宙深处，九具庞大的龙尸拉着一口青铜古棺，亘古长存。",
+                })
+            call_command("import_novels_csv", "--path", str(path), "--dedup", "skip", stdout=StringIO())
+
+        self.assertEqual(Novel.objects.filter(title="凡人修仙传").count(), 1)
+        self.assertTrue(Novel.objects.filter(title="遮天").exists())
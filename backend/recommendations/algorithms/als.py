@@ -0,0 +1,306 @@
+"""
+隐式反馈交替最小二乘（Implicit ALS）矩阵分解推荐算法
+
+参考 Hu, Koren, Volinsky 的隐式反馈模型：
+- 偏好 p_ui = 1（有交互）或 0（无交互）
+- 置信度 c_ui = 1 + alpha * r_ui，r_ui 为与协同过滤相同的交互权重
+- 交替固定小说因子求解用户因子、固定用户因子求解小说因子
+
+每一轮按行分块，用批量共轭梯度（以上一轮的因子为初值，每行只迭代几步）
+近似求解每行的 f×f 正规方程，单步开销为 O(nnz·f)，无需构造 nnz×f×f 的外积；
+各块在线程池中并行执行（NumPy 的矩阵运算会释放 GIL）。
+
+训练得到紧凑的 float32 用户/小说因子，推荐分数即两者的点积，
+不需要 N×N 的物品相似度矩阵，适用于物品数很大的目录。
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from recommendations.algorithms.artifacts import load_artifacts, save_artifacts
+from recommendations.algorithms.loader import InteractionSet, load_interactions
+from recommendations.algorithms.scoring import score_factor_users
+from recommendations.algorithms.storage import (
+    active_user_ids,
+    published_novel_mask,
+    replace_recommendations,
+    scored_blocks_to_records,
+)
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_NAME = 'als'
+
+# 每个求解块中 nnz×f 缓冲区的内存上限
+BLOCK_BYTES = 32 * 1024 * 1024
+MAX_BLOCK_ROWS = 4096
+
+
+def _row_blocks(indptr: np.ndarray, max_nnz: int, max_rows: int) -> list[tuple[int, int]]:
+    """把 CSR 的行切成若干连续块，每块的非零元素数不超过 max_nnz（单行超限时独占一块）"""
+    blocks = []
+    n_rows = indptr.size - 1
+    start = 0
+    while start < n_rows:
+        stop = int(np.searchsorted(indptr, indptr[start] + max_nnz, side='right')) - 1
+        stop = min(max(stop, start + 1), start + max_rows, n_rows)
+        blocks.append((start, stop))
+        start = stop
+    return blocks
+
+
+class ALSRecommender:
+    """隐式反馈 ALS 推荐器"""
+
+    def __init__(
+        self,
+        factors: int = 64,
+        regularization: float = 0.05,
+        alpha: float = 40.0,
+        iterations: int = 15,
+        min_interactions: int = 2,
+        threads: int | None = None,
+        cg_steps: int = 3,
+        half_life_days: float | None = None,
+        random_state: int = 42,
+    ):
+        """
+        Args:
+            factors: 隐因子维度
+            regularization: L2 正则系数
+            alpha: 置信度放大系数，c = 1 + alpha * r
+            iterations: 交替求解的轮数
+            min_interactions: 用户/物品最少需要的交互数才参与计算
+            threads: 求解线程数，默认使用全部 CPU
+            cg_steps: 每轮每行的共轭梯度步数
+            half_life_days: 交互权重时间衰减的半衰期（天），为 None 时不衰减
+        """
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.min_interactions = min_interactions
+        self.threads = threads or os.cpu_count() or 1
+        self.cg_steps = cg_steps
+        self.half_life_days = half_life_days
+        self.random_state = random_state
+
+        self.user_item_matrix: csr_matrix | None = None
+        self.user_ids: list[str] = []
+        self.novel_ids: list[str] = []
+        self.user_id_to_idx: dict[str, int] = {}
+        self.novel_id_to_idx: dict[str, int] = {}
+
+        self.user_factors: np.ndarray | None = None
+        self.item_factors: np.ndarray | None = None
+
+    def build_user_item_matrix(self, interactions: InteractionSet) -> bool:
+        """构建用户-物品交互矩阵（与协同过滤相同的权重和过滤规则）"""
+        filtered = interactions.filter_min_interactions(self.min_interactions)
+        if filtered.empty:
+            logger.warning("No valid interactions after filtering")
+            return False
+
+        self.user_ids = [str(uid) for uid in filtered.user_ids]
+        self.novel_ids = [str(nid) for nid in filtered.novel_ids]
+        self.user_id_to_idx = {uid: i for i, uid in enumerate(self.user_ids)}
+        self.novel_id_to_idx = {nid: i for i, nid in enumerate(self.novel_ids)}
+        self.user_item_matrix = filtered.to_csr()
+
+        logger.info(f"Built user-item matrix: {self.user_item_matrix.shape}")
+        return True
+
+    def _solve_block(
+        self,
+        confidence: csr_matrix,
+        fixed: np.ndarray,
+        gram: np.ndarray,
+        start: int,
+        stop: int,
+        factors: np.ndarray,
+    ):
+        """用共轭梯度原地更新 [start, stop) 行的因子：(YᵀY + Yᵀ(Cu - I)Y + λI) x = YᵀCu p"""
+        indptr = confidence.indptr[start:stop + 1]
+        lo, hi = indptr[0], indptr[-1]
+        counts = np.diff(indptr)
+        nonempty = counts > 0
+        segment_starts = (indptr[:-1] - lo)[nonempty]
+
+        cols = confidence.indices[lo:hi]
+        conf = confidence.data[lo:hi]  # alpha * r，即 c - 1
+        y = fixed[cols]
+        owner = np.repeat(np.arange(stop - start), counts)
+
+        def row_sums(values: np.ndarray) -> np.ndarray:
+            # 把每个非零元素的 f 维向量按所属行求和
+            result = np.zeros((stop - start, fixed.shape[1]), dtype=np.float32)
+            if hi > lo:
+                result[nonempty] = np.add.reduceat(values, segment_starts, axis=0)
+            return result
+
+        def apply(x: np.ndarray) -> np.ndarray:
+            # A x = (YᵀY + λI) x + Yᵀ(Cu - I)(Y x)
+            yx = np.einsum('ij,ij->i', y, x[owner])
+            return x @ gram + row_sums(y * (conf * yx)[:, None])
+
+        x = factors[start:stop]
+        r = row_sums(y * (conf + 1.0)[:, None]) - apply(x)
+        p = r.copy()
+        rs_old = np.einsum('ij,ij->i', r, r)
+        for _ in range(self.cg_steps):
+            ap = apply(p)
+            denom = np.einsum('ij,ij->i', p, ap)
+            step = np.divide(rs_old, denom, out=np.zeros_like(rs_old), where=denom > 1e-12)
+            x += step[:, None] * p
+            r -= step[:, None] * ap
+            rs_new = np.einsum('ij,ij->i', r, r)
+            beta = np.divide(rs_new, rs_old, out=np.zeros_like(rs_new), where=rs_old > 1e-12)
+            p = r + beta[:, None] * p
+            rs_old = rs_new
+
+    def _solve(self, confidence: csr_matrix, fixed: np.ndarray, factors: np.ndarray, pool: ThreadPoolExecutor):
+        """固定一侧因子，并行更新另一侧全部行的因子（原地修改 factors）"""
+        n_factors = fixed.shape[1]
+        gram = fixed.T @ fixed + self.regularization * np.eye(n_factors, dtype=np.float32)
+
+        max_nnz = max(1, BLOCK_BYTES // (n_factors * 4))
+        blocks = _row_blocks(confidence.indptr, max_nnz, MAX_BLOCK_ROWS)
+        futures = [
+            pool.submit(self._solve_block, confidence, fixed, gram, start, stop, factors)
+            for start, stop in blocks
+        ]
+        for future in futures:
+            future.result()
+
+    def fit(self):
+        """交替求解用户因子和小说因子"""
+        if self.user_item_matrix is None:
+            raise ValueError("Must build user-item matrix first")
+
+        user_confidence = self.user_item_matrix.astype(np.float32)
+        user_confidence.data *= self.alpha
+        item_confidence = user_confidence.T.tocsr()
+
+        rng = np.random.default_rng(self.random_state)
+        n_users, n_items = user_confidence.shape
+        self.user_factors = (rng.standard_normal((n_users, self.factors)) * 0.01).astype(np.float32)
+        self.item_factors = (rng.standard_normal((n_items, self.factors)) * 0.01).astype(np.float32)
+
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            for iteration in range(self.iterations):
+                self._solve(user_confidence, self.item_factors, self.user_factors, pool)
+                self._solve(item_confidence, self.user_factors, self.item_factors, pool)
+                logger.debug(f"ALS iteration {iteration + 1}/{self.iterations} done")
+
+        logger.info(
+            f"Trained ALS factors: users={self.user_factors.shape}, novels={self.item_factors.shape} "
+            f"({self.iterations} iterations, {self.threads} threads)"
+        )
+
+    def recommend_for_user(self, user_id: str, n: int = 20) -> list[tuple[str, float]]:
+        """为用户生成推荐列表（用户因子与小说因子的点积）
+
+        Returns:
+            List of (novel_id, score)
+        """
+        if self.user_factors is None or user_id not in self.user_id_to_idx:
+            return []
+
+        blocks = score_factor_users(
+            self.user_item_matrix,
+            self.user_factors,
+            self.item_factors,
+            n,
+            user_indices=[self.user_id_to_idx[user_id]],
+        )
+        return [
+            (novel_id, score)
+            for _, novel_id, score in scored_blocks_to_records(blocks, self.user_ids, self.novel_ids)
+        ]
+
+    def save_recommendations_to_db(self, n_recommendations: int = 20):
+        """为所有活跃用户批量计算推荐并保存到数据库"""
+        target_users = active_user_ids()
+        user_indices = np.array(
+            [self.user_id_to_idx[uid] for uid in target_users if uid in self.user_id_to_idx],
+            dtype=np.int64,
+        )
+
+        blocks = score_factor_users(
+            self.user_item_matrix,
+            self.user_factors,
+            self.item_factors,
+            n_recommendations,
+            user_indices=user_indices,
+            candidate_mask=published_novel_mask(self.novel_ids),
+        )
+        records = scored_blocks_to_records(blocks, self.user_ids, self.novel_ids)
+        saved = replace_recommendations('als', records)
+        logger.info(f"Saved {saved} ALS recommendation records for {user_indices.size} users")
+
+    def save_state(self, state_dir: Path):
+        """把用户/小说因子、用户-物品矩阵和ID列表保存为新版本的产物（可 mmap）"""
+        save_artifacts(
+            state_dir,
+            ARTIFACT_NAME,
+            {
+                'user_item': self.user_item_matrix,
+                'user_factors': self.user_factors,
+                'item_factors': self.item_factors,
+                'user_ids': np.array(self.user_ids, dtype=str),
+                'novel_ids': np.array(self.novel_ids, dtype=str),
+            },
+            {'factors': self.factors, 'iterations': self.iterations},
+        )
+
+    def load_state(self, state_dir: Path, mmap: bool = True) -> bool:
+        """从产物恢复训练好的因子，没有可用状态时返回 False"""
+        artifacts = load_artifacts(state_dir, ARTIFACT_NAME, mmap=mmap)
+        if artifacts is None:
+            return False
+        self.user_item_matrix = artifacts['user_item']
+        self.user_factors = artifacts['user_factors']
+        self.item_factors = artifacts['item_factors']
+        self.user_ids = artifacts.ids('user_ids')
+        self.novel_ids = artifacts.ids('novel_ids')
+        self.user_id_to_idx = {uid: i for i, uid in enumerate(self.user_ids)}
+        self.novel_id_to_idx = {nid: i for i, nid in enumerate(self.novel_ids)}
+        return True
+
+    def run(self, n_recommendations: int = 20, state_dir: Path | None = None):
+        """执行完整的 ALS 推荐计算流程
+
+        Args:
+            state_dir: 训练完成后把因子保存为该目录下的产物
+        """
+        logger.info("Starting ALS recommendation computation...")
+
+        # 1. 加载交互数据
+        interactions = load_interactions(half_life_days=self.half_life_days)
+        if interactions.empty:
+            logger.warning("No interactions, skipping ALS computation")
+            return
+
+        # 2. 构建用户-物品矩阵
+        if not self.build_user_item_matrix(interactions):
+            logger.warning("Failed to build matrix, skipping ALS computation")
+            return
+
+        # 3. 训练因子
+        self.fit()
+
+        # 4. 为用户生成推荐并保存
+        self.save_recommendations_to_db(n_recommendations)
+
+        # 5. 保存产物
+        if state_dir is not None:
+            self.save_state(state_dir)
+
+        logger.info("ALS computation completed!")
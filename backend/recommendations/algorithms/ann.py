@@ -0,0 +1,276 @@
+"""
+小说向量的近似最近邻（ANN）索引
+
+倒排文件（IVF）索引，纯 NumPy 实现：
+1. 用球面 k-means 把 L2 归一化后的向量聚成 n_lists 个簇
+2. 向量按所属簇重新排列，每个簇在数组中是一段连续区间
+3. 查询时只扫描质心与查询向量最接近的 nprobe 个簇，内积即余弦相似度
+
+索引可以由内容向量（TF-IDF 经 SVD 降维）或 ALS 小说因子构建，
+保存为版本化的产物（见 artifacts.py），由在线服务在每个工作进程中以 mmap 方式加载。
+离线任务之后新增的小说可以通过 add() 追加到内存中的增量区，查询时一并精确扫描。
+增量区是一个不可变的 _Extra，add() 构建新的 _Extra 后一次赋值发布，并发的查询总是看到 ID 与向量一致的某一版。
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from recommendations.algorithms.artifacts import Artifacts, load_artifacts, save_artifacts
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NPROBE = 8
+KMEANS_ITERATIONS = 10
+# 训练质心时每个簇最多抽样的向量数
+KMEANS_SAMPLES_PER_LIST = 256
+ASSIGN_BLOCK_SIZE = 65536
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """分块计算每个向量最近（内积最大）的质心"""
+    assignment = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], ASSIGN_BLOCK_SIZE):
+        block = vectors[start:start + ASSIGN_BLOCK_SIZE]
+        assignment[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+
+def _spherical_kmeans(vectors: np.ndarray, n_lists: int, rng: np.random.Generator) -> np.ndarray:
+    """在抽样数据上训练球面 k-means 质心"""
+    n_samples = min(vectors.shape[0], n_lists * KMEANS_SAMPLES_PER_LIST)
+    sample = vectors[rng.choice(vectors.shape[0], n_samples, replace=False)]
+    centroids = sample[rng.choice(n_samples, n_lists, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = _assign(sample, centroids)
+        one_hot = csr_matrix(
+            (np.ones(n_samples, dtype=np.float32), (assignment, np.arange(n_samples))),
+            shape=(n_lists, n_samples),
+        )
+        sums = np.asarray(one_hot @ sample)
+        # 空簇保留原质心
+        nonempty = np.asarray(one_hot.sum(axis=1)).ravel() > 0
+        centroids[nonempty] = _normalize(sums[nonempty])
+    return centroids
+
+
+@dataclass(frozen=True)
+class _Extra:
+    """建索引之后追加的向量（不可变），ids 与 vectors 的行一一对应"""
+    ids: tuple[str, ...]
+    vectors: np.ndarray
+    id_to_idx: dict[str, int] = field(default_factory=dict)
+
+
+class IVFIndex:
+    """倒排文件近似最近邻索引（余弦相似度）"""
+
+    def __init__(self, ids: list[str], vectors: np.ndarray, centroids: np.ndarray, offsets: np.ndarray):
+        """
+        Args:
+            ids: 与 vectors 行一一对应的 ID，已按簇排列
+            vectors: L2 归一化的 float32 向量，已按簇排列
+            centroids: 簇质心
+            offsets: 第 i 个簇对应 vectors[offsets[i]:offsets[i + 1]]
+        """
+        self.ids = list(ids)
+        self.vectors = vectors
+        self.centroids = centroids
+        self.offsets = offsets
+        self.id_to_idx = {item_id: i for i, item_id in enumerate(self.ids)}
+
+        # 建索引之后追加的向量，查询时精确扫描；只通过整体替换修改
+        self._extra = _Extra(ids=(), vectors=np.empty((0, vectors.shape[1]), dtype=np.float32))
+        self._add_lock = threading.Lock()
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    @property
+    def n_lists(self) -> int:
+        return self.centroids.shape[0]
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self._extra.ids)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self.id_to_idx or item_id in self._extra.id_to_idx
+
+    @classmethod
+    def build(
+        cls,
+        ids: list[str],
+        vectors: np.ndarray,
+        n_lists: int | None = None,
+        random_state: int = 42,
+        centroids: np.ndarray | None = None,
+    ) -> IVFIndex:
+        """从向量构建索引
+
+        Args:
+            n_lists: 簇数，默认约为 sqrt(向量数)
+            centroids: 沿用已有的簇质心（例如上一版本的索引），不再训练 k-means
+        """
+        vectors = _normalize(vectors)
+        n = vectors.shape[0]
+        if n == 0:
+            raise ValueError("Cannot build index from empty vectors")
+        if centroids is None:
+            if n_lists is None:
+                n_lists = int(np.sqrt(n))
+            n_lists = max(1, min(n_lists, n))
+            rng = np.random.default_rng(random_state)
+            centroids = _spherical_kmeans(vectors, n_lists, rng)
+        else:
+            centroids = np.asarray(centroids, dtype=np.float32)
+            n_lists = centroids.shape[0]
+        assignment = _assign(vectors, centroids)
+
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.searchsorted(assignment[order], np.arange(n_lists + 1)).astype(np.int64)
+        logger.info(f"Built IVF index: {n} vectors, dim={vectors.shape[1]}, lists={n_lists}")
+        return cls([ids[i] for i in order], vectors[order], centroids, offsets)
+
+    def vector(self, item_id: str) -> np.ndarray | None:
+        """返回已索引的向量，不存在时返回 None"""
+        idx = self.id_to_idx.get(item_id)
+        if idx is not None:
+            return self.vectors[idx]
+        extra = self._extra
+        idx = extra.id_to_idx.get(item_id)
+        return extra.vectors[idx] if idx is not None else None
+
+    def add(self, ids: list[str], vectors: np.ndarray):
+        """追加新向量（只保存在内存中），已存在的 ID 会被忽略
+
+        可以与 search() 并发调用：写入方之间由锁串行化，新的增量区构建完成后一次赋值发布
+        """
+        vectors = _normalize(np.atleast_2d(vectors))
+        with self._add_lock:
+            extra = self._extra
+            new, seen = [], set()
+            for i, item_id in enumerate(ids):
+                if item_id not in self.id_to_idx and item_id not in extra.id_to_idx and item_id not in seen:
+                    seen.add(item_id)
+                    new.append(i)
+            if not new:
+                return
+            new_ids = extra.ids + tuple(ids[i] for i in new)
+            self._extra = _Extra(
+                ids=new_ids,
+                vectors=np.vstack([extra.vectors, vectors[new]]),
+                id_to_idx={item_id: i for i, item_id in enumerate(new_ids)},
+            )
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 10,
+        nprobe: int = DEFAULT_NPROBE,
+        exclude: set[str] | None = None,
+    ) -> list[tuple[str, float]]:
+        """查询与 query 最相似的 k 个向量
+
+        Returns:
+            List of (id, cosine_similarity)，按相似度降序
+        """
+        query = _normalize(np.atleast_2d(query))[0]
+        exclude = exclude or set()
+        nprobe = min(max(nprobe, 1), self.n_lists)
+
+        centroid_scores = self.centroids @ query
+        if nprobe < self.n_lists:
+            probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probes = np.arange(self.n_lists)
+
+        # 整个查询只读取一次增量区，ID 与向量来自同一版本
+        extra = self._extra
+        candidates = [np.arange(self.offsets[p], self.offsets[p + 1]) for p in probes]
+        if extra.ids:
+            candidates.append(np.arange(len(self.ids), len(self.ids) + len(extra.ids)))
+        candidates = np.concatenate(candidates)
+        if candidates.size == 0:
+            return []
+
+        in_index = candidates < len(self.ids)
+        scores = np.empty(candidates.size, dtype=np.float32)
+        scores[in_index] = self.vectors[candidates[in_index]] @ query
+        scores[~in_index] = extra.vectors[candidates[~in_index] - len(self.ids)] @ query
+
+        n = min(k + len(exclude), candidates.size)
+        top = np.argpartition(-scores, n - 1)[:n] if n < candidates.size else np.arange(candidates.size)
+        top = top[np.argsort(-scores[top], kind='stable')]
+
+        results = []
+        for i in top:
+            idx = int(candidates[i])
+            item_id = self.ids[idx] if idx < len(self.ids) else extra.ids[idx - len(self.ids)]
+            if item_id in exclude:
+                continue
+            results.append((item_id, float(scores[i])))
+            if len(results) == k:
+                break
+        return results
+
+    def search_id(self, item_id: str, k: int = 10, nprobe: int = DEFAULT_NPROBE) -> list[tuple[str, float]]:
+        """查询与已索引的 item_id 最相似的 k 个向量（不含自身）"""
+        vector = self.vector(item_id)
+        if vector is None:
+            return []
+        return self.search(vector, k, nprobe=nprobe, exclude={item_id})
+
+    def save(self, state_dir: Path, name: str, meta: dict | None = None, **extra: np.ndarray) -> str:
+        """保存为新版本的产物；extra 为随索引一起保存的附加数组
+
+        Returns:
+            版本号
+        """
+        arrays = {
+            'ids': np.array(self.ids, dtype=str),
+            'vectors': self.vectors,
+            'centroids': self.centroids,
+            'offsets': self.offsets,
+            **extra,
+        }
+        return save_artifacts(state_dir, name, arrays, meta)
+
+    @classmethod
+    def load(
+        cls,
+        state_dir: Path,
+        name: str,
+        mmap: bool = True,
+        version: str | None = None,
+    ) -> tuple[IVFIndex, Artifacts] | None:
+        """加载指定版本（默认当前版本）的索引，返回 (索引, 产物)；没有可用版本时返回 None"""
+        artifacts = load_artifacts(state_dir, name, mmap=mmap, version=version)
+        if artifacts is None:
+            return None
+        index = cls(
+            ids=artifacts.ids('ids'),
+            vectors=artifacts['vectors'],
+            centroids=np.asarray(artifacts['centroids']),
+            offsets=np.asarray(artifacts['offsets']),
+        )
+        return index, artifacts
+
+
+def exact_search(vectors: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    """暴力计算的 top-k 下标，用于评估索引召回率"""
+    scores = _normalize(vectors) @ _normalize(np.atleast_2d(query))[0]
+    return np.argsort(-scores, kind='stable')[:k]
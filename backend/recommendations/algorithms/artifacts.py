@@ -0,0 +1,169 @@
+"""
+版本化的模型产物存储
+
+离线任务把拟合好的状态（用户-物品矩阵、相似度 top-k、ID 列表、TF-IDF 词表、向量等）
+保存到本地磁盘，Web 工作进程和后续的增量任务直接用 mmap 打开，不必重新计算或经 ORM 回读。
+
+目录结构：
+    <state_dir>/<name>/CURRENT           当前版本号（原子替换）
+    <state_dir>/<name>/v000012/          每个版本一个目录
+        manifest.json                    元数据和数组清单，最后写入
+        user_ids.npy                     普通数组：一个 .npy 文件
+        item_similarity.data.npy         CSR 矩阵：data / indices / indptr 三个 .npy 文件
+        ...
+
+每个数组单独保存为未压缩的 .npy，因此都可以 np.load(mmap_mode='r')；
+字符串 ID 保存为定长 Unicode 数组。新版本完整写入后才切换 CURRENT，
+读取方看到的要么是旧版本，要么是完整的新版本。
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+# 保留的历史版本数（包括当前版本），供正在读取旧版本的进程继续使用
+KEEP_VERSIONS = 3
+
+
+@dataclass
+class Artifacts:
+    """已加载的一个版本的产物"""
+    name: str
+    version: str
+    meta: dict
+    arrays: dict[str, np.ndarray | csr_matrix] = field(default_factory=dict)
+
+    def __getitem__(self, key: str):
+        return self.arrays[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.arrays
+
+    def ids(self, key: str) -> list[str]:
+        """把定长字符串数组转为 ID 列表"""
+        return np.asarray(self.arrays[key]).tolist()
+
+
+def _artifact_dir(state_dir: Path, name: str) -> Path:
+    return Path(state_dir) / name
+
+
+def current_version(state_dir: Path, name: str) -> str | None:
+    """返回当前版本号，没有可用版本时返回 None（只读一个小文件，可以频繁调用）"""
+    try:
+        version = (_artifact_dir(state_dir, name) / CURRENT_FILE).read_text(encoding='utf-8').strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def _next_version(root: Path) -> str:
+    existing = [int(p.name[1:]) for p in root.glob('v*') if p.name[1:].isdigit()]
+    return f"v{max(existing, default=0) + 1:06d}"
+
+
+def _save_array(directory: Path, key: str, value) -> dict:
+    if issparse(value):
+        value = csr_matrix(value)
+        for part in ('data', 'indices', 'indptr'):
+            np.save(directory / f"{key}.{part}.npy", getattr(value, part))
+        return {'kind': 'csr', 'shape': list(value.shape)}
+
+    value = np.asarray(value)
+    if value.dtype == object:
+        value = value.astype(str)
+    np.save(directory / f"{key}.npy", value)
+    return {'kind': 'array'}
+
+
+def _load_array(directory: Path, key: str, spec: dict, mmap_mode: str | None):
+    if spec['kind'] == 'csr':
+        data, indices, indptr = (
+            np.load(directory / f"{key}.{part}.npy", mmap_mode=mmap_mode, allow_pickle=False)
+            for part in ('data', 'indices', 'indptr')
+        )
+        return csr_matrix((data, indices, indptr), shape=tuple(spec['shape']), copy=False)
+    return np.load(directory / f"{key}.npy", mmap_mode=mmap_mode, allow_pickle=False)
+
+
+def save_artifacts(state_dir: Path, name: str, arrays: dict, meta: dict | None = None) -> str:
+    """把一组数组保存为新版本并切换为当前版本
+
+    Args:
+        arrays: {键: np.ndarray 或 scipy 稀疏矩阵}，字符串列表会转为定长 Unicode 数组
+        meta: 可 JSON 序列化的元数据
+
+    Returns:
+        新版本号
+    """
+    root = _artifact_dir(state_dir, name)
+    root.mkdir(parents=True, exist_ok=True)
+
+    version = _next_version(root)
+    tmp_dir = root / f".{version}.tmp"
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir()
+
+    manifest = {
+        'meta': meta or {},
+        'arrays': {key: _save_array(tmp_dir, key, value) for key, value in arrays.items()},
+    }
+    (tmp_dir / MANIFEST_FILE).write_text(json.dumps(manifest), encoding='utf-8')
+    os.replace(tmp_dir, root / version)
+
+    # 最后原子替换 CURRENT
+    pointer_tmp = root / f"{CURRENT_FILE}.tmp"
+    pointer_tmp.write_text(version, encoding='utf-8')
+    os.replace(pointer_tmp, root / CURRENT_FILE)
+
+    _collect_old_versions(root, version)
+    logger.info(f"Saved {name} artifacts {version} to {root}")
+    return version
+
+
+def _collect_old_versions(root: Path, current: str, keep: int = KEEP_VERSIONS):
+    """删除较旧的版本目录（已 mmap 的进程在 Linux 上仍可继续读取已删除的文件）"""
+    versions = sorted(p for p in root.glob('v*') if p.is_dir() and p.name <= current)
+    for stale in versions[:-keep]:
+        shutil.rmtree(stale, ignore_errors=True)
+
+
+def load_artifacts(state_dir: Path, name: str, mmap: bool = True, version: str | None = None) -> Artifacts | None:
+    """加载某个版本（默认当前版本）的产物
+
+    Args:
+        mmap: 为 True 时以只读 mmap 方式打开数组，不把数据读入内存
+
+    Returns:
+        Artifacts；没有可用版本时返回 None
+    """
+    version = version or current_version(state_dir, name)
+    if version is None:
+        return None
+
+    directory = _artifact_dir(state_dir, name) / version
+    try:
+        manifest = json.loads((directory / MANIFEST_FILE).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        logger.warning(f"Artifacts {name}/{version} are missing, ignoring them")
+        return None
+
+    mmap_mode = 'r' if mmap else None
+    arrays = {
+        key: _load_array(directory, key, spec, mmap_mode)
+        for key, spec in manifest['arrays'].items()
+    }
+    return Artifacts(name=name, version=version, meta=manifest['meta'], arrays=arrays)
@@ -12,31 +12,58 @@ from __future__ import annotations
 
 import logging
 from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
 from typing import TYPE_CHECKING
 
 import numpy as np
-import pandas as pd
-from django.db import transaction
-from sklearn.metrics.pairwise import cosine_similarity
+from django.utils import timezone
 from scipy.sparse import csr_matrix
 
+from recommendations.algorithms.artifacts import load_artifacts, save_artifacts
+from recommendations.algorithms.loader import InteractionSet, load_interactions
+from recommendations.algorithms.scoring import score_user_block, score_users
+from recommendations.algorithms.storage import (
+    active_user_ids,
+    published_novel_mask,
+    replace_recommendations,
+    replace_similarities,
+    scored_blocks_to_records,
+)
+from recommendations.algorithms.similarity import replace_rows, row_top_items, topk_cosine_similarity
+
 if TYPE_CHECKING:
     from uuid import UUID
 
 logger = logging.getLogger(__name__)
 
+ARTIFACT_NAME = 'cf'
+
 
 class CollaborativeFilterRecommender:
     """协同过滤推荐器"""
 
-    def __init__(self, min_interactions: int = 2, top_k_similar: int = 20):
+    def __init__(
+        self,
+        min_interactions: int = 2,
+        top_k_similar: int = 20,
+        workers: int = 1,
+        half_life_days: float | None = None,
+        max_memory: int | None = None,
+    ):
         """
         Args:
             min_interactions: 用户/物品最少需要的交互数才参与计算
             top_k_similar: 每个小说保留的最相似小说数量
+            workers: 批量为用户打分时使用的进程数
+            half_life_days: 交互权重时间衰减的半衰期（天），为 None 时不衰减
+            max_memory: 相似度计算的内存预算（字节），指定时按行块计算并把结果暂存到磁盘
         """
         self.min_interactions = min_interactions
         self.top_k_similar = top_k_similar
+        self.workers = workers
+        self.half_life_days = half_life_days
+        self.max_memory = max_memory
         
         # 数据矩阵
         self.user_item_matrix: csr_matrix | None = None
@@ -45,112 +72,59 @@ class CollaborativeFilterRecommender:
         self.user_id_to_idx: dict[str, int] = {}
         self.novel_id_to_idx: dict[str, int] = {}
         
-        # 相似度矩阵
-        self.item_similarity: np.ndarray | None = None
+        # 相似度矩阵（稀疏，每行只保留 top-K）
+        self.item_similarity: csr_matrix | None = None
 
-    def load_interactions(self) -> pd.DataFrame:
-        """从数据库加载用户交互数据"""
-        from interactions.models import Favorite, Rating, ReadHistory
+    def load_interactions(self, user_ids: list[str] | None = None) -> InteractionSet:
+        """从数据库加载用户交互数据
         
-        interactions = []
-        favorite_weight = 0.8
-        rating_weight = 0.2
-        read_weight = 0.5
-        
-        # 收藏数据 (权重 0.8)
-        favorites = Favorite.objects.filter(deleted_at__isnull=True).values_list('user_id', 'novel_id')
-        for user_id, novel_id in favorites:
-            interactions.append({
-                'user_id': str(user_id),
-                'novel_id': str(novel_id),
-                'score': favorite_weight
-            })
-        
-        # 评分数据 (权重归一化到 0-1)
-        ratings = Rating.objects.all().values_list('user_id', 'novel_id', 'score')
-        for user_id, novel_id, score in ratings:
-            interactions.append({
-                'user_id': str(user_id),
-                'novel_id': str(novel_id),
-                'score': (score / 5.0) * rating_weight  # 归一化到0-1并加权
-            })
-
-        # 阅读历史数据（隐式正向反馈）
-        history = ReadHistory.objects.all().values_list('user_id', 'novel_id')
-        for user_id, novel_id in history:
-            interactions.append({
-                'user_id': str(user_id),
-                'novel_id': str(novel_id),
-                'score': read_weight
-            })
-        
-        df = pd.DataFrame(interactions)
-        
-        if df.empty:
+        Args:
+            user_ids: 只加载这些用户的交互（增量更新时使用），默认加载全部
+        """
+        interactions = load_interactions(user_ids=user_ids, half_life_days=self.half_life_days)
+        if interactions.empty:
             logger.warning("No interaction data found")
-            return df
-        
-        # 合并同一用户对同一小说的多次交互（取最大值）
-        df = df.groupby(['user_id', 'novel_id'])['score'].max().reset_index()
-        
-        logger.info(f"Loaded {len(df)} interactions from {df['user_id'].nunique()} users and {df['novel_id'].nunique()} novels")
-        
-        return df
+        return interactions
 
-    def build_user_item_matrix(self, df: pd.DataFrame) -> bool:
+    def build_user_item_matrix(self, interactions: InteractionSet) -> bool:
         """构建用户-物品交互矩阵"""
-        if df.empty:
-            logger.warning("Empty dataframe, cannot build matrix")
+        if interactions.empty:
+            logger.warning("No interactions, cannot build matrix")
             return False
         
         # 过滤低频用户和物品
-        user_counts = df.groupby('user_id').size()
-        novel_counts = df.groupby('novel_id').size()
-        
-        valid_users = user_counts[user_counts >= self.min_interactions].index
-        valid_novels = novel_counts[novel_counts >= self.min_interactions].index
-        
-        df_filtered = df[df['user_id'].isin(valid_users) & df['novel_id'].isin(valid_novels)]
-        
-        if df_filtered.empty:
+        filtered = interactions.filter_min_interactions(self.min_interactions)
+        if filtered.empty:
             logger.warning("No valid interactions after filtering")
             return False
         
         # 创建ID映射
-        self.user_ids = df_filtered['user_id'].unique().tolist()
-        self.novel_ids = df_filtered['novel_id'].unique().tolist()
+        self.user_ids = [str(uid) for uid in filtered.user_ids]
+        self.novel_ids = [str(nid) for nid in filtered.novel_ids]
         self.user_id_to_idx = {uid: i for i, uid in enumerate(self.user_ids)}
         self.novel_id_to_idx = {nid: i for i, nid in enumerate(self.novel_ids)}
         
         # 构建稀疏矩阵
-        row_indices = df_filtered['user_id'].map(self.user_id_to_idx).values
-        col_indices = df_filtered['novel_id'].map(self.novel_id_to_idx).values
-        values = df_filtered['score'].values
-        
-        self.user_item_matrix = csr_matrix(
-            (values, (row_indices, col_indices)),
-            shape=(len(self.user_ids), len(self.novel_ids))
-        )
+        self.user_item_matrix = filtered.to_csr()
         
         logger.info(f"Built user-item matrix: {self.user_item_matrix.shape}")
         return True
 
-    def compute_item_similarity(self) -> np.ndarray:
+    def compute_item_similarity(self) -> csr_matrix:
         """计算物品相似度矩阵（Item-based CF）
         
-        使用余弦相似度计算小说之间的相似性
+        直接在稀疏的物品-用户矩阵上分块计算余弦相似度，
+        每行只保留 top_k_similar 个最相似的小说，对角线为零
         """
         if self.user_item_matrix is None:
             raise ValueError("Must build user-item matrix first")
         
         # 转置矩阵：从用户-物品变为物品-用户
-        item_user_matrix = self.user_item_matrix.T.toarray()
-        
-        # 计算余弦相似度
-        self.item_similarity = cosine_similarity(item_user_matrix)
+        item_user_matrix = self.user_item_matrix.T.tocsr()
         
-        # 对角线置零（自己和自己的相似度不参与推荐）
-        np.fill_diagonal(self.item_similarity, 0)
+        self.item_similarity = topk_cosine_similarity(
+            item_user_matrix, self.top_k_similar, max_memory=self.max_memory
+        )
         
         logger.info(f"Computed item similarity matrix: {self.item_similarity.shape}")
         return self.item_similarity
@@ -168,17 +142,7 @@ class CollaborativeFilterRecommender:
             return []
         
         idx = self.novel_id_to_idx[novel_id]
-        similarities = self.item_similarity[idx]
-        
-        # 获取top-N
-        top_indices = np.argsort(similarities)[::-1][:n]
-        
-        results = []
-        for i in top_indices:
-            if similarities[i] > 0:
-                results.append((self.novel_ids[i], float(similarities[i])))
-        
-        return results
+        return [(self.novel_ids[j], score) for j, score in row_top_items(self.item_similarity, idx, n)]
 
     def recommend_for_user(self, user_id: str, n: int = 20) -> list[tuple[str, float]]:
         """为用户生成推荐列表（Item-based CF）
@@ -196,124 +160,261 @@ class CollaborativeFilterRecommender:
             return []
         
         user_idx = self.user_id_to_idx[user_id]
-        user_vector = self.user_item_matrix[user_idx].toarray().flatten()
-        
-        # 计算推荐分数：用户向量与物品相似度矩阵的加权和
-        scores = self.item_similarity.T @ user_vector
-        
-        # 排除已交互的小说
-        interacted_mask = user_vector > 0
-        scores[interacted_mask] = -1
-        
-        # 获取top-N
-        top_indices = np.argsort(scores)[::-1][:n]
-        
-        results = []
-        for i in top_indices:
-            if scores[i] > 0:
-                results.append((self.novel_ids[i], float(scores[i])))
+        top_indices, top_scores = score_user_block(
+            self.user_item_matrix[[user_idx]], self.item_similarity, n
+        )
         
-        return results
+        return [
+            (self.novel_ids[i], float(score))
+            for i, score in zip(top_indices[0], top_scores[0])
+            if score > 0
+        ]
 
-    def save_similarity_to_db(self):
-        """将物品相似度矩阵保存到数据库"""
-        from recommendations.models import NovelSimilarity
+    def save_similarity_to_db(self, novel_indices: np.ndarray | None = None):
+        """将物品相似度矩阵保存到数据库
+        
+        Args:
+            novel_indices: 只重写这些小说（按矩阵下标）的相似度行，默认重写全部
+        """
         from novels.models import Novel
         
         if self.item_similarity is None:
             logger.warning("No similarity matrix to save")
             return
         
-        # 清除旧数据
-        NovelSimilarity.objects.filter(algorithm='item_cf').delete()
-        
-        # 构建novel_id到Novel实例的映射
-        novel_instances = {str(n.id): n for n in Novel.objects.filter(id__in=self.novel_ids)}
-        
-        # 保存top-K相似对
-        batch = []
-        for i, novel_a_id in enumerate(self.novel_ids):
-            if novel_a_id not in novel_instances:
-                continue
-            
-            similarities = self.item_similarity[i]
-            top_indices = np.argsort(similarities)[::-1][:self.top_k_similar]
-            
-            for j in top_indices:
-                if similarities[j] <= 0:
-                    break
-                
-                novel_b_id = self.novel_ids[j]
-                if novel_b_id not in novel_instances:
+        full = novel_indices is None
+        if full:
+            novel_indices = np.arange(len(self.novel_ids))
+        
+        existing_novels = {str(pk) for pk in Novel.objects.values_list('id', flat=True)}
+        
+        def records():
+            # 保存top-K相似对
+            for i in novel_indices:
+                novel_a_id = self.novel_ids[i]
+                if novel_a_id not in existing_novels:
                     continue
-                
-                batch.append(NovelSimilarity(
-                    novel_a=novel_instances[novel_a_id],
-                    novel_b=novel_instances[novel_b_id],
-                    similarity=float(similarities[j]),
-                    algorithm='item_cf'
-                ))
-        
-        # 批量插入
-        if batch:
-            with transaction.atomic():
-                NovelSimilarity.objects.bulk_create(batch, batch_size=1000)
-            logger.info(f"Saved {len(batch)} item-CF similarity records")
+                for j, score in row_top_items(self.item_similarity, i, self.top_k_similar):
+                    novel_b_id = self.novel_ids[j]
+                    if novel_b_id in existing_novels:
+                        yield novel_a_id, novel_b_id, score
+        
+        saved = replace_similarities(
+            'item_cf',
+            records(),
+            novel_ids=None if full else [self.novel_ids[i] for i in novel_indices],
+        )
+        logger.info(f"Saved {saved} item-CF similarity records for {len(novel_indices)} novels")
 
-    def save_recommendations_to_db(self, n_recommendations: int = 20):
-        """为所有用户计算推荐并保存到数据库"""
-        from recommendations.models import RecommendationCache
-        from novels.models import Novel
-        from users.models import User
-        
-        # 清除旧数据
-        RecommendationCache.objects.filter(algorithm='cf').delete()
-        
-        # 获取所有活跃用户
-        all_users = User.objects.filter(status='active').values_list('id', flat=True)
-        
-        # Novel实例映射
-        novel_instances = {str(n.id): n for n in Novel.objects.filter(status='published')}
-        user_instances = {str(u.id): u for u in User.objects.filter(status='active')}
-        
-        batch = []
-        processed = 0
-        
-        for user_id in all_users:
-            user_id_str = str(user_id)
-            recommendations = self.recommend_for_user(user_id_str, n_recommendations)
-            
-            for novel_id, score in recommendations:
-                if novel_id in novel_instances and user_id_str in user_instances:
-                    batch.append(RecommendationCache(
-                        user=user_instances[user_id_str],
-                        novel=novel_instances[novel_id],
-                        score=score,
-                        algorithm='cf'
-                    ))
-            
-            processed += 1
-            if processed % 100 == 0:
-                logger.info(f"Processed {processed} users")
-        
-        # 批量插入
-        if batch:
-            with transaction.atomic():
-                RecommendationCache.objects.bulk_create(batch, batch_size=1000)
-            logger.info(f"Saved {len(batch)} CF recommendation records for {processed} users")
+    def save_recommendations_to_db(self, n_recommendations: int = 20, user_ids: list[str] | None = None):
+        """批量计算推荐并保存到数据库
+        
+        Args:
+            user_ids: 只重写这些用户的推荐（增量更新时使用），默认重写全部活跃用户
+        """
+        # 活跃用户中在矩阵里的部分（冷启动用户没有CF推荐）
+        target_users = active_user_ids(user_ids)
+        user_indices = np.array(
+            [self.user_id_to_idx[uid] for uid in target_users if uid in self.user_id_to_idx],
+            dtype=np.int64,
+        )
+        
+        blocks = score_users(
+            self.user_item_matrix,
+            self.item_similarity,
+            n_recommendations,
+            user_indices=user_indices,
+            candidate_mask=published_novel_mask(self.novel_ids),
+            workers=self.workers,
+        )
+        records = scored_blocks_to_records(blocks, self.user_ids, self.novel_ids)
+        saved = replace_recommendations('cf', records, user_ids=user_ids)
+        logger.info(f"Saved {saved} CF recommendation records for {user_indices.size} users")
+
+    def save_state(self, state_dir: Path, watermark: datetime):
+        """将用户-物品矩阵、相似度 top-k 和ID列表保存为新版本的产物（可 mmap），供增量更新和在线服务使用"""
+        meta = {
+            'watermark': watermark.isoformat(),
+            'min_interactions': self.min_interactions,
+            'top_k_similar': self.top_k_similar,
+            'half_life_days': self.half_life_days,
+        }
+        save_artifacts(
+            state_dir,
+            ARTIFACT_NAME,
+            {
+                'user_item': self.user_item_matrix,
+                'item_similarity': self.item_similarity,
+                'user_ids': np.array(self.user_ids, dtype=str),
+                'novel_ids': np.array(self.novel_ids, dtype=str),
+            },
+            meta,
+        )
+        logger.info(f"Saved CF state to {state_dir} (watermark={meta['watermark']})")
+
+    def load_state(self, state_dir: Path, mmap: bool = True) -> datetime | None:
+        """从磁盘恢复上一次计算的状态（默认以 mmap 方式打开，更新时生成新矩阵而不修改原文件）
+        
+        Returns:
+            上一次计算的水位线时间；没有可用状态时返回 None
+        """
+        artifacts = load_artifacts(state_dir, ARTIFACT_NAME, mmap=mmap)
+        if artifacts is None:
+            return None
+        
+        meta = artifacts.meta
+        if meta.get('top_k_similar') != self.top_k_similar:
+            logger.warning("Stored CF state uses a different top_k, ignoring it")
+            return None
+        if meta.get('half_life_days') != self.half_life_days:
+            logger.warning("Stored CF state uses a different decay half-life, ignoring it")
+            return None
+        
+        self.user_item_matrix = artifacts['user_item']
+        self.item_similarity = artifacts['item_similarity']
+        self.user_ids = artifacts.ids('user_ids')
+        self.novel_ids = artifacts.ids('novel_ids')
+        self.user_id_to_idx = {uid: i for i, uid in enumerate(self.user_ids)}
+        self.novel_id_to_idx = {nid: i for i, nid in enumerate(self.novel_ids)}
+        
+        return datetime.fromisoformat(meta['watermark'])
+
+    def load_changed_user_ids(self, since: datetime) -> list[str]:
+        """查找水位线之后有交互新增、变更或取消收藏的用户"""
+        from interactions.models import Favorite, Rating, ReadHistory
+        
+        changed = set()
+        changed.update(Favorite.objects.filter(updated_at__gt=since).values_list('user_id', flat=True).distinct())
+        changed.update(Rating.objects.filter(updated_at__gt=since).values_list('user_id', flat=True).distinct())
+        changed.update(ReadHistory.objects.filter(last_read_at__gt=since).values_list('user_id', flat=True).distinct())
+        return sorted(str(user_id) for user_id in changed)
+
+    def apply_user_interactions(self, interactions: InteractionSet, user_ids: list[str]) -> np.ndarray:
+        """用最新的交互数据整行替换指定用户在矩阵中的行
+        
+        新出现的用户和小说追加到矩阵末尾（增量模式下不再做 min_interactions 过滤）
+        
+        Returns:
+            受影响（旧行或新行中出现过）的小说下标
+        """
+        for user_id in user_ids:
+            if user_id not in self.user_id_to_idx:
+                self.user_id_to_idx[user_id] = len(self.user_ids)
+                self.user_ids.append(user_id)
+        
+        for novel_id in map(str, interactions.novel_ids):
+            if novel_id not in self.novel_id_to_idx:
+                self.novel_id_to_idx[novel_id] = len(self.novel_ids)
+                self.novel_ids.append(novel_id)
+        
+        shape = (len(self.user_ids), len(self.novel_ids))
+        self.user_item_matrix.resize(shape)
+        self.item_similarity.resize((shape[1], shape[1]))
+        
+        user_indices = np.array([self.user_id_to_idx[uid] for uid in user_ids], dtype=np.int64)
+        old_items = self.user_item_matrix[user_indices].indices
+        
+        # 把本次加载的局部下标映射到全局矩阵下标
+        user_map = np.array([self.user_id_to_idx[str(uid)] for uid in interactions.user_ids], dtype=np.int64)
+        novel_map = np.array([self.novel_id_to_idx[str(nid)] for nid in interactions.novel_ids], dtype=np.int64)
+        new_rows = csr_matrix(
+            (
+                interactions.scores,
+                (user_map[interactions.rows], novel_map[interactions.cols]),
+            ),
+            shape=shape,
+            dtype=np.float32,
+        )
+        
+        self.user_item_matrix = replace_rows(self.user_item_matrix, user_indices, new_rows)
+        return np.union1d(old_items, new_rows.indices).astype(np.int64)
+
+    def update_item_similarity(self, touched_items: np.ndarray) -> np.ndarray:
+        """只重新计算受影响小说的相似度行
+        
+        受影响的小说包括：交互发生变化的小说，top-K 列表中引用了它们的小说，
+        以及与它们有共同用户的小说（相似度对称，这些小说的 top-K 中可能需要加入变化的小说）
+        
+        Returns:
+            重新计算过的小说下标
+        """
+        item_user_matrix = self.user_item_matrix.T.tocsr()
+        referencing = self.item_similarity[:, touched_items].tocoo().row
+        co_occurring = (item_user_matrix[touched_items] @ self.user_item_matrix).indices
+        affected = np.union1d(np.union1d(touched_items, referencing), co_occurring).astype(np.int64)
+        
+        updated_rows = topk_cosine_similarity(
+            item_user_matrix, self.top_k_similar, rows=affected, max_memory=self.max_memory
+        )
+        self.item_similarity = replace_rows(self.item_similarity, affected, updated_rows)
+        return affected
+
+    def run_incremental(self, state_dir: Path, n_recommendations: int = 20) -> list[str] | None:
+        """增量计算：只处理上次水位线之后发生变化的交互
+        
+        1. 从磁盘恢复上次的矩阵和相似度
+        2. 整行替换交互发生变化的用户
+        3. 只重新计算受影响小说的相似度，并只重写这些小说的 NovelSimilarity
+        4. 只重写交互过受影响小说的用户的 RecommendationCache
+        
+        没有可用的历史状态时退化为全量计算
+
+        Returns:
+            重写了推荐的用户ID列表；退化为全量计算时返回 None（全部用户）
+        """
+        watermark = self.load_state(state_dir)
+        if watermark is None:
+            logger.info("No previous CF state found, running full computation")
+            self.run(n_recommendations=n_recommendations, state_dir=state_dir)
+            return None
+        
+        started_at = timezone.now()
+        logger.info(f"Starting incremental CF computation since {watermark.isoformat()}...")
+        
+        changed_users = self.load_changed_user_ids(watermark)
+        if not changed_users:
+            logger.info("No interaction changes since last run")
+            self.save_state(state_dir, started_at)
+            return []
+        
+        interactions = self.load_interactions(user_ids=changed_users)
+        touched_items = self.apply_user_interactions(interactions, changed_users)
+        affected_items = self.update_item_similarity(touched_items)
+        
+        changed_user_indices = [self.user_id_to_idx[uid] for uid in changed_users]
+        affected_user_indices = np.union1d(
+            self.user_item_matrix[:, affected_items].tocoo().row,
+            changed_user_indices,
+        )
+        affected_users = [self.user_ids[i] for i in affected_user_indices]
+        
+        self.save_similarity_to_db(novel_indices=affected_items)
+        self.save_recommendations_to_db(n_recommendations, user_ids=affected_users)
+        self.save_state(state_dir, started_at)
+        
+        logger.info(
+            f"Incremental CF completed: {len(changed_users)} changed users, "
+            f"{len(affected_items)} novels and {len(affected_users)} users refreshed"
+        )
+        return affected_users
 
-    def run(self):
-        """执行完整的协同过滤推荐计算流程"""
+    def run(self, n_recommendations: int = 20, state_dir: Path | None = None):
+        """执行完整的协同过滤推荐计算流程
+        
+        Args:
+            state_dir: 计算完成后把状态保存到该目录，供后续增量计算使用
+        """
         logger.info("Starting Collaborative Filtering recommendation computation...")
+        started_at = timezone.now()
         
         # 1. 加载交互数据
-        df = self.load_interactions()
-        if df.empty:
+        interactions = self.load_interactions()
+        if interactions.empty:
             logger.warning("No interactions, skipping CF computation")
             return
         
         # 2. 构建用户-物品矩阵
-        if not self.build_user_item_matrix(df):
+        if not self.build_user_item_matrix(interactions):
             logger.warning("Failed to build matrix, skipping CF computation")
             return
         
@@ -324,6 +425,10 @@ class CollaborativeFilterRecommender:
         self.save_similarity_to_db()
         
         # 5. 为用户生成推荐并保存
-        self.save_recommendations_to_db()
+        self.save_recommendations_to_db(n_recommendations)
+        
+        # 6. 保存状态供增量计算使用
+        if state_dir is not None:
+            self.save_state(state_dir, started_at)
         
         logger.info("Collaborative Filtering computation completed!")
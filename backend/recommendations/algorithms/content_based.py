@@ -2,11 +2,19 @@
 基于内容的推荐算法实现
 
 使用小说的文本特征（简介、标签、分类）进行推荐：
-1. 使用 jieba 对中文简介进行分词
-2. 使用 TF-IDF 向量化小说特征
-3. 计算余弦相似度找到相似小说
+1. 使用 jieba 对中文简介进行分词（多进程并行，结果按文本哈希缓存在磁盘上）
+2. 在固定的哈希特征空间上计算 TF-IDF（见 features.py），特征下标在多次运行之间保持不变
+3. 分块计算余弦相似度，每个小说只保留 top-k 个相似小说
 4. 基于用户历史偏好构建用户画像，推荐相似内容
 
+指定 latent_dim 时先用 TruncatedSVD 把 TF-IDF 投影到约 128 维的 float32 潜在空间（LSA），
+相似度、用户画像打分和 ANN 索引都在潜在空间上计算：稠密小矩阵乘法代替高维稀疏乘法，
+还能匹配用词不同但主题相近的小说。NovelFeatureVector 仍保存原始 TF-IDF 向量。
+
+增量模式（run_incremental）只处理上次运行之后新增、修改（Novel.updated_at）或下架的小说：
+调整文档频率，只重新向量化这些小说，只重写它们的特征向量和受影响小说的相似度。
+未变化小说的向量沿用上次计算时的 IDF，全量运行时统一刷新。
+
 适用场景：
 - 冷启动：新小说没有交互数据时
 - 内容匹配：推荐与用户已读小说内容相似的作品
@@ -15,124 +23,260 @@
 from __future__ import annotations
 
 import logging
-import re
-from typing import TYPE_CHECKING
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator
 
-import jieba
 import numpy as np
 from django.db import transaction
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from django.utils import timezone
+from scipy.sparse import csr_matrix
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+
+from recommendations.algorithms.ann import IVFIndex
+from recommendations.algorithms.artifacts import load_artifacts, save_artifacts
+from recommendations.algorithms.features import DEFAULT_N_FEATURES, HashedTfidf, hashing_vectorizer
+from recommendations.algorithms.loader import InteractionSet, chunked, interacted_user_ids, load_interactions
+from recommendations.algorithms.scoring import ScoredBlock, score_factor_users, score_profile_users
+from recommendations.algorithms.similarity import replace_rows, row_top_items, topk_cosine_similarity
+from recommendations.algorithms.tokenization import (
+    TOKEN_CACHE_FILE,
+    TokenCache,
+    build_text,
+    text_hash,
+    tokenize,
+    tokenize_texts,
+)
+from recommendations.algorithms.storage import (
+    active_user_ids,
+    published_novel_mask,
+    replace_recommendations,
+    encode_sparse_rows,
+    replace_similarities,
+    scored_blocks_to_records,
+)
 
 if TYPE_CHECKING:
     from uuid import UUID
 
 logger = logging.getLogger(__name__)
 
+ARTIFACT_NAME = 'content'
+ANN_ARTIFACT_NAME = 'content_ann'
+LOAD_CHUNK_SIZE = 2000
+
+
+class ContentProjection:
+    """把小说文本映射到 ANN 索引的向量空间：哈希 TF-IDF（固定 IDF）+ SVD 降维
+
+    只保留 IDF 非零的特征列，SVD 基向量的大小与实际使用的特征数成正比，而不是哈希空间的维度。
+    随索引一起保存，用于在线计算离线任务之后新增小说的向量
+    """
+
+    def __init__(
+        self,
+        features: np.ndarray,
+        idf: np.ndarray,
+        components: np.ndarray | None = None,
+        n_features: int = DEFAULT_N_FEATURES,
+    ):
+        """
+        Args:
+            features: 使用的特征列（哈希下标）
+            idf: 这些特征列的 IDF
+            components: SVD 基向量，形状为 (维度, len(features))；为 None 时不降维
+        """
+        self.features = np.asarray(features, dtype=np.int64)
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.components = components
+        self.n_features = n_features
+        self._vectorizer = hashing_vectorizer(n_features)
+
+    def _select(self, matrix: csr_matrix) -> csr_matrix:
+        return matrix.tocsc()[:, self.features].tocsr()
+
+    def _reduce(self, selected: csr_matrix) -> np.ndarray:
+        vectors = selected @ self.components.T if self.components is not None else selected.toarray()
+        return np.asarray(vectors, dtype=np.float32)
+
+    def project(self, tfidf: csr_matrix) -> np.ndarray:
+        """已计算的 TF-IDF 向量 -> 索引空间的 float32 向量"""
+        return self._reduce(self._select(tfidf))
+
+    def transform(self, texts: list[str]) -> np.ndarray:
+        """已分词文本 -> 索引空间的 float32 向量（TF-IDF 做 l2 归一化后投影）"""
+        counts = self._select(self._vectorizer.transform(texts))
+        return self._reduce(normalize(counts.multiply(self.idf).tocsr()))
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        arrays = {'features': self.features, 'idf': self.idf}
+        if self.components is not None:
+            arrays['components'] = self.components
+        return arrays
+
+    def meta(self) -> dict:
+        return {'n_features': self.n_features}
+
+    @classmethod
+    def from_artifacts(cls, artifacts) -> ContentProjection:
+        components = np.asarray(artifacts['components']) if 'components' in artifacts else None
+        return cls(
+            np.asarray(artifacts['features']),
+            np.asarray(artifacts['idf']),
+            components,
+            artifacts.meta.get('n_features', DEFAULT_N_FEATURES),
+        )
+
 
 class ContentBasedRecommender:
     """基于内容的推荐器"""
 
-    def __init__(self, max_features: int = 3000, top_k_similar: int = 20):
+    def __init__(
+        self,
+        max_features: int = 3000,
+        top_k_similar: int = 20,
+        ann_dim: int = 64,
+        half_life_days: float | None = None,
+        max_memory: int | None = None,
+        workers: int = 1,
+        n_features: int = DEFAULT_N_FEATURES,
+        latent_dim: int | None = None,
+    ):
         """
         Args:
-            max_features: TF-IDF最大特征数
+            max_features: TF-IDF最大特征数（按文档频率保留），None 表示不限制
             top_k_similar: 每个小说保留的最相似小说数量
+            ann_dim: ANN 索引向量的维度（TF-IDF 经 SVD 降维）
+            half_life_days: 用户画像中交互权重时间衰减的半衰期（天），为 None 时不衰减
+            max_memory: 相似度计算的内存预算（字节），指定时按行块计算并把结果暂存到磁盘
+            workers: 并行分词使用的进程数
+            n_features: 哈希特征空间的维度
+            latent_dim: 相似度和推荐使用的潜在空间维度（TF-IDF 经 SVD 降维），为 None 时直接使用 TF-IDF
         """
         self.max_features = max_features
         self.top_k_similar = top_k_similar
-        
-        self.tfidf_vectorizer: TfidfVectorizer | None = None
-        self.novel_vectors: np.ndarray | None = None
+        self.ann_dim = ann_dim
+        self.half_life_days = half_life_days
+        self.max_memory = max_memory
+        self.workers = workers
+        self.n_features = n_features
+        self.latent_dim = latent_dim
+        
+        self.feature_space: HashedTfidf | None = None
+        # 词频（float32 CSR），增量更新时用于调整文档频率
+        self.term_counts: csr_matrix | None = None
+        # TF-IDF 向量（float32 CSR，行已 L2 归一化）
+        self.novel_vectors: csr_matrix | None = None
+        # 每一行对应的小说是否仍在架（增量模式下下架小说的行保留为空行）
+        self.live: np.ndarray | None = None
         self.novel_ids: list[str] = []
         self.novel_id_to_idx: dict[str, int] = {}
-        self.similarity_matrix: np.ndarray | None = None
-
-    def _tokenize_chinese(self, text: str) -> str:
-        """中文分词处理"""
-        # 清理文本
-        text = re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9]', ' ', text)
-        # jieba分词
-        tokens = jieba.cut(text)
-        return ' '.join(tokens)
+        # 每一行对应的小说文本的哈希（见 tokenization.text_hash），增量更新时据此跳过文本未变化的小说
+        self.text_hashes: list[str] = []
+        self.similarity_matrix: csr_matrix | None = None
+        # 潜在空间的投影和小说向量（float32 稠密，行已 L2 归一化，下架小说为零行），仅指定 latent_dim 时使用
+        self.latent_projection: ContentProjection | None = None
+        self.latent_vectors: np.ndarray | None = None
 
     def _build_novel_text(self, novel) -> str:
-        """构建小说的完整文本特征"""
-        parts = []
-        
-        # 标题（权重高，重复3次）
-        if novel.title:
-            parts.extend([novel.title] * 3)
-        
-        # 分类（权重高，重复3次）
-        if novel.category:
-            parts.extend([novel.category] * 3)
-        
-        # 标签（权重中等，重复2次）
-        if novel.tags:
-            for tag in novel.tags:
-                parts.extend([tag] * 2)
-        
-        # 简介
-        if novel.intro:
-            parts.append(novel.intro)
-        
-        # 作者
-        if novel.author:
-            parts.append(novel.author)
-        
-        full_text = ' '.join(parts)
-        return self._tokenize_chinese(full_text)
+        """构建小说的完整文本特征（已分词）"""
+        return tokenize(build_text(novel.title, novel.category, novel.tags, novel.intro, novel.author))
+
+    def load_novels(self, token_cache: TokenCache | None = None) -> list[str]:
+        """从数据库加载所有已发布小说的文本特征并分词
 
-    def load_novels(self):
-        """从数据库加载所有已发布小说"""
+        Args:
+            token_cache: 分词缓存，文本未变化的小说直接使用缓存的分词结果
+        """
         from novels.models import Novel
         
-        novels = Novel.objects.filter(status='published').order_by('id')
+        novels = Novel.objects.filter(status='published').order_by('id').values_list(
+            'id', 'title', 'category', 'tags', 'intro', 'author'
+        )
         
         self.novel_ids = []
-        texts = []
+        raw_texts = []
         
-        for novel in novels:
-            self.novel_ids.append(str(novel.id))
-            texts.append(self._build_novel_text(novel))
+        for novel_id, title, category, tags, intro, author in novels.iterator(chunk_size=LOAD_CHUNK_SIZE):
+            self.novel_ids.append(str(novel_id))
+            raw_texts.append(build_text(title, category, tags, intro, author))
         
         self.novel_id_to_idx = {nid: i for i, nid in enumerate(self.novel_ids)}
+        self.text_hashes = [text_hash(text) for text in raw_texts]
+        texts = tokenize_texts(raw_texts, workers=self.workers, cache=token_cache)
+        if token_cache is not None:
+            # 加载的是全部已发布小说，其余缓存条目已不再需要
+            token_cache.retain(set(self.text_hashes))
         
         logger.info(f"Loaded {len(self.novel_ids)} novels for content analysis")
         return texts
 
     def fit_transform(self, texts: list[str]) -> bool:
-        """向量化所有小说文本"""
+        """向量化所有小说文本（重新统计文档频率）"""
         if not texts:
             logger.warning("No texts to vectorize")
             return False
         
-        # 创建TF-IDF向量器
-        self.tfidf_vectorizer = TfidfVectorizer(
-            max_features=self.max_features,
-            min_df=2,  # 至少出现在2个文档中
-            max_df=0.8,  # 不超过80%的文档
-            ngram_range=(1, 2),  # 支持1-gram和2-gram
-        )
+        # min_df=2：至少出现在2个文档中；max_df=0.8：不超过80%的文档
+        self.feature_space = HashedTfidf(self.n_features, self.max_features, min_df=2, max_df=0.8)
+        self.term_counts = self.feature_space.counts(texts)
+        self.feature_space.fit(self.term_counts)
+        self.novel_vectors = self.feature_space.transform(self.term_counts)
+        self.live = np.ones(len(texts), dtype=bool)
         
-        try:
-            self.novel_vectors = self.tfidf_vectorizer.fit_transform(texts).toarray()
-            logger.info(f"Created TF-IDF vectors: {self.novel_vectors.shape}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to create TF-IDF vectors: {e}")
+        if self.novel_vectors.nnz == 0:
+            logger.error("No features remain after document frequency filtering")
             return False
+        logger.info(f"Created TF-IDF vectors: {self.novel_vectors.shape} ({self.novel_vectors.nnz} non-zeros)")
+        return True
+
+    def _fit_projection(self, dim: int) -> tuple[ContentProjection, np.ndarray]:
+        """在在架小说的 TF-IDF 向量上训练 SVD 投影
 
-    def compute_similarity_matrix(self):
-        """计算小说间的余弦相似度矩阵"""
+        Returns:
+            (投影, 在架小说投影后的 float32 向量)
+        """
+        live = np.flatnonzero(self.live)
+        idf = self.feature_space.idf()
+        features = np.flatnonzero(idf)
+        vectors = self.novel_vectors[live].tocsc()[:, features].tocsr()
+        components = None
+        n_components = min(dim, vectors.shape[0] - 1)
+        if n_components < vectors.shape[1] and n_components >= 2:
+            svd = TruncatedSVD(n_components=n_components, random_state=42)
+            vectors = svd.fit_transform(vectors)
+            components = svd.components_.astype(np.float32)
+        else:
+            # 特征数不超过目标维度时直接使用 TF-IDF 向量
+            vectors = vectors.toarray()
+
+        projection = ContentProjection(features, idf[features], components, self.feature_space.n_features)
+        return projection, np.asarray(vectors, dtype=np.float32)
+
+    def compute_latent_vectors(self) -> np.ndarray:
+        """把 TF-IDF 向量投影到 latent_dim 维的潜在空间"""
+        if self.novel_vectors is None:
+            raise ValueError("Must fit_transform first")
+
+        self.latent_projection, vectors = self._fit_projection(self.latent_dim)
+        self.latent_vectors = np.zeros((len(self.novel_ids), vectors.shape[1]), dtype=np.float32)
+        self.latent_vectors[self.live] = normalize(vectors)
+        logger.info(f"Projected content vectors to latent space: {self.latent_vectors.shape}")
+        return self.latent_vectors
+
+    def _similarity_vectors(self) -> csr_matrix | np.ndarray:
+        """计算小说间相似度使用的向量：潜在空间向量（若有）或 TF-IDF 向量"""
+        return self.latent_vectors if self.latent_vectors is not None else self.novel_vectors
+
+    def compute_similarity_matrix(self) -> csr_matrix:
+        """计算小说间的余弦相似度，每个小说只保留 top_k_similar 个（float32 分块计算，对角线为零）"""
         if self.novel_vectors is None:
             raise ValueError("Must fit_transform first")
         
-        self.similarity_matrix = cosine_similarity(self.novel_vectors)
-        
-        # 对角线置零
-        np.fill_diagonal(self.similarity_matrix, 0)
+        self.similarity_matrix = topk_cosine_similarity(
+            self._similarity_vectors(), self.top_k_similar, max_memory=self.max_memory
+        )
         
         logger.info(f"Computed content similarity matrix: {self.similarity_matrix.shape}")
         return self.similarity_matrix
@@ -150,16 +294,7 @@ class ContentBasedRecommender:
             return []
         
         idx = self.novel_id_to_idx[novel_id]
-        similarities = self.similarity_matrix[idx]
-        
-        top_indices = np.argsort(similarities)[::-1][:n]
-        
-        results = []
-        for i in top_indices:
-            if similarities[i] > 0:
-                results.append((self.novel_ids[i], float(similarities[i])))
-        
-        return results
+        return [(self.novel_ids[j], score) for j, score in row_top_items(self.similarity_matrix, idx, n)]
 
     def recommend_for_user(self, user_id: str, n: int = 20) -> list[tuple[str, float]]:
         """基于用户历史偏好推荐（Content-Based）
@@ -170,71 +305,175 @@ class ContentBasedRecommender:
         Returns:
             List of (novel_id, score)
         """
-        from interactions.models import Favorite, Rating, ReadHistory
-        
         if self.novel_vectors is None:
             return []
         
-        favorite_weight = 0.8
-        rating_weight = 0.2
-        read_weight = 0.5
-
-        weights_by_novel: dict[str, float] = {}
-
-        favorites = Favorite.objects.filter(user_id=user_id, deleted_at__isnull=True).values_list('novel_id', flat=True)
-        for novel_id in favorites:
-            key = str(novel_id)
-            weights_by_novel[key] = max(weights_by_novel.get(key, 0.0), favorite_weight)
-
-        ratings = Rating.objects.filter(user_id=user_id).values_list('novel_id', 'score')
-        for novel_id, score in ratings:
-            key = str(novel_id)
-            weighted_score = (score / 5.0) * rating_weight
-            weights_by_novel[key] = max(weights_by_novel.get(key, 0.0), weighted_score)
-
-        history = ReadHistory.objects.filter(user_id=user_id).values_list('novel_id', flat=True)
-        for novel_id in history:
-            key = str(novel_id)
-            weights_by_novel[key] = max(weights_by_novel.get(key, 0.0), read_weight)
+        interactions = load_interactions(user_ids=[user_id], half_life_days=self.half_life_days)
+        weights_by_novel: dict[str, float] = {
+            str(interactions.novel_ids[col]): float(score)
+            for col, score in zip(interactions.cols, interactions.scores)
+        }
 
         if not weights_by_novel:
             # 冷启动用户
             return []
         
-        # 构建用户画像向量（已交互小说向量的加权平均）
-        user_vector = np.zeros(self.novel_vectors.shape[1])
-        total_weight = 0.0
-        for novel_id, weight in weights_by_novel.items():
-            if novel_id in self.novel_id_to_idx:
-                idx = self.novel_id_to_idx[novel_id]
-                user_vector += self.novel_vectors[idx] * weight
-                total_weight += weight
-
-        if total_weight == 0:
+        known = [
+            (self.novel_id_to_idx[novel_id], weight)
+            for novel_id, weight in weights_by_novel.items()
+            if novel_id in self.novel_id_to_idx
+        ]
+        if not known:
             return []
 
-        user_vector /= total_weight
-        
-        # 计算用户画像与所有小说的相似度
-        scores = cosine_similarity([user_vector], self.novel_vectors)[0]
-        
-        # 排除已交互的小说
-        for novel_id in weights_by_novel:
-            if novel_id in self.novel_id_to_idx:
-                scores[self.novel_id_to_idx[novel_id]] = -1
-        
-        # 获取top-N
-        top_indices = np.argsort(scores)[::-1][:n]
-        
-        results = []
-        for i in top_indices:
-            if scores[i] > 0:
-                results.append((self.novel_ids[i], float(scores[i])))
-        
-        return results
+        # 构建用户画像（已交互小说向量的加权和；余弦相似度与是否除以总权重无关）
+        cols = np.array([idx for idx, _ in known], dtype=np.int32)
+        weights = np.array([weight for _, weight in known], dtype=np.float32)
+        if self.latent_vectors is not None:
+            # 潜在空间：稠密画像，与全部小说向量做一次矩阵-向量乘法
+            profile = weights @ self.latent_vectors[cols]
+            norm = np.linalg.norm(profile)
+            if norm == 0:
+                return []
+            values = self.latent_vectors @ profile / norm
+            candidates = np.arange(values.size)
+        else:
+            selector = csr_matrix((weights, cols, np.array([0, cols.size])), shape=(1, len(self.novel_ids)))
+            profile = (selector @ self.novel_vectors).tocsr()
+            norm = np.sqrt(np.dot(profile.data, profile.data))
+            if norm == 0:
+                return []
+
+            # 小说向量已 L2 归一化，余弦相似度即点积除以画像范数；结果只在有共同词项的小说上非零
+            scores = (self.novel_vectors @ profile.T).tocoo()
+            candidates, values = scores.row, scores.data / norm
+
+        # 排除已交互的小说，argpartition 取 top-N
+        keep = ~np.isin(candidates, cols) & (values > 0)
+        candidates, values = candidates[keep], values[keep]
+        if values.size > n:
+            top = np.argpartition(-values, n - 1)[:n]
+            candidates, values = candidates[top], values[top]
+        order = np.argsort(-values, kind='stable')
+        return [(self.novel_ids[candidates[i]], float(values[i])) for i in order]
+
+    def build_ann_index(
+        self,
+        previous: tuple[ContentProjection, np.ndarray] | None = None,
+    ) -> tuple[IVFIndex, ContentProjection]:
+        """用 SVD 降维后的在架小说向量构建 ANN 索引
+
+        指定了 latent_dim 时直接使用潜在空间的向量和投影，不再单独训练 SVD
+
+        Args:
+            previous: 上一版本索引的 (投影, 簇质心)；指定时沿用它们，只重新投影和分配向量
+        """
+        if self.novel_vectors is None:
+            raise ValueError("Must fit_transform first")
+
+        live = np.flatnonzero(self.live)
+        ids = [self.novel_ids[i] for i in live]
+        if self.latent_vectors is not None:
+            vectors = self.latent_vectors[live]
+            centroids = None
+            if previous is not None and previous[1].shape[1] == vectors.shape[1]:
+                centroids = previous[1]
+            return IVFIndex.build(ids, vectors, centroids=centroids), self.latent_projection
+        if previous is not None:
+            projection, centroids = previous
+            return IVFIndex.build(ids, projection.project(self.novel_vectors[live]), centroids=centroids), projection
+
+        projection, vectors = self._fit_projection(self.ann_dim)
+        return IVFIndex.build(ids, vectors), projection
+
+    def save_ann_index(self, state_dir: Path, incremental: bool = False):
+        """构建 ANN 索引并连同投影参数保存为新版本的产物
+
+        Args:
+            incremental: 沿用当前版本索引的投影和簇质心（特征空间一致时），不重新训练 SVD 和 k-means
+        """
+        previous = None
+        if incremental:
+            loaded = IVFIndex.load(state_dir, ANN_ARTIFACT_NAME)
+            if loaded is not None:
+                index, artifacts = loaded
+                if 'idf' in artifacts and artifacts.meta.get('n_features') == self.feature_space.n_features:
+                    previous = (ContentProjection.from_artifacts(artifacts), np.asarray(index.centroids))
+        index, projection = self.build_ann_index(previous)
+        index.save(state_dir, ANN_ARTIFACT_NAME, meta=projection.meta(), **projection.to_arrays())
+
+    def save_state(self, state_dir: Path, watermark: datetime):
+        """把词频、文档频率、小说向量、相似度 top-k 和ID列表保存为新版本的产物（可 mmap），供增量更新使用"""
+        if self.novel_vectors is None:
+            raise ValueError("Must fit_transform first")
+        arrays = {
+            'novel_ids': np.array(self.novel_ids, dtype=str),
+            'live': self.live,
+            'term_counts': self.term_counts,
+            'novel_vectors': self.novel_vectors,
+            'df': self.feature_space.df,
+            'text_hashes': np.array(self.text_hashes, dtype=str),
+        }
+        if self.similarity_matrix is not None:
+            arrays['similarity'] = self.similarity_matrix
+        if self.latent_vectors is not None:
+            arrays['latent_vectors'] = self.latent_vectors
+            arrays.update({f'latent_{key}': value for key, value in self.latent_projection.to_arrays().items()})
+        meta = {
+            'watermark': watermark.isoformat(),
+            'top_k_similar': self.top_k_similar,
+            'latent_dim': self.latent_dim,
+            **self.feature_space.meta(),
+        }
+        save_artifacts(state_dir, ARTIFACT_NAME, arrays, meta)
+        logger.info(f"Saved content state to {state_dir} (watermark={meta['watermark']})")
+
+    def load_state(self, state_dir: Path, mmap: bool = True) -> datetime | None:
+        """从磁盘恢复上一次计算的状态（默认以 mmap 方式打开，更新时生成新矩阵而不修改原文件）
 
-    def save_feature_vectors_to_db(self):
-        """将小说特征向量保存到数据库"""
+        Returns:
+            上一次计算的水位线时间；没有可用状态或参数不一致时返回 None
+        """
+        artifacts = load_artifacts(state_dir, ARTIFACT_NAME, mmap=mmap)
+        if artifacts is None:
+            return None
+
+        meta = artifacts.meta
+        if (
+            meta.get('n_features') != self.n_features
+            or meta.get('max_features') != self.max_features
+            or meta.get('top_k_similar') != self.top_k_similar
+            or meta.get('latent_dim') != self.latent_dim
+            or 'similarity' not in artifacts
+        ):
+            logger.warning("Stored content state uses different parameters, ignoring it")
+            return None
+
+        self.novel_ids = artifacts.ids('novel_ids')
+        self.novel_id_to_idx = {nid: i for i, nid in enumerate(self.novel_ids)}
+        # 旧版本的状态没有文本哈希，视为全部需要重新处理
+        self.text_hashes = artifacts.ids('text_hashes') if 'text_hashes' in artifacts else [''] * len(self.novel_ids)
+        self.live = np.array(artifacts['live'], dtype=bool)
+        self.term_counts = artifacts['term_counts']
+        self.novel_vectors = artifacts['novel_vectors']
+        self.similarity_matrix = artifacts['similarity']
+        self.feature_space = HashedTfidf.from_state(artifacts['df'], meta)
+        if self.latent_dim is not None:
+            self.latent_vectors = artifacts['latent_vectors']
+            self.latent_projection = ContentProjection(
+                np.asarray(artifacts['latent_features']),
+                np.asarray(artifacts['latent_idf']),
+                np.asarray(artifacts['latent_components']) if 'latent_components' in artifacts else None,
+                self.n_features,
+            )
+        return datetime.fromisoformat(meta['watermark'])
+
+    def save_feature_vectors_to_db(self, novel_indices: np.ndarray | None = None):
+        """将小说特征向量保存到数据库
+
+        Args:
+            novel_indices: 只重写这些小说的特征向量（增量更新时使用），默认重写全部
+        """
         from recommendations.models import NovelFeatureVector
         from novels.models import Novel
         
@@ -242,116 +481,357 @@ class ContentBasedRecommender:
             logger.warning("No vectors to save")
             return
         
-        # 清除旧数据
-        NovelFeatureVector.objects.all().delete()
-        
-        novel_instances = {str(n.id): n for n in Novel.objects.filter(id__in=self.novel_ids)}
+        full = novel_indices is None
+        if full:
+            novel_indices = np.arange(len(self.novel_ids))
+        target_ids = [self.novel_ids[i] for i in novel_indices]
         
-        batch = []
-        for i, novel_id in enumerate(self.novel_ids):
-            if novel_id not in novel_instances:
-                continue
-            
-            # 稀疏表示：只保存非零元素
-            vector = self.novel_vectors[i]
-            sparse_dict = {int(j): float(v) for j, v in enumerate(vector) if v > 0}
-            
-            batch.append(NovelFeatureVector(
-                novel=novel_instances[novel_id],
-                vector_data=sparse_dict
-            ))
+        # 清除旧数据
+        if full:
+            NovelFeatureVector.objects.all().delete()
+        else:
+            for chunk in chunked(target_ids):
+                NovelFeatureVector.objects.filter(novel_id__in=chunk).delete()
+        
+        existing_novels = set()
+        for chunk in chunked(target_ids):
+            existing_novels.update(str(pk) for pk in Novel.objects.filter(id__in=chunk).values_list('id', flat=True))
+        
+        live = [i for i in novel_indices if self.live[i] and self.novel_ids[i] in existing_novels]
+        batch = [
+            NovelFeatureVector(novel_id=self.novel_ids[i], indices=indices, values=values)
+            for i, indices, values in encode_sparse_rows(self.novel_vectors, live)
+        ]
         
         if batch:
             with transaction.atomic():
                 NovelFeatureVector.objects.bulk_create(batch, batch_size=500)
             logger.info(f"Saved {len(batch)} feature vectors")
 
-    def save_similarity_to_db(self):
-        """将内容相似度矩阵保存到数据库"""
-        from recommendations.models import NovelSimilarity
+    def save_similarity_to_db(self, novel_indices: np.ndarray | None = None):
+        """将内容相似度矩阵保存到数据库（写入新版本后切换）
+
+        Args:
+            novel_indices: 只重写这些小说的相似度（增量更新时使用），默认重写全部
+        """
         from novels.models import Novel
         
         if self.similarity_matrix is None:
             logger.warning("No similarity matrix to save")
             return
         
-        # 清除旧数据
-        NovelSimilarity.objects.filter(algorithm='content').delete()
-        
-        novel_instances = {str(n.id): n for n in Novel.objects.filter(id__in=self.novel_ids)}
+        full = novel_indices is None
+        if full:
+            novel_indices = np.arange(len(self.novel_ids))
+        existing_novels = {str(pk) for pk in Novel.objects.values_list('id', flat=True)}
         
-        batch = []
-        for i, novel_a_id in enumerate(self.novel_ids):
-            if novel_a_id not in novel_instances:
-                continue
-            
-            similarities = self.similarity_matrix[i]
-            top_indices = np.argsort(similarities)[::-1][:self.top_k_similar]
-            
-            for j in top_indices:
-                if similarities[j] <= 0.1:  # 相似度阈值
-                    break
-                
-                novel_b_id = self.novel_ids[j]
-                if novel_b_id not in novel_instances:
+        def records():
+            for i in novel_indices:
+                novel_a_id = self.novel_ids[i]
+                if novel_a_id not in existing_novels:
                     continue
                 
-                batch.append(NovelSimilarity(
-                    novel_a=novel_instances[novel_a_id],
-                    novel_b=novel_instances[novel_b_id],
-                    similarity=float(similarities[j]),
-                    algorithm='content'
-                ))
-        
-        if batch:
-            with transaction.atomic():
-                NovelSimilarity.objects.bulk_create(batch, batch_size=1000)
-            logger.info(f"Saved {len(batch)} content similarity records")
+                for j, similarity in row_top_items(self.similarity_matrix, i, self.top_k_similar):
+                    if similarity <= 0.1:  # 相似度阈值
+                        break
+                    
+                    novel_b_id = self.novel_ids[j]
+                    if novel_b_id in existing_novels:
+                        yield novel_a_id, novel_b_id, similarity
+        
+        saved = replace_similarities(
+            'content',
+            records(),
+            novel_ids=None if full else [self.novel_ids[i] for i in novel_indices],
+        )
+        logger.info(f"Saved {saved} content similarity records for {len(novel_indices)} novels")
 
-    def save_recommendations_to_db(self, n_recommendations: int = 20):
-        """为所有用户计算内容推荐并保存到数据库"""
-        from recommendations.models import RecommendationCache
-        from novels.models import Novel
-        from users.models import User
+    def user_novel_weights(self, interactions: InteractionSet) -> csr_matrix:
+        """把交互数据映射为 用户 × 小说（本推荐器的小说下标）的稀疏权重矩阵，不在向量中的小说被忽略"""
+        col_map = np.array(
+            [self.novel_id_to_idx.get(str(nid), -1) for nid in interactions.novel_ids],
+            dtype=np.int64,
+        )
+        cols = col_map[interactions.cols]
+        keep = cols >= 0
+        return csr_matrix(
+            (interactions.scores[keep], (interactions.rows[keep], cols[keep])),
+            shape=(len(interactions.user_ids), len(self.novel_ids)),
+            dtype=np.float32,
+        )
+
+    def score_users(
+        self,
+        weights: csr_matrix,
+        n: int,
+        user_indices: np.ndarray | None = None,
+        candidate_mask: np.ndarray | None = None,
+    ) -> Iterator[ScoredBlock]:
+        """按用户分块计算画像（已交互小说向量的加权和）与小说向量的余弦相似度，屏蔽已交互的小说后取 top-n
+
+        Args:
+            weights: user_novel_weights() 得到的 用户 × 小说 权重矩阵
+        """
+        if self.latent_vectors is not None:
+            # 潜在空间：画像与小说向量都已归一化，按矩阵分解因子的方式用稠密点积打分
+            return score_factor_users(
+                weights,
+                normalize(weights @ self.latent_vectors),
+                self.latent_vectors,
+                n,
+                user_indices=user_indices,
+                candidate_mask=candidate_mask,
+            )
+        return score_profile_users(
+            weights,
+            weights @ self.novel_vectors,
+            self.novel_vectors,
+            n,
+            user_indices=user_indices,
+            candidate_mask=candidate_mask,
+        )
+
+    def save_recommendations_to_db(self, n_recommendations: int = 20, user_ids: list[str] | None = None):
+        """批量计算内容推荐并保存到数据库
+
+        1. 一次加载交互，构建 用户 × 小说 的稀疏权重矩阵
+        2. 一次稀疏矩阵乘法得到所有用户画像（已交互小说向量的加权和）
+        3. 按用户分块计算画像与小说向量的余弦相似度，屏蔽已交互和未发布的小说后取 top-n
+
+        Args:
+            user_ids: 只重写这些用户的推荐（在当前版本中原地替换），默认为全部活跃用户写入新版本后切换
+        """
+        if self.novel_vectors is None:
+            logger.warning("No vectors, skipping content recommendations")
+            return
         
-        # 清除旧数据
-        RecommendationCache.objects.filter(algorithm='content').delete()
-        
-        all_users = User.objects.filter(status='active').values_list('id', flat=True)
-        novel_instances = {str(n.id): n for n in Novel.objects.filter(status='published')}
-        user_instances = {str(u.id): u for u in User.objects.filter(status='active')}
-        
-        batch = []
-        processed = 0
-        
-        for user_id in all_users:
-            user_id_str = str(user_id)
-            recommendations = self.recommend_for_user(user_id_str, n_recommendations)
-            
-            for novel_id, score in recommendations:
-                if novel_id in novel_instances and user_id_str in user_instances:
-                    batch.append(RecommendationCache(
-                        user=user_instances[user_id_str],
-                        novel=novel_instances[novel_id],
-                        score=score,
-                        algorithm='content'
-                    ))
-            
-            processed += 1
-            if processed % 100 == 0:
-                logger.info(f"Processed {processed} users")
+        target_users = user_ids
+        interactions = load_interactions(user_ids=target_users, half_life_days=self.half_life_days)
+        user_ids = [str(uid) for uid in interactions.user_ids]
+        weights = self.user_novel_weights(interactions)
         
-        if batch:
-            with transaction.atomic():
-                RecommendationCache.objects.bulk_create(batch, batch_size=1000)
-            logger.info(f"Saved {len(batch)} content recommendation records for {processed} users")
+        active = set(active_user_ids(target_users))
+        user_indices = np.array([i for i, uid in enumerate(user_ids) if uid in active], dtype=np.int64)
+        
+        blocks = self.score_users(
+            weights,
+            n_recommendations,
+            user_indices=user_indices,
+            candidate_mask=published_novel_mask(self.novel_ids) & self.live,
+        )
+        saved = replace_recommendations(
+            'content', scored_blocks_to_records(blocks, user_ids, self.novel_ids), target_users
+        )
+        logger.info(f"Saved {saved} content recommendation records for {user_indices.size} users")
 
-    def run(self):
-        """执行完整的内容推荐计算流程"""
+    def load_changed_novels(
+        self, since: datetime, token_cache: TokenCache | None = None, revived_ids: list[str] | None = None
+    ) -> tuple[list[str], list[str], list[str]]:
+        """加载水位线之后文本有变化的已发布小说并分词
+
+        updated_at 在每次浏览详情页时也会更新，水位线只用于缩小候选范围；
+        候选小说先按拼接后的文本计算哈希，与上次处理时的哈希相同且仍在架的小说直接跳过，不分词也不重算相似度
+
+        Args:
+            revived_ids: 已发布但不在状态中或已标记下架的小说ID（重新上架只改 status，不会更新 updated_at），
+                无论 updated_at 如何都作为候选
+
+        Returns:
+            (小说ID列表, 分词后的文本列表, 文本哈希列表)
+        """
+        from novels.models import Novel
+
+        columns = ('id', 'title', 'category', 'tags', 'intro', 'author')
+        published = Novel.objects.filter(status='published').order_by('id')
+
+        def candidates() -> Iterator[tuple]:
+            seen = set()
+            for row in published.filter(updated_at__gt=since).values_list(*columns).iterator(chunk_size=LOAD_CHUNK_SIZE):
+                seen.add(str(row[0]))
+                yield row
+            remaining = [novel_id for novel_id in revived_ids or () if novel_id not in seen]
+            for chunk in chunked(remaining):
+                yield from published.filter(id__in=chunk).values_list(*columns)
+
+        novel_ids = []
+        raw_texts = []
+        hashes = []
+        skipped = 0
+        for novel_id, title, category, tags, intro, author in candidates():
+            novel_id = str(novel_id)
+            raw_text = build_text(title, category, tags, intro, author)
+            digest = text_hash(raw_text)
+            idx = self.novel_id_to_idx.get(novel_id)
+            if idx is not None and self.live[idx] and self.text_hashes[idx] == digest:
+                skipped += 1
+                continue
+            novel_ids.append(novel_id)
+            raw_texts.append(raw_text)
+            hashes.append(digest)
+        if skipped:
+            logger.info(f"Skipped {skipped} updated novels whose text did not change")
+        return novel_ids, tokenize_texts(raw_texts, workers=self.workers, cache=token_cache), hashes
+
+    def apply_novel_changes(
+        self, novel_ids: list[str], texts: list[str], removed: np.ndarray, text_hashes: list[str] | None = None
+    ) -> np.ndarray:
+        """用新文本替换指定小说的词频和向量，清空下架小说的行，并相应调整文档频率
+
+        新出现的小说追加到矩阵末尾
+
+        Returns:
+            发生变化的小说下标
+        """
+        for novel_id in novel_ids:
+            if novel_id not in self.novel_id_to_idx:
+                self.novel_id_to_idx[novel_id] = len(self.novel_ids)
+                self.novel_ids.append(novel_id)
+                self.text_hashes.append('')
+        for novel_id, digest in zip(novel_ids, text_hashes or ()):
+            self.text_hashes[self.novel_id_to_idx[novel_id]] = digest
+
+        n_novels = len(self.novel_ids)
+        self.term_counts.resize((n_novels, self.feature_space.n_features))
+        self.novel_vectors.resize((n_novels, self.feature_space.n_features))
+        self.similarity_matrix.resize((n_novels, n_novels))
+        self.live = np.concatenate([self.live, np.zeros(n_novels - self.live.size, dtype=bool)])
+
+        changed = np.array([self.novel_id_to_idx[nid] for nid in novel_ids], dtype=np.int64)
+        touched = np.union1d(changed, removed).astype(np.int64)
+
+        # 先减去旧文本的文档频率，再加上新文本的
+        self.feature_space.remove_documents(self.term_counts[touched[self.live[touched]]])
+        self.live[removed] = False
+        if not novel_ids:
+            # 只有下架：清空这些行即可（HashingVectorizer 和 normalize 都不接受空输入）
+            empty = csr_matrix((n_novels, self.feature_space.n_features), dtype=np.float32)
+            self.term_counts = replace_rows(self.term_counts, touched, empty)
+            self.novel_vectors = replace_rows(self.novel_vectors, touched, empty)
+            if self.latent_vectors is not None:
+                self.latent_vectors = self.latent_vectors.copy()
+                self.latent_vectors[touched] = 0
+            return touched
+        counts = self.feature_space.counts(texts)
+        self.feature_space.add_documents(counts)
+        self.live[changed] = True
+
+        vectors = self.feature_space.transform(counts)
+        self.term_counts = replace_rows(self.term_counts, touched, _place_rows(counts, changed, n_novels))
+        self.novel_vectors = replace_rows(self.novel_vectors, touched, _place_rows(vectors, changed, n_novels))
+        if self.latent_vectors is not None:
+            # 沿用已保存的 SVD 投影，只投影变化的小说
+            latent = np.zeros((n_novels, self.latent_vectors.shape[1]), dtype=np.float32)
+            latent[:self.latent_vectors.shape[0]] = self.latent_vectors
+            latent[touched] = 0
+            latent[changed] = normalize(self.latent_projection.project(vectors))
+            self.latent_vectors = latent
+        return touched
+
+    def update_similarity(self, touched: np.ndarray) -> np.ndarray:
+        """只重新计算受影响小说的相似度行
+
+        受影响的小说包括：变化的小说，top-K 列表中引用了它们的小说，以及变化后与它们最相似的小说
+        （这些小说的 top-K 中很可能需要加入变化的小说）
+
+        Returns:
+            重新计算过的小说下标
+        """
+        referencing = self.similarity_matrix[:, touched].tocoo().row
+        changed = touched[self.live[touched]]
+        neighbours = np.empty(0, dtype=np.int64)
+        if changed.size:
+            neighbours = topk_cosine_similarity(
+                self._similarity_vectors(), self.top_k_similar, rows=changed, max_memory=self.max_memory
+            ).indices
+        affected = np.union1d(np.union1d(touched, referencing), neighbours).astype(np.int64)
+
+        updated_rows = topk_cosine_similarity(
+            self._similarity_vectors(), self.top_k_similar, rows=affected, max_memory=self.max_memory
+        )
+        self.similarity_matrix = replace_rows(self.similarity_matrix, affected, updated_rows)
+        return affected
+
+    def run_incremental(self, state_dir: Path, n_recommendations: int = 20) -> list[str] | None:
+        """增量计算：只处理上次水位线之后新增、修改、下架或重新上架的小说
+
+        1. 从磁盘恢复上次的词频、文档频率、向量和相似度
+        2. 只对变化的小说分词和向量化，并调整文档频率
+        3. 只重新计算受影响小说的相似度，并只重写这些小说的 NovelFeatureVector 和 NovelSimilarity
+        4. 只重新生成交互过变化或下架小说的用户的内容推荐（这些用户的画像变了），
+           沿用上一版本的 SVD 投影和簇质心更新 ANN 索引
+
+        其他用户的推荐列表要到下一次全量计算才会加入新上架或改动的小说；下架的小说在读取时按状态过滤。
+
+        没有可用的历史状态时退化为全量计算
+
+        Returns:
+            重写了推荐的用户ID列表；重写了全部用户时返回 None
+        """
+        from novels.models import Novel
+
+        watermark = self.load_state(state_dir)
+        if watermark is None:
+            logger.info("No previous content state found, running full computation")
+            self.run(state_dir=state_dir, n_recommendations=n_recommendations)
+            return None
+
+        started_at = timezone.now()
+        logger.info(f"Starting incremental content computation since {watermark.isoformat()}...")
+
+        published = {str(pk) for pk in Novel.objects.filter(status='published').values_list('id', flat=True)}
+        revived = sorted(
+            novel_id
+            for novel_id in published
+            if novel_id not in self.novel_id_to_idx or not self.live[self.novel_id_to_idx[novel_id]]
+        )
+        token_cache = TokenCache(Path(state_dir) / TOKEN_CACHE_FILE)
+        try:
+            changed_ids, texts, hashes = self.load_changed_novels(watermark, token_cache, revived)
+        finally:
+            token_cache.close()
+        removed = np.array(
+            [i for i, novel_id in enumerate(self.novel_ids) if self.live[i] and novel_id not in published],
+            dtype=np.int64,
+        )
+
+        if not changed_ids and not removed.size:
+            logger.info("No novel changes since last run")
+            self.save_state(state_dir, started_at)
+            return []
+
+        touched = self.apply_novel_changes(changed_ids, texts, removed, hashes)
+        affected = self.update_similarity(touched)
+        affected_users = interacted_user_ids([self.novel_ids[i] for i in touched])
+
+        self.save_feature_vectors_to_db(touched)
+        self.save_similarity_to_db(affected)
+        if affected_users:
+            self.save_recommendations_to_db(n_recommendations, user_ids=affected_users)
+        self.save_state(state_dir, started_at)
+        self.save_ann_index(state_dir, incremental=True)
+
+        logger.info(
+            f"Incremental content computation completed: {len(changed_ids)} changed and {removed.size} removed novels, "
+            f"{affected.size} similarity rows and {len(affected_users)} users refreshed"
+        )
+        return affected_users
+
+    def run(self, state_dir: Path | None = None, n_recommendations: int = 20):
+        """执行完整的内容推荐计算流程
+
+        Args:
+            state_dir: 计算完成后把状态和 ANN 索引保存为该目录下的产物（供增量计算和在线服务使用），为 None 时不保存
+        """
         logger.info("Starting Content-Based recommendation computation...")
+        started_at = timezone.now()
         
-        # 1. 加载小说数据
-        texts = self.load_novels()
+        # 1. 加载小说数据并分词（有状态目录时复用其中的分词缓存）
+        token_cache = TokenCache(Path(state_dir) / TOKEN_CACHE_FILE) if state_dir is not None else None
+        try:
+            texts = self.load_novels(token_cache)
+        finally:
+            if token_cache is not None:
+                token_cache.close()
         if not texts:
             logger.warning("No novels to process")
             return
@@ -360,6 +840,8 @@ class ContentBasedRecommender:
         if not self.fit_transform(texts):
             logger.warning("Failed to vectorize, skipping content computation")
             return
+        if self.latent_dim is not None:
+            self.compute_latent_vectors()
         
         # 3. 计算相似度矩阵
         self.compute_similarity_matrix()
@@ -371,6 +853,21 @@ class ContentBasedRecommender:
         self.save_similarity_to_db()
         
         # 6. 为用户生成推荐并保存
-        self.save_recommendations_to_db()
+        self.save_recommendations_to_db(n_recommendations)
+
+        # 7. 保存产物和在线查询用的 ANN 索引
+        if state_dir is not None:
+            self.save_state(state_dir, started_at)
+            self.save_ann_index(state_dir)
         
         logger.info("Content-Based recommendation computation completed!")
+
+
+def _place_rows(rows: csr_matrix, row_indices: np.ndarray, n_rows: int) -> csr_matrix:
+    """把 rows 的第 i 行放到 n_rows 行矩阵的第 row_indices[i] 行，其余行为空"""
+    coo = rows.tocoo()
+    return csr_matrix(
+        (coo.data, (row_indices[coo.row], coo.col)),
+        shape=(n_rows, rows.shape[1]),
+        dtype=np.float32,
+    )
@@ -0,0 +1,117 @@
+"""
+哈希特征空间上的 TF-IDF
+
+TfidfVectorizer 每次拟合都会重新生成词表，特征下标随之变化，已保存的向量无法复用。
+这里改用 HashingVectorizer 把词（1-gram 和 2-gram）映射到固定的 n_features 个下标，
+另外维护每个特征的文档频率（DF）：
+- 增量更新时只需要对新增/修改/删除的小说调整 DF，再用新的 IDF 向量化这些小说
+- 特征下标与词表无关，新词不需要重新拟合
+
+过滤规则与原来的 TfidfVectorizer 参数一致：min_df、max_df（文档比例），
+max_features 按文档频率保留最常见的特征，IDF 使用 sklearn 默认的平滑公式。
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+DEFAULT_N_FEATURES = 2 ** 20
+
+
+def hashing_vectorizer(n_features: int = DEFAULT_N_FEATURES) -> HashingVectorizer:
+    """已分词文本 -> 词频（不归一化，不使用符号哈希）"""
+    return HashingVectorizer(
+        n_features=n_features,
+        ngram_range=(1, 2),  # 支持1-gram和2-gram
+        alternate_sign=False,
+        norm=None,
+        dtype=np.float32,
+    )
+
+
+class HashedTfidf:
+    """哈希特征空间 + 可增量维护的文档频率"""
+
+    def __init__(
+        self,
+        n_features: int = DEFAULT_N_FEATURES,
+        max_features: int | None = None,
+        min_df: int = 2,
+        max_df: float = 0.8,
+    ):
+        """
+        Args:
+            n_features: 哈希特征空间的维度
+            max_features: 按文档频率保留的最大特征数，None 表示不限制
+            min_df: 至少出现在这么多文档中
+            max_df: 出现的文档比例不超过该值
+        """
+        self.n_features = n_features
+        self.max_features = max_features
+        self.min_df = min_df
+        self.max_df = max_df
+        self.df = np.zeros(n_features, dtype=np.int32)
+        self.n_docs = 0
+        self._vectorizer = hashing_vectorizer(n_features)
+
+    def counts(self, texts: list[str]) -> csr_matrix:
+        """已分词文本 -> 词频矩阵（float32 CSR）"""
+        return self._vectorizer.transform(texts).tocsr()
+
+    def add_documents(self, counts: csr_matrix):
+        self._update_df(counts, 1)
+
+    def remove_documents(self, counts: csr_matrix):
+        self._update_df(counts, -1)
+
+    def _update_df(self, counts: csr_matrix, sign: int):
+        counts = csr_matrix(counts)
+        counts.eliminate_zeros()
+        self.df += sign * np.bincount(counts.indices, minlength=self.n_features).astype(np.int32)
+        self.n_docs += sign * counts.shape[0]
+
+    def idf(self) -> np.ndarray:
+        """当前文档频率下的 IDF；被 min_df/max_df/max_features 过滤掉的特征为 0"""
+        df = self.df.astype(np.float64)
+        idf = np.log((1 + self.n_docs) / (1 + df)) + 1
+        allowed = (self.df >= self.min_df) & (df <= self.max_df * self.n_docs)
+        if self.max_features is not None and np.count_nonzero(allowed) > self.max_features:
+            candidates = np.flatnonzero(allowed)
+            top = candidates[np.argsort(-self.df[candidates], kind='stable')[:self.max_features]]
+            allowed = np.zeros_like(allowed)
+            allowed[top] = True
+        return np.where(allowed, idf, 0).astype(np.float32)
+
+    def fit(self, counts: csr_matrix) -> HashedTfidf:
+        """用全部文档的词频重新统计文档频率"""
+        self.df[:] = 0
+        self.n_docs = 0
+        self.add_documents(counts)
+        return self
+
+    def transform(self, counts: csr_matrix, idf: np.ndarray | None = None) -> csr_matrix:
+        """词频 -> L2 归一化的 TF-IDF（float32 CSR）"""
+        if idf is None:
+            idf = self.idf()
+        tfidf = csr_matrix(counts.multiply(idf), dtype=np.float32)
+        tfidf.eliminate_zeros()
+        return normalize(tfidf).astype(np.float32).tocsr()
+
+    def meta(self) -> dict:
+        return {
+            'n_features': self.n_features,
+            'max_features': self.max_features,
+            'min_df': self.min_df,
+            'max_df': self.max_df,
+            'n_docs': self.n_docs,
+        }
+
+    @classmethod
+    def from_state(cls, df: np.ndarray, meta: dict) -> HashedTfidf:
+        space = cls(meta['n_features'], meta['max_features'], meta['min_df'], meta['max_df'])
+        space.df = np.array(df, dtype=np.int32)
+        space.n_docs = meta['n_docs']
+        return space
@@ -0,0 +1,79 @@
+"""
+混合推荐：把 cf 与 content 推荐按固定权重合并成预先排好序的 hybrid 列表
+
+personalized 接口原来在每次请求时读取用户全部 cf / content 缓存行，在 Python 中合并、过滤未发布的小说并排序，
+耗时随算法产出的行数增长。这里在离线任务（以及单用户刷新）中预先完成：
+score = CF_WEIGHT · cf + CONTENT_WEIGHT · content，只保留已发布的小说，每个用户取 top-n，
+写入 algorithm='hybrid' 的 RecommendationCache。接口只需按 (user, algorithm, generation, -score) 索引读取前 limit 行。
+"""
+
+from __future__ import annotations
+
+import heapq
+import logging
+from collections import defaultdict
+from itertools import groupby
+from typing import Iterable, Iterator
+
+from recommendations.algorithms.loader import chunked
+from recommendations.algorithms.storage import current_generation_filter, replace_recommendations
+
+logger = logging.getLogger(__name__)
+
+CF_WEIGHT = 0.6
+CONTENT_WEIGHT = 0.4
+WEIGHTS = {'cf': CF_WEIGHT, 'content': CONTENT_WEIGHT}
+READ_CHUNK_SIZE = 5000
+
+
+def blend(rows: Iterable[tuple[str, str, str, float]], n: int) -> Iterator[tuple[str, str, float]]:
+    """按用户合并各算法的分数并取 top-n
+
+    Args:
+        rows: (user_id, novel_id, algorithm, score)，同一用户的行必须相邻
+
+    Yields:
+        (user_id, novel_id, 混合分数)，每个用户按分数从高到低
+    """
+    for user_id, user_rows in groupby(rows, key=lambda row: row[0]):
+        scores: dict[str, float] = defaultdict(float)
+        for _, novel_id, algorithm, score in user_rows:
+            scores[novel_id] += WEIGHTS[algorithm] * score
+        for novel_id, score in heapq.nlargest(n, scores.items(), key=lambda item: item[1]):
+            yield user_id, novel_id, score
+
+
+def save_hybrid_recommendations(n_recommendations: int = 20, user_ids: list[str] | None = None) -> int:
+    """根据当前版本的 cf / content 推荐生成 hybrid 推荐
+
+    Args:
+        user_ids: 只重算这些用户（在当前版本中原地替换），默认为全部用户写入新版本并整体切换
+
+    Returns:
+        写入的记录数
+    """
+    from recommendations.models import RecommendationCache
+
+    source = RecommendationCache.objects.filter(
+        current_generation_filter(RecommendationCache),
+        algorithm__in=list(WEIGHTS),
+        novel__status='published',
+    ).order_by('user_id')
+
+    def rows(queryset):
+        for user_id, novel_id, algorithm, score in queryset.values_list(
+            'user_id', 'novel_id', 'algorithm', 'score'
+        ).iterator(chunk_size=READ_CHUNK_SIZE):
+            yield str(user_id), str(novel_id), algorithm, score
+
+    if user_ids is None:
+        saved = replace_recommendations('hybrid', blend(rows(source), n_recommendations))
+    else:
+        records = [
+            record
+            for chunk in chunked(user_ids)
+            for record in blend(rows(source.filter(user_id__in=chunk)), n_recommendations)
+        ]
+        saved = replace_recommendations('hybrid', records, user_ids)
+    logger.info(f"Saved {saved} hybrid recommendation records")
+    return saved
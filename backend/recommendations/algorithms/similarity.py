@@ -0,0 +1,239 @@
+"""
+稀疏 Top-K 余弦相似度计算引擎
+
+直接在 CSR 矩阵上按行分块计算余弦相似度：
+1. 先对每一行做 L2 归一化，余弦相似度即为归一化向量的点积
+2. 每次只计算一个行块与全体行的乘积（稀疏 × 稀疏）
+3. 每个行块计算完成后立即裁剪到每行 top-k，再与之前的结果拼接
+
+结果为 N×N 的稀疏矩阵，每行最多保留 k 个非零元素，
+内存占用与 N×k 成正比，而不是完整的 N×N 稠密矩阵。
+
+输入也可以是稠密向量（如内容特征），此时每个行块是 float32 的稠密矩阵，用 argpartition 取 top-k。
+指定内存预算（max_memory）时，行块大小由预算决定，各行块的 top-k 写入临时的 memmap 文件，
+全部计算完成后再合并，峰值内存只取决于预算而不随小说数平方增长。
+"""
+
+from __future__ import annotations
+
+import logging
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from scipy.sparse import csr_matrix, diags, issparse
+from sklearn.preprocessing import normalize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCK_SIZE = 2048
+# 估算行块内存时每个相似度元素占用的字节数（float32 值 + int32 列号 + 排序用的 int64 下标）
+TILE_BYTES_PER_CELL = 16
+
+
+def l2_normalize_rows(matrix: csr_matrix) -> csr_matrix:
+    """对稀疏矩阵的每一行做 L2 归一化（全零行保持为零）"""
+    matrix = csr_matrix(matrix, dtype=np.float32)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1), dtype=np.float32).ravel())
+    inv_norms = np.zeros_like(norms)
+    nonzero = norms > 0
+    inv_norms[nonzero] = 1.0 / norms[nonzero]
+    return csr_matrix(diags(inv_norms) @ matrix, dtype=np.float32)
+
+
+def _topk_sparse_block(
+    block: csr_matrix,
+    top_k: int,
+    row_ids: np.ndarray,
+    min_similarity: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """裁剪一个稀疏相似度行块：去掉对角线和低于阈值的值，每行只保留 top-k
+
+    Args:
+        row_ids: 行块中每一行对应的全局行号
+
+    Returns:
+        (local_rows, ranks, cols, values)，ranks 为元素在行内按相似度降序的名次
+    """
+    coo = block.tocoo()
+    local_rows = coo.row.astype(np.int64)
+    cols = coo.col.astype(np.int64)
+    values = coo.data
+
+    keep = (row_ids[local_rows] != cols) & (values > min_similarity)
+    local_rows, cols, values = local_rows[keep], cols[keep], values[keep]
+    if values.size == 0:
+        return local_rows, local_rows, cols, values
+
+    # 行内按相似度降序排列，计算每个元素在行内的名次
+    order = np.lexsort((-values, local_rows))
+    local_rows, cols, values = local_rows[order], cols[order], values[order]
+
+    counts = np.bincount(local_rows, minlength=block.shape[0])
+    row_starts = np.repeat(np.cumsum(counts) - counts, counts)
+    rank = np.arange(local_rows.size) - row_starts
+
+    keep = rank < top_k
+    return local_rows[keep], rank[keep], cols[keep], values[keep]
+
+
+def _topk_dense_block(
+    block: np.ndarray,
+    top_k: int,
+    row_ids: np.ndarray,
+    min_similarity: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """裁剪一个稠密相似度行块，返回值同 _topk_sparse_block"""
+    local = np.arange(block.shape[0])
+    block[local, row_ids] = -np.inf
+
+    k = min(top_k, block.shape[1])
+    if k < block.shape[1]:
+        candidates = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(block.shape[1]), block.shape)
+    values = np.take_along_axis(block, candidates, axis=1)
+    order = np.argsort(-values, axis=1, kind='stable')
+    cols = np.take_along_axis(candidates, order, axis=1)
+    values = np.take_along_axis(values, order, axis=1)
+
+    local_rows, rank = np.nonzero(values > min_similarity)
+    return local_rows, rank, cols[local_rows, rank], values[local_rows, rank]
+
+
+def block_size_for_memory(n_rows: int, max_memory: int) -> int:
+    """根据内存预算计算每个行块的行数
+
+    一个行块的相似度最坏情况下是 block_size × n_rows 的稠密 float32 矩阵，
+    排序和 top-k 选择还需要同样规模的下标数组，按每个元素 TILE_BYTES_PER_CELL 字节估算
+    """
+    return max(1, max_memory // (max(n_rows, 1) * TILE_BYTES_PER_CELL))
+
+
+class _TopKSpill:
+    """按行存放各行块 top-k 结果的定长缓冲区
+
+    每行占 top_k 个槽位（列号 int32，-1 表示空槽；相似度 float32）。
+    spill 为 True 时缓冲区是临时目录中的 np.memmap，计算过程中写入的结果由操作系统换出到磁盘，
+    全部行块计算完后再一次性合并为 CSR 矩阵。
+    """
+
+    def __init__(self, n_rows: int, top_k: int, spill: bool = False, spill_dir=None):
+        shape = (n_rows, top_k)
+        self._tmp = None
+        if spill and n_rows > 0:
+            self._tmp = tempfile.TemporaryDirectory(prefix='similarity-', dir=spill_dir)
+            directory = Path(self._tmp.name)
+            self.cols = np.memmap(directory / 'cols.bin', dtype=np.int32, mode='w+', shape=shape)
+            self.values = np.memmap(directory / 'values.bin', dtype=np.float32, mode='w+', shape=shape)
+        else:
+            self.cols = np.empty(shape, dtype=np.int32)
+            self.values = np.empty(shape, dtype=np.float32)
+        self.cols[:] = -1
+
+    def write(self, offset: int, local_rows: np.ndarray, ranks: np.ndarray, cols: np.ndarray, values: np.ndarray):
+        self.cols[offset + local_rows, ranks] = cols
+        self.values[offset + local_rows, ranks] = values
+
+    def to_csr(self, rows: np.ndarray, n_rows: int) -> csr_matrix:
+        """合并为 n_rows × n_rows 的 CSR 矩阵，第 i 个缓冲行对应全局行 rows[i]"""
+        positions, slots = np.nonzero(self.cols[:] >= 0)
+        return csr_matrix(
+            (
+                np.asarray(self.values[positions, slots], dtype=np.float32),
+                (rows[positions], np.asarray(self.cols[positions, slots], dtype=np.int64)),
+            ),
+            shape=(n_rows, n_rows),
+            dtype=np.float32,
+        )
+
+    def close(self):
+        if self._tmp is not None:
+            del self.cols, self.values
+            self._tmp.cleanup()
+
+
+def topk_cosine_similarity(
+    matrix: csr_matrix | np.ndarray,
+    top_k: int,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    min_similarity: float = 0.0,
+    rows: np.ndarray | None = None,
+    max_memory: int | None = None,
+    spill_dir=None,
+) -> csr_matrix:
+    """计算矩阵各行之间的余弦相似度，每行只保留最相似的 top_k 个
+
+    Args:
+        matrix: N×D 稀疏或稠密矩阵，每一行是一个对象（如小说）的向量
+        top_k: 每行保留的最相似对象数量
+        block_size: 每次参与乘法的行数，控制峰值内存
+        min_similarity: 只保留严格大于该值的相似度
+        rows: 只计算这些行（增量更新时使用），默认计算全部行
+        max_memory: 行块计算的内存预算（字节）；指定时按预算计算 block_size，
+            并把各行块的 top-k 写入临时的 memmap 文件，最后再合并
+        spill_dir: 临时 memmap 文件所在目录，默认为系统临时目录（TMPDIR）
+
+    Returns:
+        N×N 的 float32 CSR 矩阵，对角线为零，每行最多 top_k 个非零元素；
+        指定 rows 时其余行为空
+    """
+    if top_k < 1:
+        raise ValueError("top_k must be positive")
+    if block_size < 1:
+        raise ValueError("block_size must be positive")
+
+    dense = not issparse(matrix)
+    if dense:
+        normalized = normalize(np.asarray(matrix, dtype=np.float32))
+        normalized_t = normalized.T
+    else:
+        normalized = l2_normalize_rows(matrix)
+        normalized_t = normalized.T.tocsr()
+    n_rows = normalized.shape[0]
+    if rows is None:
+        rows = np.arange(n_rows, dtype=np.int64)
+    else:
+        rows = np.asarray(rows, dtype=np.int64)
+    if max_memory is not None:
+        block_size = block_size_for_memory(n_rows, max_memory)
+
+    buffer = _TopKSpill(rows.size, top_k, spill=max_memory is not None, spill_dir=spill_dir)
+    try:
+        for start in range(0, rows.size, block_size):
+            row_ids = rows[start:start + block_size]
+            if dense:
+                block = _topk_dense_block(normalized[row_ids] @ normalized_t, top_k, row_ids, min_similarity)
+            else:
+                block = _topk_sparse_block(normalized[row_ids] @ normalized_t, top_k, row_ids, min_similarity)
+            buffer.write(start, *block)
+        similarity = buffer.to_csr(rows, n_rows)
+    finally:
+        buffer.close()
+
+    logger.info(
+        f"Computed top-{top_k} similarity for {rows.size} of {n_rows} rows "
+        f"({similarity.nnz} non-zeros, block_size={block_size})"
+    )
+    return similarity
+
+
+def replace_rows(matrix: csr_matrix, rows: np.ndarray, replacement: csr_matrix) -> csr_matrix:
+    """用 replacement 中对应的行替换 matrix 的指定行（其余行保持不变）"""
+    keep = np.ones(matrix.shape[0], dtype=np.float32)
+    keep[rows] = 0
+    result = diags(keep) @ matrix + replacement
+    result = csr_matrix(result, dtype=np.float32)
+    result.eliminate_zeros()
+    return result
+
+
+def row_top_items(similarity: csr_matrix, row: int, n: int | None = None) -> list[tuple[int, float]]:
+    """按相似度降序返回稀疏相似度矩阵某一行的 (列号, 相似度) 列表"""
+    start, stop = similarity.indptr[row], similarity.indptr[row + 1]
+    cols = similarity.indices[start:stop]
+    values = similarity.data[start:stop]
+    order = np.argsort(-values, kind="stable")
+    if n is not None:
+        order = order[:n]
+    return [(int(cols[i]), float(values[i])) for i in order if values[i] > 0]
@@ -0,0 +1,275 @@
+"""
+推荐结果的数据库读写辅助函数
+
+各算法共用：筛选活跃用户、构建可推荐小说掩码、整体替换某算法的推荐缓存/相似度、
+小说特征向量（NovelFeatureVector）的二进制编解码
+
+RecommendationCache 和 NovelSimilarity 按版本（generation）写入：
+1. 全量计算把结果分批写入新版本，旧版本在此期间照常提供读取
+2. 写完后更新 CacheGeneration 中的一行，把该算法的当前版本切换过去
+3. 再分批删除旧版本，每批一个短事务
+读取方用 current_generation_filter() 在同一条 SQL 中解析当前版本，
+因此任何时刻都不会读到空缓存或新旧混合的数据。
+"""
+
+from __future__ import annotations
+
+import logging
+from itertools import islice
+from typing import Iterable, Iterator
+
+import numpy as np
+from django.db import models, transaction
+from django.db.models import OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from scipy.sparse import csr_matrix
+
+from recommendations.algorithms.features import DEFAULT_N_FEATURES
+from recommendations.algorithms.loader import chunked
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 1000
+GC_BATCH_SIZE = 5000
+
+
+def active_user_ids(user_ids: list[str] | None = None) -> list[str]:
+    """返回活跃用户 ID；指定 user_ids 时只返回其中的活跃用户"""
+    from users.models import User
+
+    active_users = User.objects.filter(status='active')
+    if user_ids is None:
+        return [str(pk) for pk in active_users.values_list('id', flat=True)]
+
+    result = []
+    for chunk in chunked(user_ids):
+        result.extend(str(pk) for pk in active_users.filter(id__in=chunk).values_list('id', flat=True))
+    return result
+
+
+def published_novel_mask(novel_ids: list[str]) -> np.ndarray:
+    """按 novel_ids 顺序返回布尔掩码，True 表示小说已发布、可以推荐"""
+    from novels.models import Novel
+
+    published = {str(pk) for pk in Novel.objects.filter(status='published').values_list('id', flat=True)}
+    return np.array([nid in published for nid in novel_ids], dtype=bool)
+
+
+def scored_blocks_to_records(
+    blocks: Iterable[tuple[np.ndarray, np.ndarray, np.ndarray]],
+    user_ids: list[str],
+    novel_ids: list[str],
+) -> Iterator[tuple[str, str, float]]:
+    """把批量打分的结果块展开为 (user_id, novel_id, score)，只保留正分"""
+    for block_users, top_indices, top_scores in blocks:
+        rows, cols = np.nonzero(top_scores > 0)
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            yield user_ids[block_users[row]], novel_ids[top_indices[row, col]], float(top_scores[row, col])
+
+
+def current_generation_filter(model: type[models.Model]) -> Q:
+    """只选取各算法当前版本数据的查询条件（版本指针作为子查询，与数据在同一条 SQL 中读取）"""
+    from recommendations.models import CacheGeneration
+
+    pointer = CacheGeneration.objects.filter(
+        table=model._meta.db_table,
+        algorithm=OuterRef('algorithm'),
+    ).values('generation')[:1]
+    return Q(generation=Coalesce(Subquery(pointer), Value(0)))
+
+
+def algorithm_generation_filter(model: type[models.Model], algorithm: str) -> Q:
+    """只选取某一算法当前版本数据的查询条件
+
+    版本指针子查询不引用外层行，数据库只计算一次，查询可以直接按 (..., algorithm, generation, ...) 索引范围读取
+    """
+    from recommendations.models import CacheGeneration
+
+    pointer = CacheGeneration.objects.filter(
+        table=model._meta.db_table,
+        algorithm=algorithm,
+    ).values('generation')[:1]
+    return Q(algorithm=algorithm, generation=Coalesce(Subquery(pointer), Value(0)))
+
+
+def active_generation(model: type[models.Model], algorithm: str) -> int:
+    """返回某算法当前生效的版本号，从未切换过时为 0"""
+    from recommendations.models import CacheGeneration
+
+    generation = CacheGeneration.objects.filter(
+        table=model._meta.db_table,
+        algorithm=algorithm,
+    ).values_list('generation', flat=True).first()
+    return generation or 0
+
+
+def _activate_generation(model: type[models.Model], algorithm: str, generation: int):
+    from recommendations.models import CacheGeneration
+
+    CacheGeneration.objects.update_or_create(
+        table=model._meta.db_table,
+        algorithm=algorithm,
+        defaults={'generation': generation},
+    )
+
+
+def _delete_in_batches(queryset: models.QuerySet, batch_size: int = GC_BATCH_SIZE) -> int:
+    """按主键分批删除，每批一个短事务，避免长时间持有大量行锁"""
+    deleted = 0
+    while True:
+        pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        deleted += queryset.model.objects.filter(pk__in=pks).delete()[0]
+
+
+def collect_old_generations(model: type[models.Model], algorithm: str) -> int:
+    """分批删除某算法非当前版本的数据
+
+    Returns:
+        删除的记录数
+    """
+    active = active_generation(model, algorithm)
+    deleted = _delete_in_batches(model.objects.filter(algorithm=algorithm).exclude(generation=active))
+    if deleted:
+        logger.info(f"Collected {deleted} stale {model._meta.db_table} records for {algorithm}")
+    return deleted
+
+
+def _write_generation(model: type[models.Model], algorithm: str, objects: Iterable[models.Model]) -> int:
+    """把 objects 写入新版本并切换为当前版本，随后回收旧版本"""
+    active = active_generation(model, algorithm)
+    # 清理上次中断的任务留下的未生效版本
+    _delete_in_batches(model.objects.filter(algorithm=algorithm, generation__gt=active))
+
+    generation = active + 1
+    objects = iter(objects)
+    written = 0
+    while batch := list(islice(objects, BULK_BATCH_SIZE)):
+        for obj in batch:
+            obj.generation = generation
+        model.objects.bulk_create(batch)
+        written += len(batch)
+
+    _activate_generation(model, algorithm, generation)
+    logger.info(f"Activated {model._meta.db_table} generation {generation} for {algorithm} ({written} records)")
+    collect_old_generations(model, algorithm)
+    return written
+
+
+def _replace_in_active_generation(
+    model: type[models.Model],
+    algorithm: str,
+    objects: Iterable[models.Model],
+    scope_field: str,
+    scope_ids: list[str],
+) -> int:
+    """在当前版本中只替换 scope_ids 对应的行（增量更新，数据量小，使用单个短事务）"""
+    generation = active_generation(model, algorithm)
+    batch = list(objects)
+    for obj in batch:
+        obj.generation = generation
+
+    with transaction.atomic():
+        old = model.objects.filter(algorithm=algorithm, generation=generation)
+        for chunk in chunked(scope_ids):
+            old.filter(**{f'{scope_field}__in': chunk}).delete()
+        model.objects.bulk_create(batch, batch_size=BULK_BATCH_SIZE)
+    return len(batch)
+
+
+def replace_recommendations(
+    algorithm: str,
+    records: Iterable[tuple[str, str, float]],
+    user_ids: list[str] | None = None,
+) -> int:
+    """用新的推荐结果替换某算法的推荐缓存
+
+    Args:
+        records: (user_id, novel_id, score)
+        user_ids: 只替换这些用户的推荐（在当前版本中原地更新），默认写入新版本并整体切换
+
+    Returns:
+        写入的记录数
+    """
+    from recommendations.models import RecommendationCache
+
+    objects = (
+        RecommendationCache(user_id=user_id, novel_id=novel_id, score=score, algorithm=algorithm)
+        for user_id, novel_id, score in records
+    )
+    if user_ids is None:
+        return _write_generation(RecommendationCache, algorithm, objects)
+    return _replace_in_active_generation(RecommendationCache, algorithm, objects, 'user_id', user_ids)
+
+
+def replace_similarities(
+    algorithm: str,
+    records: Iterable[tuple[str, str, float]],
+    novel_ids: list[str] | None = None,
+) -> int:
+    """用新的相似度替换某算法的 NovelSimilarity
+
+    Args:
+        records: (novel_a_id, novel_b_id, similarity)
+        novel_ids: 只替换以这些小说为 novel_a 的行，默认写入新版本并整体切换
+
+    Returns:
+        写入的记录数
+    """
+    from recommendations.models import NovelSimilarity
+
+    objects = (
+        NovelSimilarity(novel_a_id=novel_a_id, novel_b_id=novel_b_id, similarity=similarity, algorithm=algorithm)
+        for novel_a_id, novel_b_id, similarity in records
+    )
+    if novel_ids is None:
+        return _write_generation(NovelSimilarity, algorithm, objects)
+    return _replace_in_active_generation(NovelSimilarity, algorithm, objects, 'novel_a_id', novel_ids)
+
+
+def encode_sparse_rows(matrix: csr_matrix, rows: Iterable[int]) -> Iterator[tuple[int, bytes, bytes]]:
+    """把 CSR 矩阵的指定行编码为 (行号, 下标字节, 值字节)
+
+    下标为小端 int32，值为小端 float32；整个数组只转换一次，每行只是切片后 tobytes()
+    """
+    indices = np.asarray(matrix.indices, dtype='<i4')
+    data = np.asarray(matrix.data, dtype='<f4')
+    indptr = matrix.indptr
+    for row in rows:
+        start, stop = indptr[row], indptr[row + 1]
+        yield row, indices[start:stop].tobytes(), data[start:stop].tobytes()
+
+
+def decode_sparse_rows(indices_blobs: list, values_blobs: list, n_cols: int) -> csr_matrix:
+    """把逐行的 (下标字节, 值字节) 拼接后一次解码为 CSR 矩阵"""
+    lengths = np.fromiter((len(blob) // 4 for blob in indices_blobs), dtype=np.int64, count=len(indices_blobs))
+    indptr = np.zeros(lengths.size + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    indices = np.frombuffer(b''.join(indices_blobs), dtype='<i4')
+    data = np.frombuffer(b''.join(values_blobs), dtype='<f4')
+    return csr_matrix((data, indices, indptr), shape=(lengths.size, n_cols))
+
+
+def load_feature_vectors(
+    novel_ids: list[str] | None = None,
+    n_features: int = DEFAULT_N_FEATURES,
+) -> tuple[list[str], csr_matrix]:
+    """读取已保存的小说特征向量（默认全部，一次查询）并解码为 CSR 矩阵
+
+    Returns:
+        (小说ID列表, 与之一一对应的 float32 CSR 矩阵)
+    """
+    from recommendations.models import NovelFeatureVector
+
+    queryset = NovelFeatureVector.objects.order_by('novel_id')
+    if novel_ids is None:
+        rows = list(queryset.values_list('novel_id', 'indices', 'values'))
+    else:
+        rows = []
+        for chunk in chunked(novel_ids):
+            rows.extend(queryset.filter(novel_id__in=chunk).values_list('novel_id', 'indices', 'values'))
+
+    ids = [str(novel_id) for novel_id, _, _ in rows]
+    matrix = decode_sparse_rows([row[1] for row in rows], [row[2] for row in rows], n_features)
+    return ids, matrix
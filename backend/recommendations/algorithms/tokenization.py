@@ -0,0 +1,262 @@
+"""
+小说文本特征的中文分词
+
+jieba 分词是内容推荐计算中最耗时的步骤，这里做两件事：
+1. 分词结果缓存在磁盘上的 SQLite 文件中，键为小说文本（标题、分类、标签、简介、作者）的哈希，
+   重新运行时只对文本发生变化的小说重新分词
+2. 未命中缓存的文本按块交给进程池并行分词
+
+文本拼接规则与分词规则都在这里，离线计算和在线服务（新增小说的向量）共用同一套逻辑。
+
+jieba 首次分词时要构建前缀词典（数秒），默认把序列化结果写到各容器自己的临时目录。
+load_jieba() 改为从 JIEBA_CACHE_DIR 设置的共享位置读写该缓存（可用 build_jieba_cache 命令预先生成并随镜像分发），
+并记录加载耗时；进程池的工作进程在启动时加载，其余进程在第一次分词时加载（或由 JIEBA_PRELOAD 在启动时预加载）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import marshal
+import multiprocessing
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable
+
+import jieba
+
+logger = logging.getLogger(__name__)
+
+# 拼接或分词规则变化时递增，使旧的缓存条目失效
+TOKENIZER_VERSION = 1
+TOKEN_CACHE_FILE = 'tokens.sqlite3'
+# 每个进程池任务分词的文本数
+TOKENIZE_CHUNK_SIZE = 200
+# SQLite 单条语句的参数上限以内
+CACHE_LOOKUP_BATCH = 500
+
+_NON_WORD = re.compile(r'[^\u4e00-\u9fa5a-zA-Z0-9]')
+
+
+def jieba_cache_file(cache_dir: Path | None = None) -> Path | None:
+    """jieba 前缀词典缓存文件的路径
+
+    目录默认取 JIEBA_CACHE_DIR 设置（未配置 Django 时返回 None，使用 jieba 默认的临时目录）；
+    缓存是 marshal 格式，与 Python 版本相关，文件名中带上 jieba 和 Python 的版本
+    """
+    if cache_dir is None:
+        from django.conf import settings
+        from django.core.exceptions import ImproperlyConfigured
+
+        try:
+            cache_dir = getattr(settings, 'JIEBA_CACHE_DIR', None)
+        except ImproperlyConfigured:
+            cache_dir = None
+        if cache_dir is None:
+            return None
+    return Path(cache_dir) / f'jieba-{jieba.__version__}-py{sys.version_info.major}{sys.version_info.minor}.cache'
+
+
+def _load_jieba_cache(cache_file: Path) -> bool:
+    """一次读入整个缓存文件再 marshal.loads，比 jieba 自己在文件对象上 marshal.load 快约 3 倍"""
+    try:
+        data = cache_file.read_bytes()
+    except FileNotFoundError:
+        return False
+    with jieba.dt.lock:
+        if not jieba.dt.initialized:
+            try:
+                jieba.dt.FREQ, jieba.dt.total = marshal.loads(data)
+            except (EOFError, ValueError, TypeError):
+                # 缓存损坏或版本不符时交给 jieba 重新构建
+                logger.warning(f"Ignoring unreadable jieba cache {cache_file}")
+                return False
+            jieba.dt.initialized = True
+    return True
+
+
+def load_jieba(cache_file: Path | None = None) -> float:
+    """加载 jieba 前缀词典：缓存文件存在时直接读取，否则构建后写入该文件
+
+    Args:
+        cache_file: 缓存文件路径，默认为 jieba_cache_file()
+
+    Returns:
+        加载耗时（秒），已加载时为 0
+    """
+    if jieba.dt.initialized:
+        return 0.0
+    if cache_file is None:
+        cache_file = jieba_cache_file()
+
+    start = time.perf_counter()
+    if cache_file is not None:
+        cache_file = Path(cache_file).resolve()
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # 绝对路径时 jieba 忽略临时目录，直接读写该文件
+        jieba.dt.cache_file = str(cache_file)
+        if _load_jieba_cache(cache_file):
+            elapsed = time.perf_counter() - start
+            logger.info(f"Loaded jieba dictionary in {elapsed:.2f}s (cache={cache_file})")
+            return elapsed
+
+    jieba.initialize()
+    elapsed = time.perf_counter() - start
+    logger.info(f"Loaded jieba dictionary in {elapsed:.2f}s (cache={jieba.dt.cache_file or 'default'})")
+    return elapsed
+
+
+def write_jieba_cache(cache_file: Path) -> Path:
+    """把已加载的前缀词典写入缓存文件（未加载时先加载）
+
+    jieba 只在自己构建词典时写缓存，词典已经加载（例如被 JIEBA_PRELOAD 的后台线程加载）时不会再写；
+    这里显式写入：先写同目录下的临时文件，再原子替换，读取方不会读到半个文件
+
+    Returns:
+        缓存文件的绝对路径
+    """
+    load_jieba(cache_file)
+    cache_file = Path(cache_file).resolve()
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f'{cache_file.name}.', suffix='.tmp', dir=cache_file.parent)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            marshal.dump((jieba.dt.FREQ, jieba.dt.total), f)
+        os.replace(temp_path, cache_file)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+    return cache_file
+
+
+def build_text(title: str, category: str, tags: list | None, intro: str, author: str) -> str:
+    """拼接小说的完整文本特征（未分词）"""
+    parts = []
+
+    # 标题（权重高，重复3次）
+    if title:
+        parts.extend([title] * 3)
+
+    # 分类（权重高，重复3次）
+    if category:
+        parts.extend([category] * 3)
+
+    # 标签（权重中等，重复2次）
+    if tags:
+        for tag in tags:
+            parts.extend([tag] * 2)
+
+    # 简介
+    if intro:
+        parts.append(intro)
+
+    # 作者
+    if author:
+        parts.append(author)
+
+    return ' '.join(parts)
+
+
+def tokenize(text: str) -> str:
+    """中文分词处理，返回以空格分隔的词"""
+    if not jieba.dt.initialized:
+        load_jieba()
+    # 清理文本
+    text = _NON_WORD.sub(' ', text)
+    # jieba分词
+    return ' '.join(jieba.cut(text))
+
+
+def text_hash(text: str) -> str:
+    """分词缓存的键：分词器版本 + 文本的 SHA-1"""
+    return hashlib.sha1(f"{TOKENIZER_VERSION}:{text}".encode('utf-8')).hexdigest()
+
+
+def _tokenize_chunk(texts: list[str]) -> list[str]:
+    return [tokenize(text) for text in texts]
+
+
+class TokenCache:
+    """文本哈希 -> 分词结果的磁盘缓存（SQLite）"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS tokens (hash TEXT PRIMARY KEY, tokens TEXT NOT NULL)')
+
+    def get_many(self, hashes: list[str]) -> dict[str, str]:
+        found = {}
+        for start in range(0, len(hashes), CACHE_LOOKUP_BATCH):
+            batch = hashes[start:start + CACHE_LOOKUP_BATCH]
+            placeholders = ','.join('?' * len(batch))
+            found.update(self._conn.execute(
+                f'SELECT hash, tokens FROM tokens WHERE hash IN ({placeholders})', batch
+            ))
+        return found
+
+    def put_many(self, items: Iterable[tuple[str, str]]):
+        with self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO tokens (hash, tokens) VALUES (?, ?)', items)
+
+    def retain(self, hashes: set[str]):
+        """删除不在 hashes 中的条目（已删除或文本已变化的小说）"""
+        stale = [h for (h,) in self._conn.execute('SELECT hash FROM tokens') if h not in hashes]
+        with self._conn:
+            self._conn.executemany('DELETE FROM tokens WHERE hash = ?', ((h,) for h in stale))
+
+    def close(self):
+        self._conn.close()
+
+
+def tokenize_texts(texts: list[str], workers: int = 1, cache: TokenCache | None = None) -> list[str]:
+    """批量分词
+
+    Args:
+        workers: 大于 1 时未命中缓存的文本按块交给进程池并行分词
+        cache: 分词缓存，命中的文本不再分词，新结果写回缓存
+
+    Returns:
+        与 texts 一一对应的分词结果
+    """
+    hashes = [text_hash(text) for text in texts]
+    cached = cache.get_many(list(set(hashes))) if cache is not None else {}
+
+    missing: dict[str, str] = {}
+    for h, text in zip(hashes, texts):
+        if h not in cached:
+            missing.setdefault(h, text)
+
+    if missing:
+        missing_hashes = list(missing)
+        missing_texts = list(missing.values())
+        chunks = [
+            missing_texts[start:start + TOKENIZE_CHUNK_SIZE]
+            for start in range(0, len(missing_texts), TOKENIZE_CHUNK_SIZE)
+        ]
+        if workers > 1 and len(chunks) > 1:
+            # 工作进程启动时从父进程解析出的缓存文件加载词典
+            ctx = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=ctx,
+                initializer=load_jieba,
+                initargs=(jieba_cache_file(),),
+            ) as pool:
+                tokenized = [tokens for chunk in pool.map(_tokenize_chunk, chunks) for tokens in chunk]
+        else:
+            tokenized = [tokens for chunk in chunks for tokens in _tokenize_chunk(chunk)]
+
+        new_tokens = dict(zip(missing_hashes, tokenized))
+        if cache is not None:
+            cache.put_many(new_tokens.items())
+        cached.update(new_tokens)
+
+    logger.info(f"Tokenized {len(missing)} new texts for {len(texts)} novels (others from cache)")
+    return [cached[h] for h in hashes]
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
-from django.db.models import FloatField, Value, F, ExpressionWrapper, Min, Max
+from django.conf import settings
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 
+from novels.cards import cards_in_order, novel_cards
 from novels.models import Novel
 from novels.serializers import NovelSerializer
-from core.responses import api_ok
+from core.response_cache import cached_response, catalog_key, response_cache
+from core.responses import api_error, api_ok
 
 
 def _limit(request, default: int = 6) -> int:
@@ -18,140 +20,157 @@ def _limit(request, default: int = 6) -> int:
 
 
 def _hot_novels(limit: int):
-    base_qs = Novel.objects.filter(status="published")
-    stats = base_qs.aggregate(
-        fav_min=Min("favorites_count"),
-        fav_max=Max("favorites_count"),
-        view_min=Min("views"),
-        view_max=Max("views"),
-        rating_min=Min("avg_rating"),
-        rating_max=Max("avg_rating"),
-    )
-
-    fav_min = stats.get("fav_min") or 0
-    fav_max = stats.get("fav_max") or 0
-    view_min = stats.get("view_min") or 0
-    view_max = stats.get("view_max") or 0
-    rating_min = stats.get("rating_min") or 0
-    rating_max = stats.get("rating_max") or 0
-
-    fav_range = fav_max - fav_min
-    view_range = view_max - view_min
-    rating_range = rating_max - rating_min
-
-    fav_norm = (
-        Value(0.0)
-        if fav_range == 0
-        else ExpressionWrapper((F("favorites_count") - Value(fav_min)) / Value(fav_range), output_field=FloatField())
-    )
-    view_norm = (
-        Value(0.0)
-        if view_range == 0
-        else ExpressionWrapper((F("views") - Value(view_min)) / Value(view_range), output_field=FloatField())
-    )
-    rating_norm = (
-        Value(0.0)
-        if rating_range == 0
-        else ExpressionWrapper((F("avg_rating") - Value(rating_min)) / Value(rating_range), output_field=FloatField())
-    )
-
-    hot_score = ExpressionWrapper(
-        Value(0.5) * fav_norm + Value(0.3) * view_norm + Value(0.2) * rating_norm,
-        output_field=FloatField(),
-    )
-
-    return base_qs.annotate(hot_score=hot_score).order_by("-hot_score", "-updated_at")[:limit]
+    """按物化的热度分数取前 limit 部已发布小说（分数由 refresh_hot_scores 定期重算，见 novels/hot.py）"""
+    return Novel.objects.filter(status="published").order_by("-hot_score", "-updated_at")[:limit]
 
 
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def hot(request):
-    """热门推荐：基于收藏/阅读/评分加权排序"""
+    """热门推荐：基于收藏/阅读/评分加权排序（响应对所有访客相同，走共享响应缓存）"""
     limit = _limit(request)
-    qs = _hot_novels(limit)
-    return api_ok(NovelSerializer(qs, many=True).data)
+    return cached_response("hot", {"limit": limit}, lambda: api_ok(NovelSerializer(_hot_novels(limit), many=True).data))
 
 
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def latest(request):
-    """最新推荐：基于更新时间排序"""
+    """最新推荐：基于更新时间排序（走共享响应缓存）"""
     limit = _limit(request)
-    qs = Novel.objects.filter(status="published").order_by("-updated_at")[:limit]
-    return api_ok(NovelSerializer(qs, many=True).data)
+
+    def build():
+        qs = Novel.objects.filter(status="published").order_by("-updated_at")[:limit]
+        return api_ok(NovelSerializer(qs, many=True).data)
+
+    return cached_response("latest", {"limit": limit}, build)
+
+
+def _published_in_order(novel_ids: list[str], limit: int) -> list[str]:
+    published = {
+        str(novel_id)
+        for novel_id in Novel.objects.filter(id__in=novel_ids, status="published").values_list("id", flat=True)
+    }
+    return [nid for nid in novel_ids if nid in published][:limit]
+
+
+def _hot_ids(limit: int) -> list[str]:
+    return [str(novel_id) for novel_id in _hot_novels(limit).values_list("id", flat=True)]
+
+
+def _latest_ids(limit: int) -> list[str]:
+    qs = Novel.objects.filter(status="published").order_by("-updated_at").values_list("id", flat=True)[:limit]
+    return [str(novel_id) for novel_id in qs]
+
+
+def _catalog_ids(name: str, limit: int, build) -> list[str]:
+    """对所有访客相同的栏目（热门/最新）的小说ID列表，缓存在共享的 'responses' 缓存中"""
+    ttl = getattr(settings, "RESPONSE_CACHE_TTL", 0)
+    if ttl <= 0:
+        return build(limit)
+    cache = response_cache()
+    key = catalog_key(name, limit)
+    ids = cache.get(key)
+    if ids is None:
+        ids = build(limit)
+        cache.set(key, ids, timeout=ttl)
+    return ids
+
+
+def _personalized_ids(user, limit: int) -> list[str]:
+    """个性化推荐的小说ID列表
+
+    优先级：
+    1. 离线任务预先混合、过滤并排好序的 hybrid 推荐（一条按索引的范围读取，取前 limit 行）；
+       交互发生后由 refresh.py 在后台重算该用户的 hybrid 推荐，请求时不再检查是否过期
+    2. 没有 hybrid 推荐的用户（离线任务之后才产生交互），由在线服务根据用户当前的交互实时打分
+    3. 都没有结果时（冷启动），返回热门推荐
+    """
+    from recommendations.algorithms.storage import algorithm_generation_filter
+    from recommendations.models import RecommendationCache
+    from recommendations.online import get_online_recommender
+
+    cached = list(
+        RecommendationCache.objects.filter(
+            algorithm_generation_filter(RecommendationCache, "hybrid"),
+            user=user,
+            novel__status="published",
+        )
+        .order_by("-score")
+        .values_list("novel_id", flat=True)[:limit]
+    )
+    if cached:
+        return [str(novel_id) for novel_id in cached]
+
+    # 多取一些，过滤掉未发布的小说后仍能凑满 limit
+    online = get_online_recommender().recommend(str(user.id), n=limit * 2)
+    ids = _published_in_order([nid for nid, _ in online], limit)
+    if ids:
+        return ids
+
+    return _catalog_ids("hot", limit, _hot_ids)
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def personalized(request):
-    """个性化推荐：基于协同过滤和内容推荐的缓存结果
-    
-    优先级：
-    1. 从 RecommendationCache 读取缓存的推荐结果
-    2. 如果缓存为空（冷启动），返回热门推荐
-    """
+    """个性化推荐：基于协同过滤和内容推荐的缓存结果（优先级见 _personalized_ids）"""
     limit = _limit(request)
-    
-    from recommendations.models import RecommendationCache
+    return api_ok(cards_in_order(_personalized_ids(request.user, limit)))
+
+
+HOME_SECTIONS = ("hot", "latest", "personalized")
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def home(request):
+    """首页推荐：一次请求返回多个推荐栏目
+
+    参数：
+    - sections: 逗号分隔的栏目（hot / latest / personalized），默认全部；personalized 只对登录用户返回
+    - limit: 每个栏目的数量
 
-    cached = RecommendationCache.objects.filter(
-        user=request.user,
-        algorithm__in=["cf", "content"],
-    ).select_related("novel")
-
-    if cached.exists():
-        combined: dict[str, dict[str, object]] = {}
-        for entry in cached:
-            if entry.novel.status != "published":
-                continue
-            key = str(entry.novel_id)
-            if key not in combined:
-                combined[key] = {"novel": entry.novel, "cf": 0.0, "content": 0.0}
-            if entry.algorithm == "cf":
-                combined[key]["cf"] = float(entry.score)
-            elif entry.algorithm == "content":
-                combined[key]["content"] = float(entry.score)
-
-        if combined:
-            ranked = sorted(
-                combined.values(),
-                key=lambda r: 0.6 * r["cf"] + 0.4 * r["content"],
-                reverse=True,
-            )
-            novels = [r["novel"] for r in ranked[:limit]]
-            return api_ok(NovelSerializer(novels, many=True).data)
-
-    return api_ok(NovelSerializer(_hot_novels(limit), many=True).data)
+    各栏目只给出小说ID，小说卡片去重后放在 novels 中，所有栏目的小说一起从卡片缓存读取（未命中的一条 SQL）；
+    热门和最新的ID列表对所有访客相同，缓存在共享缓存中
+    """
+    limit = _limit(request)
+    requested = request.query_params.get("sections")
+    names = [name.strip() for name in requested.split(",") if name.strip()] if requested else list(HOME_SECTIONS)
+    unknown = [name for name in names if name not in HOME_SECTIONS]
+    if unknown:
+        return api_error(f"未知的推荐栏目：{', '.join(unknown)}", status=400)
+
+    sections: dict[str, list[str]] = {}
+    for name in dict.fromkeys(names):
+        if name == "hot":
+            sections[name] = _catalog_ids("hot", limit, _hot_ids)
+        elif name == "latest":
+            sections[name] = _catalog_ids("latest", limit, _latest_ids)
+        elif getattr(request.user, "is_authenticated", False):
+            sections[name] = _personalized_ids(request.user, limit)
+
+    cards = novel_cards(novel_id for ids in sections.values() for novel_id in ids)
+    return api_ok(
+        {
+            "sections": {name: [nid for nid in ids if nid in cards] for name, ids in sections.items()},
+            "novels": cards,
+        }
+    )
 
 
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def similar_novels(request, novelId: str):
-    """获取与指定小说相似的小说（基于缓存的相似度矩阵）"""
+    """获取与指定小说相似的小说
+
+    相似小说ID列表按小说缓存（合并 item_cf / content 离线相似度，没有时依次退回内容 ANN 索引、同分类热门，
+    见 recommendations/similar.py），小说数据来自卡片缓存，都命中时不执行 SQL
+    """
     limit = _limit(request, default=10)
-    
-    try:
-        novel = Novel.objects.get(id=novelId, status="published")
-    except Novel.DoesNotExist:
-        from core.responses import api_error
+
+    from recommendations.similar import similar_ids
+
+    ids = similar_ids(novelId)
+    if ids is None:
         return api_error("小说不存在", status=404)
-    
-    # 从相似度缓存读取
-    from recommendations.models import NovelSimilarity
-    
-    similar = NovelSimilarity.objects.filter(
-        novel_a=novel
-    ).select_related('novel_b').order_by('-similarity')[:limit]
-    
-    if similar.exists():
-        novels = [s.novel_b for s in similar if s.novel_b.status == 'published']
-        if novels:
-            return api_ok(NovelSerializer(novels, many=True).data)
-    
-    # Fallback: 同分类热门
-    fallback = Novel.objects.filter(
-        status="published",
-        category=novel.category
-    ).exclude(id=novel.id).order_by("-favorites_count", "-views")[:limit]
-    
-    return api_ok(NovelSerializer(fallback, many=True).data)
+    return api_ok(cards_in_order(ids[:limit]))
@@ -1,6 +1,16 @@
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class RecommendationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recommendations'
+
+    def ready(self):
+        if getattr(settings, 'JIEBA_PRELOAD', False):
+            # 在后台线程加载 jieba 词典，不阻塞进程启动；第一次分词若早于加载完成会等待同一把锁
+            from recommendations.algorithms.tokenization import load_jieba
+
+            threading.Thread(target=load_jieba, name='jieba-preload', daemon=True).start()
@@ -0,0 +1,480 @@
+"""
+推荐流水线基准测试工具
+
+每个被测用例都在独立的子进程中运行，以便分别统计耗时和峰值内存（RSS），
+互不干扰。数据均为合成数据，不依赖数据库。
+
+由 `python manage.py benchmark_recommendations` 调用。
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.metrics.pairwise import cosine_similarity
+
+from recommendations.algorithms.loader import (
+    FAVORITE_WEIGHT,
+    RATING_WEIGHT,
+    READ_WEIGHT,
+    InteractionAccumulator,
+)
+from recommendations.algorithms.scoring import score_users
+from recommendations.algorithms.similarity import topk_cosine_similarity
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    name: str
+    seconds: float
+    peak_rss_mb: float
+
+
+# 运行期间采样常驻内存的间隔（秒）
+RSS_SAMPLE_INTERVAL = 0.005
+
+
+def _peak_memory_bytes() -> int:
+    """进程生命周期内的峰值常驻内存（ru_maxrss）"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def _current_rss_bytes() -> int | None:
+    """当前常驻内存；没有 /proc 时返回 None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return None
+
+
+class _RssSampler:
+    """在后台线程中周期性读取当前常驻内存，记录 target 运行期间的最大值
+
+    ru_maxrss 是整个进程生命周期的峰值，会包含 setup 和解释器启动阶段的内存，无法单独反映 target；
+    采样会漏掉持续时间短于采样间隔的尖峰
+    """
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = _current_rss_bytes() or 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _current_rss_bytes() or 0)
+
+    def __enter__(self) -> _RssSampler:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss_bytes() or 0)
+
+
+def _measure(
+    target: Callable[..., Any],
+    args: tuple,
+    setup: Callable[..., Any] | None = None,
+) -> tuple[float, int]:
+    """在子进程中执行，返回 (耗时秒数, 峰值内存字节数)
+
+    指定 setup 时先在子进程内调用 setup(*args) 生成输入（不计入统计），
+    再以其返回值作为 target 的唯一参数。
+
+    峰值内存为 target 运行期间采样到的常驻内存最大值减去开始时的常驻内存；
+    没有 /proc 的平台上退化为子进程的 ru_maxrss 绝对值（包含 setup），没有 resource 模块时使用 tracemalloc
+    """
+    if setup is not None:
+        args = (setup(*args),)
+
+    if resource is not None:
+        baseline = _current_rss_bytes()
+        if baseline is None:
+            start = time.perf_counter()
+            target(*args)
+            elapsed = time.perf_counter() - start
+            return elapsed, _peak_memory_bytes()
+
+        with _RssSampler() as sampler:
+            start = time.perf_counter()
+            target(*args)
+            elapsed = time.perf_counter() - start
+        return elapsed, max(0, sampler.peak - baseline)
+
+    import tracemalloc
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    target(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def run_isolated(
+    name: str,
+    target: Callable[..., Any],
+    *args,
+    setup: Callable[..., Any] | None = None,
+) -> BenchmarkResult:
+    """在全新的子进程中运行 target(*args) 并统计耗时和峰值内存"""
+    # ProcessPoolExecutor 的工作进程不是守护进程，被测代码可以再启动自己的进程池
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        elapsed, peak = pool.submit(_measure, target, args, setup).result()
+    return BenchmarkResult(name=name, seconds=elapsed, peak_rss_mb=peak / (1024 * 1024))
+
+
+def synthetic_interactions(
+    n_users: int,
+    n_items: int,
+    n_interactions: int,
+    seed: int = 42,
+) -> csr_matrix:
+    """生成带长尾分布的合成用户-物品交互矩阵
+
+    物品按 Zipf 分布抽样，模拟少数热门小说占据大部分交互的真实情况。
+    """
+    rng = np.random.default_rng(seed)
+    users = rng.integers(0, n_users, size=n_interactions, dtype=np.int32)
+    ranks = rng.zipf(1.2, size=n_interactions)
+    items = ((ranks - 1) % n_items).astype(np.int32)
+    items = rng.permutation(n_items).astype(np.int32)[items]
+    weights = rng.choice(np.array([0.2, 0.5, 0.8], dtype=np.float32), size=n_interactions)
+
+    matrix = csr_matrix((weights, (users, items)), shape=(n_users, n_items), dtype=np.float32)
+    # 重复的 (用户, 物品) 对会被累加，这里截断到合法权重范围
+    matrix.data = np.minimum(matrix.data, 1.0)
+    return matrix
+
+
+def dense_item_similarity(user_item: csr_matrix) -> None:
+    """旧实现：稠密化物品-用户矩阵后计算完整 N×N 余弦相似度"""
+    item_user = user_item.T.toarray()
+    similarity = cosine_similarity(item_user)
+    np.fill_diagonal(similarity, 0)
+
+
+def sparse_item_similarity(user_item: csr_matrix, top_k: int) -> None:
+    """新实现：稀疏分块 top-k 余弦相似度"""
+    topk_cosine_similarity(user_item.T.tocsr(), top_k)
+
+
+def similarity_suite(
+    n_users: int,
+    n_items: int,
+    n_interactions: int,
+    top_k: int,
+    include_dense: bool = True,
+) -> list[BenchmarkResult]:
+    """物品相似度：稠密实现 vs 稀疏 top-k 实现"""
+    user_item = synthetic_interactions(n_users, n_items, n_interactions)
+    results = []
+    if include_dense:
+        results.append(run_isolated("item_similarity/dense", dense_item_similarity, user_item))
+    results.append(run_isolated(f"item_similarity/sparse_top{top_k}", sparse_item_similarity, user_item, top_k))
+    return results
+
+
+def synthetic_interaction_rows(
+    n_users: int,
+    n_items: int,
+    n_interactions: int,
+    seed: int = 42,
+) -> tuple[list, list, list]:
+    """生成与 values_list 输出形式相同的合成行：(收藏, 评分, 阅读历史)
+
+    收藏和阅读历史为 (user_uuid, novel_uuid)，评分为 (user_uuid, novel_uuid, score)
+    """
+    import uuid
+
+    rng = np.random.default_rng(seed)
+    user_pool = [uuid.UUID(int=int(x)) for x in rng.integers(1, 2**63, size=n_users)]
+    novel_pool = [uuid.UUID(int=int(x)) for x in rng.integers(1, 2**63, size=n_items)]
+
+    users = rng.integers(0, n_users, size=n_interactions)
+    items = (rng.zipf(1.2, size=n_interactions) - 1) % n_items
+    kinds = rng.choice(3, size=n_interactions, p=[0.4, 0.2, 0.4])
+    scores = rng.integers(1, 6, size=n_interactions)
+
+    favorites, ratings, history = [], [], []
+    for u, i, kind, score in zip(users.tolist(), items.tolist(), kinds.tolist(), scores.tolist()):
+        if kind == 0:
+            favorites.append((user_pool[u], novel_pool[i]))
+        elif kind == 1:
+            ratings.append((user_pool[u], novel_pool[i], score))
+        else:
+            history.append((user_pool[u], novel_pool[i]))
+    return favorites, ratings, history
+
+
+def _synthetic_rows_setup(n_users: int, n_items: int, n_interactions: int):
+    return synthetic_interaction_rows(n_users, n_items, n_interactions)
+
+
+def pandas_interaction_loader(rows: tuple[list, list, list]) -> None:
+    """旧实现：逐行构造 dict 并 str() UUID，再用 pandas groupby 取最大值"""
+    import pandas as pd
+
+    favorites, ratings, history = rows
+    interactions = []
+    for user_id, novel_id in favorites:
+        interactions.append({'user_id': str(user_id), 'novel_id': str(novel_id), 'score': FAVORITE_WEIGHT})
+    for user_id, novel_id, score in ratings:
+        interactions.append({'user_id': str(user_id), 'novel_id': str(novel_id), 'score': (score / 5.0) * RATING_WEIGHT})
+    for user_id, novel_id in history:
+        interactions.append({'user_id': str(user_id), 'novel_id': str(novel_id), 'score': READ_WEIGHT})
+    df = pd.DataFrame(interactions)
+    df.groupby(['user_id', 'novel_id'])['score'].max().reset_index()
+
+
+def columnar_interaction_loader(rows: tuple[list, list, list], chunk_size: int = 10000) -> None:
+    """新实现：按块映射为 int32 下标并在 NumPy 数组上取最大值"""
+    favorites, ratings, history = rows
+    accumulator = InteractionAccumulator()
+    for start in range(0, len(favorites), chunk_size):
+        users, novels = zip(*favorites[start:start + chunk_size])
+        accumulator.add(users, novels, np.full(len(users), FAVORITE_WEIGHT, dtype=np.float32))
+    for start in range(0, len(ratings), chunk_size):
+        users, novels, scores = zip(*ratings[start:start + chunk_size])
+        accumulator.add(users, novels, np.asarray(scores, dtype=np.float32) / 5.0 * RATING_WEIGHT)
+    for start in range(0, len(history), chunk_size):
+        users, novels = zip(*history[start:start + chunk_size])
+        accumulator.add(users, novels, np.full(len(users), READ_WEIGHT, dtype=np.float32))
+    accumulator.finish()
+
+
+def loader_suite(n_users: int, n_items: int, n_interactions: int) -> list[BenchmarkResult]:
+    """交互数据加载：逐行 dict + pandas vs 列式 NumPy 累加器"""
+    args = (n_users, n_items, n_interactions)
+    return [
+        run_isolated("load_interactions/pandas", pandas_interaction_loader, *args, setup=_synthetic_rows_setup),
+        run_isolated("load_interactions/columnar", columnar_interaction_loader, *args, setup=_synthetic_rows_setup),
+    ]
+
+
+def _scoring_setup(n_users: int, n_items: int, n_interactions: int, top_k: int):
+    user_item = synthetic_interactions(n_users, n_items, n_interactions)
+    return user_item, topk_cosine_similarity(user_item.T.tocsr(), top_k)
+
+
+def per_user_scoring(data, n: int = 20) -> None:
+    """旧实现：逐个用户稠密化向量、全量矩阵乘法、全量 argsort"""
+    user_item, item_similarity = data
+    for user_idx in range(user_item.shape[0]):
+        user_vector = user_item[user_idx].toarray().ravel()
+        scores = item_similarity.T @ user_vector
+        scores[user_vector > 0] = -1
+        np.argsort(scores)[::-1][:n]
+
+
+def batched_scoring(data, workers: int = 1, n: int = 20) -> None:
+    """新实现：按用户块稀疏矩阵乘法 + argpartition，可多进程"""
+    user_item, item_similarity = data
+    for _ in score_users(user_item, item_similarity, n, workers=workers):
+        pass
+
+
+def _batched_scoring_parallel(data) -> None:
+    batched_scoring(data, workers=multiprocessing.cpu_count())
+
+
+def scoring_suite(n_users: int, n_items: int, n_interactions: int, top_k: int) -> list[BenchmarkResult]:
+    """全体用户打分：逐用户循环 vs 批量打分（单进程 / 多进程）"""
+    args = (n_users, n_items, n_interactions, top_k)
+    return [
+        run_isolated("score_users/per_user", per_user_scoring, *args, setup=_scoring_setup),
+        run_isolated("score_users/batched", batched_scoring, *args, setup=_scoring_setup),
+        run_isolated(
+            f"score_users/batched_x{multiprocessing.cpu_count()}",
+            _batched_scoring_parallel,
+            *args,
+            setup=_scoring_setup,
+        ),
+    ]
+
+
+def als_training(user_item: csr_matrix, factors: int = 64, iterations: int = 15) -> None:
+    """ALS：训练用户/小说因子"""
+    from recommendations.algorithms.als import ALSRecommender
+
+    recommender = ALSRecommender(factors=factors, iterations=iterations)
+    recommender.user_item_matrix = user_item
+    recommender.fit()
+
+
+def als_suite(
+    n_users: int,
+    n_items: int,
+    n_interactions: int,
+    top_k: int,
+    factors: int,
+    iterations: int,
+) -> list[BenchmarkResult]:
+    """离线训练：item-CF 相似度 vs ALS 因子"""
+    user_item = synthetic_interactions(n_users, n_items, n_interactions)
+    return [
+        run_isolated(f"train/item_cf_top{top_k}", sparse_item_similarity, user_item, top_k),
+        run_isolated(f"train/als_f{factors}_it{iterations}", als_training, user_item, factors, iterations),
+    ]
+
+
+def _ann_setup(n_items: int, dim: int, seed: int = 42):
+    """生成带簇结构的合成小说向量并构建索引"""
+    from recommendations.algorithms.ann import IVFIndex
+
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(n_items // 500, 1), dim))
+    vectors = centers[rng.integers(0, centers.shape[0], n_items)] + 0.5 * rng.standard_normal((n_items, dim))
+    ids = [str(i) for i in range(n_items)]
+    return IVFIndex.build(ids, vectors.astype(np.float32)), ids
+
+
+def ann_queries(data, n_queries: int = 1000) -> None:
+    """ANN 索引：逐条查询 n_queries 个小说的 top-10 相似小说"""
+    index, ids = data
+    for item_id in ids[:n_queries]:
+        index.search_id(item_id, 10)
+
+
+def exact_queries(data, n_queries: int = 1000) -> None:
+    """暴力扫描：逐条计算与全部小说的内积并取 top-10"""
+    index, ids = data
+    vectors = index.vectors
+    for item_id in ids[:n_queries]:
+        scores = vectors @ index.vector(item_id)
+        np.argpartition(-scores, 10)[:11]
+
+
+def ann_suite(n_items: int, dim: int = 64, n_queries: int = 1000) -> list[BenchmarkResult]:
+    """在线相似小说查询：IVF 索引 vs 暴力扫描（每个用例 n_queries 次查询）"""
+    return [
+        run_isolated(f"similar/exact_x{n_queries}", exact_queries, n_items, dim, setup=_ann_setup),
+        run_isolated(f"similar/ivf_x{n_queries}", ann_queries, n_items, dim, setup=_ann_setup),
+    ]
+
+
+def _online_setup(n_users: int, n_items: int, n_interactions: int, top_k: int, dim: int):
+    """把合成的 CF 相似度和内容 ANN 索引写成产物，并构建在线服务和一批用户的交互"""
+    import tempfile
+    from pathlib import Path
+
+    from recommendations.algorithms import collaborative_filtering, content_based
+    from recommendations.algorithms.artifacts import save_artifacts
+    from recommendations.online import OnlineRecommender
+
+    user_item = synthetic_interactions(n_users, n_items, n_interactions)
+    novel_ids = [f"novel-{i}" for i in range(n_items)]
+    state_dir = Path(tempfile.mkdtemp(prefix="online-bench-"))
+    save_artifacts(
+        state_dir,
+        collaborative_filtering.ARTIFACT_NAME,
+        {
+            'item_similarity': topk_cosine_similarity(user_item.T.tocsr(), top_k),
+            'novel_ids': np.array(novel_ids, dtype=str),
+        },
+    )
+
+    index, _ = _ann_setup(n_items, dim)
+    index.ids = novel_ids
+    index.save(state_dir, content_based.ANN_ARTIFACT_NAME)
+
+    service = OnlineRecommender(state_dir)
+    service.snapshot()
+    users = [
+        {novel_ids[col]: float(w) for col, w in zip(user_item[u].indices, user_item[u].data)}
+        for u in range(min(n_users, 1000))
+    ]
+    return service, [weights for weights in users if weights]
+
+
+def online_requests(data, n: int = 20) -> None:
+    """在线服务：逐个用户根据当前交互实时打分"""
+    service, users = data
+    for weights in users:
+        service.recommend_for_interactions(weights, n)
+
+
+def online_suite(n_users: int, n_items: int, n_interactions: int, top_k: int, dim: int = 64) -> list[BenchmarkResult]:
+    """在线实时打分延迟（不含读取交互的 SQL）：最多 1000 个用户，逐个请求"""
+    n_requests = min(n_users, 1000)
+    return [
+        run_isolated(
+            f"online/recommend_x{n_requests}",
+            online_requests,
+            n_users, n_items, n_interactions, top_k, dim,
+            setup=_online_setup,
+        ),
+    ]
+
+
+def _content_setup(
+    n_users: int,
+    n_items: int,
+    n_interactions: int,
+    top_k: int,
+    latent_dim: int | None,
+    vocab_size: int = 50000,
+    seed: int = 42,
+):
+    """生成已分词的合成小说文本（按主题偏移的 Zipf 词频）和交互矩阵"""
+    rng = np.random.default_rng(seed)
+    n_topics = max(n_items // 200, 1)
+    lengths = rng.integers(40, 160, n_items)
+    topics = np.repeat(rng.integers(0, n_topics, n_items), lengths)
+    ranks = np.minimum(rng.zipf(1.3, lengths.sum()), vocab_size) - 1
+    # 常用词在所有主题间共享，其余词按主题偏移到不同的词表区间
+    words = np.where(ranks < 50, ranks, (ranks + topics * (vocab_size // n_topics)) % vocab_size)
+    texts = [' '.join(f"w{w}" for w in doc) for doc in np.split(words, np.cumsum(lengths)[:-1])]
+    return texts, synthetic_interactions(n_users, n_items, n_interactions), top_k, latent_dim
+
+
+def content_pipeline(data, n: int = 20) -> None:
+    """内容推荐：TF-IDF 向量化（可选 SVD 降维）、相似度 top-k、全体用户画像打分"""
+    from recommendations.algorithms.content_based import ContentBasedRecommender
+
+    texts, user_item, top_k, latent_dim = data
+    recommender = ContentBasedRecommender(top_k_similar=top_k, latent_dim=latent_dim)
+    recommender.novel_ids = [str(i) for i in range(len(texts))]
+    recommender.novel_id_to_idx = {nid: i for i, nid in enumerate(recommender.novel_ids)}
+    recommender.fit_transform(texts)
+    if latent_dim is not None:
+        recommender.compute_latent_vectors()
+    recommender.compute_similarity_matrix()
+    for _ in recommender.score_users(user_item, n):
+        pass
+
+
+def content_suite(
+    n_users: int,
+    n_items: int,
+    n_interactions: int,
+    top_k: int,
+    latent_dim: int = 128,
+) -> list[BenchmarkResult]:
+    """内容推荐流水线：原始 TF-IDF vs SVD 潜在空间（不含分词）"""
+    args = (n_users, n_items, n_interactions, top_k)
+    return [
+        run_isolated("content/tfidf", content_pipeline, *args, None, setup=_content_setup),
+        run_isolated(f"content/latent_{latent_dim}", content_pipeline, *args, latent_dim, setup=_content_setup),
+    ]
@@ -0,0 +1,145 @@
+"""
+推荐流水线基准测试 Django Management Command
+
+用法：
+    python manage.py benchmark_recommendations --suite=similarity
+    python manage.py benchmark_recommendations --suite=similarity --items=50000 --skip-dense
+    python manage.py benchmark_recommendations --suite=loader --interactions=1000000
+    python manage.py benchmark_recommendations --suite=scoring --users=100000
+    python manage.py benchmark_recommendations --suite=als --factors=64 --iterations=15
+    python manage.py benchmark_recommendations --suite=ann --items=200000
+    python manage.py benchmark_recommendations --suite=online
+    python manage.py benchmark_recommendations --suite=content --items=50000 --latent-dim=128
+
+每个用例在独立子进程中运行，输出耗时和峰值 RSS 增量。
+所有数据均为合成数据，不会读写数据库。
+"""
+
+from django.core.management.base import BaseCommand
+
+from recommendations import benchmarks
+
+
+class Command(BaseCommand):
+    help = '对推荐算法的关键步骤进行基准测试（耗时与峰值内存）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--suite',
+            type=str,
+            default='similarity',
+            choices=['similarity', 'loader', 'scoring', 'als', 'ann', 'online', 'content'],
+            help='选择要运行的基准测试: similarity(物品相似度), loader(交互数据加载), '
+                 'scoring(全体用户打分), als(ALS 与 item-CF 训练耗时), ann(相似小说在线查询), '
+                 'online(在线实时打分延迟), content(内容推荐：TF-IDF 与 SVD 潜在空间)'
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=20000,
+            help='合成数据的用户数'
+        )
+        parser.add_argument(
+            '--items',
+            type=int,
+            default=10000,
+            help='合成数据的小说数'
+        )
+        parser.add_argument(
+            '--interactions',
+            type=int,
+            default=500000,
+            help='合成数据的交互条数'
+        )
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=20,
+            help='每个小说保留的最相似小说数量'
+        )
+        parser.add_argument(
+            '--factors',
+            type=int,
+            default=64,
+            help='ALS：隐因子维度'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=15,
+            help='ALS：交替求解轮数'
+        )
+        parser.add_argument(
+            '--latent-dim',
+            type=int,
+            default=128,
+            help='内容推荐：潜在空间维度'
+        )
+        parser.add_argument(
+            '--skip-dense',
+            action='store_true',
+            help='跳过旧的稠密实现（大目录下会耗尽内存）'
+        )
+
+    def handle(self, *args, **options):
+        suite = options['suite']
+        self.stdout.write(self.style.NOTICE(
+            f"Running benchmark suite={suite} "
+            f"(users={options['users']}, items={options['items']}, interactions={options['interactions']})..."
+        ))
+
+        if suite == 'similarity':
+            results = benchmarks.similarity_suite(
+                n_users=options['users'],
+                n_items=options['items'],
+                n_interactions=options['interactions'],
+                top_k=options['top_k'],
+                include_dense=not options['skip_dense'],
+            )
+        elif suite == 'loader':
+            results = benchmarks.loader_suite(
+                n_users=options['users'],
+                n_items=options['items'],
+                n_interactions=options['interactions'],
+            )
+        elif suite == 'scoring':
+            results = benchmarks.scoring_suite(
+                n_users=options['users'],
+                n_items=options['items'],
+                n_interactions=options['interactions'],
+                top_k=options['top_k'],
+            )
+        elif suite == 'als':
+            results = benchmarks.als_suite(
+                n_users=options['users'],
+                n_items=options['items'],
+                n_interactions=options['interactions'],
+                top_k=options['top_k'],
+                factors=options['factors'],
+                iterations=options['iterations'],
+            )
+        elif suite == 'ann':
+            results = benchmarks.ann_suite(
+                n_items=options['items'],
+                dim=options['factors'],
+            )
+        elif suite == 'online':
+            results = benchmarks.online_suite(
+                n_users=options['users'],
+                n_items=options['items'],
+                n_interactions=options['interactions'],
+                top_k=options['top_k'],
+                dim=options['factors'],
+            )
+        elif suite == 'content':
+            results = benchmarks.content_suite(
+                n_users=options['users'],
+                n_items=options['items'],
+                n_interactions=options['interactions'],
+                top_k=options['top_k'],
+                latent_dim=options['latent_dim'],
+            )
+
+        self.stdout.write(f"{'case':<40}{'time (s)':>12}{'peak RSS (MB)':>16}")
+        for result in results:
+            self.stdout.write(f"{result.name:<40}{result.seconds:>12.3f}{result.peak_rss_mb:>16.1f}")
@@ -5,22 +5,45 @@
     python manage.py compute_recommendations                # 运行所有算法
     python manage.py compute_recommendations --algorithm=cf  # 只运行协同过滤
     python manage.py compute_recommendations --algorithm=content  # 只运行内容推荐
+    python manage.py compute_recommendations --algorithm=als  # 只运行 ALS 矩阵分解
+    python manage.py compute_recommendations --algorithm=hybrid  # 只按当前的 cf/content 结果重新生成混合推荐
+    python manage.py compute_recommendations --algorithm=cf --incremental  # 协同过滤增量更新
+    python manage.py compute_recommendations --algorithm=content --incremental  # 只处理新增/修改/下架的小说
+    python manage.py compute_recommendations --half-life-days=90  # 交互权重按 90 天半衰期衰减
+    python manage.py compute_recommendations --max-memory=512M  # 相似度计算限制在约 512MB 内
+    python manage.py compute_recommendations --algorithm=content --latent-dim=128  # 在 128 维潜在空间计算内容相似度
 
 功能：
 1. 计算协同过滤推荐（基于用户收藏/评分的物品相似度）
-2. 计算内容推荐（基于小说简介/标签的TF-IDF相似度）
-3. 将结果缓存到 RecommendationCache 表供API查询
+2. 计算内容推荐（基于小说简介/标签的TF-IDF相似度），并构建相似小说查询用的 ANN 索引
+3. 计算 ALS 推荐（隐式反馈矩阵分解，用户因子与小说因子的点积）
+4. 将结果缓存到 RecommendationCache 表供API查询
+5. 运行过 cf 或 content 后，把两者按权重混合成排好序的 hybrid 推荐（personalized 接口直接读取）
 
-建议定期执行（如每天凌晨）以更新推荐结果
+建议定期执行（如每天凌晨）以更新推荐结果；
+协同过滤的增量模式只处理上次运行之后变化的交互，内容推荐的增量模式只处理变化的小说，可以每天多次执行
 """
 
+import argparse
 import logging
+import re
 import time
 
+from django.conf import settings
 from django.core.management.base import BaseCommand
 
 logger = logging.getLogger(__name__)
 
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(value: str) -> int:
+    """解析内存大小，如 512M、2G、1048576（字节）"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([KMG]?)B?', value.strip().upper())
+    if not match:
+        raise argparse.ArgumentTypeError(f'invalid size: {value}')
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
 
 class Command(BaseCommand):
     help = '计算推荐结果并缓存到数据库'
@@ -30,8 +53,8 @@ class Command(BaseCommand):
             '--algorithm',
             type=str,
             default='all',
-            choices=['cf', 'content', 'all'],
-            help='选择要运行的算法: cf(协同过滤), content(内容推荐), all(全部)'
+            choices=['cf', 'content', 'als', 'hybrid', 'all'],
+            help='选择要运行的算法: cf(协同过滤), content(内容推荐), als(矩阵分解), hybrid(只重新混合), all(全部)'
         )
         parser.add_argument(
             '--min-interactions',
@@ -51,58 +74,202 @@ class Command(BaseCommand):
             default=20,
             help='为每个用户生成的推荐数量'
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='并行计算使用的进程数（协同过滤批量打分、内容推荐分词）'
+        )
+        parser.add_argument(
+            '--half-life-days',
+            type=float,
+            default=None,
+            help='交互权重按时间指数衰减的半衰期（天），默认不衰减'
+        )
+        parser.add_argument(
+            '--max-memory',
+            type=parse_size,
+            default=None,
+            help='相似度计算的内存预算（如 512M、2G）；指定时按行块计算，中间结果写入 TMPDIR 下的临时文件'
+        )
+        parser.add_argument(
+            '--latent-dim',
+            type=int,
+            default=None,
+            help='内容推荐：先把 TF-IDF 经 SVD 降到该维度（如 128）再计算相似度和推荐，默认直接使用 TF-IDF'
+        )
+        parser.add_argument(
+            '--factors',
+            type=int,
+            default=64,
+            help='ALS：隐因子维度'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=15,
+            help='ALS：交替求解轮数'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=None,
+            help='ALS：求解线程数（默认使用全部 CPU）'
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='协同过滤/内容推荐：基于上次保存的状态只处理新变化的交互或小说（无历史状态时自动全量计算）'
+        )
 
     def handle(self, *args, **options):
         algorithm = options['algorithm']
         min_interactions = options['min_interactions']
         top_k = options['top_k']
         n_recommendations = options['n_recommendations']
+        incremental = options['incremental']
+        workers = options['workers']
+        half_life_days = options['half_life_days']
+        max_memory = options['max_memory']
 
         self.stdout.write(self.style.NOTICE(f'Starting recommendation computation (algorithm={algorithm})...'))
         
         start_time = time.time()
 
+        # 增量计算时只为推荐被重写的用户重新混合 hybrid 推荐；None 表示全部用户
+        changed_users: set[str] | None = set()
+
         if algorithm in ('cf', 'all'):
-            self._run_collaborative_filtering(min_interactions, top_k, n_recommendations)
+            users = self._run_collaborative_filtering(
+                min_interactions, top_k, n_recommendations, incremental, workers, half_life_days, max_memory
+            )
+            changed_users = None if users is None or changed_users is None else changed_users | set(users)
 
         if algorithm in ('content', 'all'):
-            self._run_content_based(top_k, n_recommendations)
+            users = self._run_content_based(
+                top_k, n_recommendations, half_life_days, max_memory, workers, incremental, options['latent_dim']
+            )
+            changed_users = None if users is None or changed_users is None else changed_users | set(users)
+
+        if algorithm in ('als', 'all'):
+            self._run_als(
+                min_interactions, n_recommendations, options['factors'], options['iterations'], options['threads'],
+                half_life_days
+            )
+
+        if algorithm == 'hybrid' or (algorithm in ('cf', 'content', 'all') and changed_users is None):
+            self._run_hybrid(n_recommendations)
+        elif algorithm in ('cf', 'content', 'all') and changed_users:
+            self._run_hybrid(n_recommendations, user_ids=sorted(changed_users))
+
+        # 相似小说接口的响应缓存来自旧的相似度结果，换代后使其失效
+        from core.response_cache import invalidate_catalog
+        invalidate_catalog()
 
         elapsed = time.time() - start_time
         self.stdout.write(self.style.SUCCESS(f'Recommendation computation completed in {elapsed:.2f}s'))
 
-    def _run_collaborative_filtering(self, min_interactions, top_k, n_recommendations):
+    def _run_collaborative_filtering(
+        self, min_interactions, top_k, n_recommendations, incremental=False, workers=1, half_life_days=None,
+        max_memory=None
+    ):
         """运行协同过滤推荐"""
-        self.stdout.write(self.style.NOTICE('Running Collaborative Filtering...'))
+        mode = 'incremental' if incremental else 'full'
+        self.stdout.write(self.style.NOTICE(f'Running Collaborative Filtering ({mode})...'))
         
         try:
             from recommendations.algorithms.collaborative_filtering import CollaborativeFilterRecommender
             
             recommender = CollaborativeFilterRecommender(
                 min_interactions=min_interactions,
-                top_k_similar=top_k
+                top_k_similar=top_k,
+                workers=workers,
+                half_life_days=half_life_days,
+                max_memory=max_memory
             )
-            recommender.run()
+            state_dir = settings.RECOMMENDATION_STATE_DIR
+            users = None
+            if incremental:
+                users = recommender.run_incremental(state_dir, n_recommendations=n_recommendations)
+            else:
+                recommender.run(n_recommendations=n_recommendations, state_dir=state_dir)
             
             self.stdout.write(self.style.SUCCESS('Collaborative Filtering completed!'))
+            return users
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Collaborative Filtering failed: {e}'))
             logger.exception("CF computation error")
+            return []
 
-    def _run_content_based(self, top_k, n_recommendations):
+    def _run_content_based(
+        self, top_k, n_recommendations, half_life_days=None, max_memory=None, workers=1, incremental=False,
+        latent_dim=None
+    ):
         """运行内容推荐"""
-        self.stdout.write(self.style.NOTICE('Running Content-Based Recommendation...'))
+        mode = 'incremental' if incremental else 'full'
+        self.stdout.write(self.style.NOTICE(f'Running Content-Based Recommendation ({mode})...'))
         
         try:
             from recommendations.algorithms.content_based import ContentBasedRecommender
             
             recommender = ContentBasedRecommender(
                 max_features=3000,
-                top_k_similar=top_k
+                top_k_similar=top_k,
+                half_life_days=half_life_days,
+                max_memory=max_memory,
+                workers=workers,
+                latent_dim=latent_dim
             )
-            recommender.run()
+            state_dir = settings.RECOMMENDATION_STATE_DIR
+            users = None
+            if incremental:
+                users = recommender.run_incremental(state_dir, n_recommendations=n_recommendations)
+            else:
+                recommender.run(state_dir=state_dir, n_recommendations=n_recommendations)
             
             self.stdout.write(self.style.SUCCESS('Content-Based Recommendation completed!'))
+            return users
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Content-Based Recommendation failed: {e}'))
             logger.exception("Content computation error")
+            return []
+
+    def _run_hybrid(self, n_recommendations, user_ids=None):
+        """按当前版本的 cf / content 推荐生成 hybrid 推荐
+
+        Args:
+            user_ids: 只重新混合这些用户（增量计算），默认为全部用户写入新版本
+        """
+        scope = 'all users' if user_ids is None else f'{len(user_ids)} users'
+        self.stdout.write(self.style.NOTICE(f'Blending hybrid recommendations ({scope})...'))
+        
+        try:
+            from recommendations.algorithms.hybrid import save_hybrid_recommendations
+            
+            save_hybrid_recommendations(n_recommendations, user_ids=user_ids)
+            
+            self.stdout.write(self.style.SUCCESS('Hybrid recommendations completed!'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Hybrid recommendations failed: {e}'))
+            logger.exception("Hybrid computation error")
+
+    def _run_als(self, min_interactions, n_recommendations, factors, iterations, threads, half_life_days=None):
+        """运行 ALS 矩阵分解推荐"""
+        self.stdout.write(self.style.NOTICE('Running ALS Matrix Factorization...'))
+        
+        try:
+            from recommendations.algorithms.als import ALSRecommender
+            
+            recommender = ALSRecommender(
+                factors=factors,
+                iterations=iterations,
+                min_interactions=min_interactions,
+                threads=threads,
+                half_life_days=half_life_days
+            )
+            recommender.run(n_recommendations=n_recommendations, state_dir=settings.RECOMMENDATION_STATE_DIR)
+            
+            self.stdout.write(self.style.SUCCESS('ALS Matrix Factorization completed!'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'ALS Matrix Factorization failed: {e}'))
+            logger.exception("ALS computation error")
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:06
+
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('novels', '0003_add_source_url'),
+        ('recommendations', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheGeneration',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('table', models.CharField(help_text='缓存表名: recommendation_cache, novel_similarity', max_length=64)),
+                ('algorithm', models.CharField(max_length=32)),
+                ('generation', models.PositiveIntegerField(default=0, help_text='当前生效的版本号')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'cache_generation',
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='novelsimilarity',
+            name='uq_sim_novels_algo',
+        ),
+        migrations.RemoveConstraint(
+            model_name='recommendationcache',
+            name='uq_rec_user_novel_algo',
+        ),
+        migrations.RemoveIndex(
+            model_name='novelsimilarity',
+            name='novel_simil_novel_a_0814bc_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='recommendationcache',
+            name='recommendat_user_id_08b2a8_idx',
+        ),
+        migrations.AddField(
+            model_name='novelsimilarity',
+            name='generation',
+            field=models.PositiveIntegerField(default=0, help_text='数据版本号'),
+        ),
+        migrations.AddField(
+            model_name='recommendationcache',
+            name='generation',
+            field=models.PositiveIntegerField(default=0, help_text='数据版本号'),
+        ),
+        migrations.AddIndex(
+            model_name='novelsimilarity',
+            index=models.Index(fields=['novel_a', 'algorithm', 'generation', '-similarity'], name='novel_simil_novel_a_346cb7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='novelsimilarity',
+            index=models.Index(fields=['algorithm', 'generation'], name='novel_simil_algorit_707bec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recommendationcache',
+            index=models.Index(fields=['user', 'algorithm', 'generation', '-score'], name='recommendat_user_id_5d224b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recommendationcache',
+            index=models.Index(fields=['algorithm', 'generation'], name='recommendat_algorit_369e94_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='novelsimilarity',
+            constraint=models.UniqueConstraint(fields=('novel_a', 'novel_b', 'algorithm', 'generation'), name='uq_sim_novels_algo_gen'),
+        ),
+        migrations.AddConstraint(
+            model_name='recommendationcache',
+            constraint=models.UniqueConstraint(fields=('user', 'novel', 'algorithm', 'generation'), name='uq_rec_user_novel_algo_gen'),
+        ),
+        migrations.AddConstraint(
+            model_name='cachegeneration',
+            constraint=models.UniqueConstraint(fields=('table', 'algorithm'), name='uq_cache_generation_table_algo'),
+        ),
+    ]
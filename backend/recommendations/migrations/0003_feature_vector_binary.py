@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+def clear_feature_vectors(apps, schema_editor):
+    # 特征向量是可重建的缓存，旧行的下标来自 TfidfVectorizer 词表，与哈希特征空间不兼容，
+    # 直接清空，下一次内容推荐计算时重新写入
+    apps.get_model('recommendations', 'NovelFeatureVector').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0002_cache_generations'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_feature_vectors, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='novelfeaturevector',
+            name='vector_data',
+        ),
+        migrations.AddField(
+            model_name='novelfeaturevector',
+            name='indices',
+            field=models.BinaryField(default=b'', help_text='非零元素的特征下标（<i4）'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='novelfeaturevector',
+            name='values',
+            field=models.BinaryField(default=b'', help_text='非零元素的值（<f4），与 indices 一一对应'),
+            preserve_default=False,
+        ),
+    ]
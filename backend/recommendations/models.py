@@ -12,21 +12,24 @@ class RecommendationCache(models.Model):
     """用户个性化推荐缓存表
     
     存储离线计算的推荐结果，API直接查询此表返回推荐
+    每次全量计算写入新的 generation，由 CacheGeneration 指向当前生效的版本
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='recommendation_cache')
     novel = models.ForeignKey(Novel, on_delete=models.CASCADE, related_name='recommended_to')
     score = models.FloatField(help_text="推荐分数，值越大越推荐")
     algorithm = models.CharField(max_length=32, help_text="算法类型: cf, content, hybrid")
+    generation = models.PositiveIntegerField(default=0, help_text="数据版本号")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'recommendation_cache'
         indexes = [
-            models.Index(fields=['user', 'algorithm', '-score']),
+            models.Index(fields=['user', 'algorithm', 'generation', '-score']),
+            models.Index(fields=['algorithm', 'generation']),
         ]
         constraints = [
-            models.UniqueConstraint(fields=['user', 'novel', 'algorithm'], name='uq_rec_user_novel_algo'),
+            models.UniqueConstraint(fields=['user', 'novel', 'algorithm', 'generation'], name='uq_rec_user_novel_algo_gen'),
         ]
 
     def __str__(self) -> str:
@@ -38,22 +41,25 @@ class NovelSimilarity(models.Model):
     
     存储小说间的相似度，用于 Item-CF 和 Content-Based 推荐
     只存储相似度较高的 top-N 对，避免存储全量矩阵
+    版本规则与 RecommendationCache 相同
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     novel_a = models.ForeignKey(Novel, on_delete=models.CASCADE, related_name='similarities_as_a')
     novel_b = models.ForeignKey(Novel, on_delete=models.CASCADE, related_name='similarities_as_b')
     similarity = models.FloatField(help_text="相似度分数，范围0-1")
     algorithm = models.CharField(max_length=32, help_text="算法类型: item_cf, content")
+    generation = models.PositiveIntegerField(default=0, help_text="数据版本号")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'novel_similarity'
         indexes = [
-            models.Index(fields=['novel_a', 'algorithm', '-similarity']),
+            models.Index(fields=['novel_a', 'algorithm', 'generation', '-similarity']),
             models.Index(fields=['novel_b', 'algorithm']),
+            models.Index(fields=['algorithm', 'generation']),
         ]
         constraints = [
-            models.UniqueConstraint(fields=['novel_a', 'novel_b', 'algorithm'], name='uq_sim_novels_algo'),
+            models.UniqueConstraint(fields=['novel_a', 'novel_b', 'algorithm', 'generation'], name='uq_sim_novels_algo_gen'),
         ]
 
     def __str__(self) -> str:
@@ -64,11 +70,13 @@ class NovelFeatureVector(models.Model):
     """小说特征向量缓存
     
     存储小说的TF-IDF向量，用于Content-Based推荐
-    向量以JSON格式存储（稀疏表示）
+    向量以紧凑的二进制格式存储（稀疏表示）：非零元素的下标为小端 int32 数组，值为小端 float32 数组，
+    编解码见 algorithms/storage.py
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     novel = models.OneToOneField(Novel, on_delete=models.CASCADE, related_name='feature_vector')
-    vector_data = models.JSONField(help_text="稀疏向量: {index: value, ...}")
+    indices = models.BinaryField(help_text="非零元素的特征下标（<i4）")
+    values = models.BinaryField(help_text="非零元素的值（<f4），与 indices 一一对应")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -77,3 +85,25 @@ class NovelFeatureVector(models.Model):
 
     def __str__(self) -> str:
         return f"Vector for {self.novel.title}"
+
+
+class CacheGeneration(models.Model):
+    """推荐缓存的当前版本指针
+
+    每个 (表, 算法) 一行。离线任务先写入新版本的数据，再更新这一行切换版本，
+    读取方只查询当前版本，因此切换过程中不会看到空缓存
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    table = models.CharField(max_length=64, help_text="缓存表名: recommendation_cache, novel_similarity")
+    algorithm = models.CharField(max_length=32)
+    generation = models.PositiveIntegerField(default=0, help_text="当前生效的版本号")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'cache_generation'
+        constraints = [
+            models.UniqueConstraint(fields=['table', 'algorithm'], name='uq_cache_generation_table_algo'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.table}/{self.algorithm} -> generation {self.generation}"
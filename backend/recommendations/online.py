@@ -0,0 +1,226 @@
+"""
+进程内在线推荐服务
+
+每个 Web 工作进程把离线任务产出的最新产物（见 algorithms/artifacts.py）以 mmap 方式加载一次：
+- CF：物品相似度 top-k（稀疏矩阵）和小说ID列表
+- 内容：ANN 索引（SVD 降维后的小说向量）和把新文本映射到同一空间的投影
+
+每隔 RELOAD_CHECK_INTERVAL 秒检查一次各产物的 CURRENT 版本号，出现新版本时加载成新的快照，
+再用一次引用赋值整体替换旧快照；正在处理的请求继续使用它拿到的旧快照，不会看到半新半旧的数据。
+
+在线打分只依赖用户当前的交互（几条 SQL），然后：
+1. CF：用户交互行向量 × 物品相似度矩阵，只在结果的非零元素上取 top-n
+2. 内容：用户交互过的小说向量加权平均作为画像，在 ANN 索引中查询最相似的小说
+3. 按与离线 hybrid 推荐相同的权重混合
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from recommendations.algorithms import collaborative_filtering, content_based
+from recommendations.algorithms.ann import IVFIndex
+from recommendations.algorithms.artifacts import current_version, load_artifacts
+from recommendations.algorithms.content_based import ContentProjection
+from recommendations.algorithms.hybrid import CF_WEIGHT, CONTENT_WEIGHT
+from recommendations.algorithms.loader import load_interactions
+from recommendations.algorithms.tokenization import build_text, tokenize
+
+logger = logging.getLogger(__name__)
+
+RELOAD_CHECK_INTERVAL = 5.0
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """某一时刻加载的一组产物，字段加载后不再替换
+
+    内容索引为新增小说追加向量时只整体替换其内部不可变的增量区（见 IVFIndex.add），
+    并发的请求看到的仍是一致的索引
+    """
+    versions: tuple[str | None, str | None]
+    item_similarity: csr_matrix | None = None
+    cf_novel_ids: list[str] = field(default_factory=list)
+    cf_novel_idx: dict[str, int] = field(default_factory=dict)
+    # 离线 CF 计算使用的交互时间衰减半衰期，实时打分沿用同一设置
+    half_life_days: float | None = None
+    content_index: IVFIndex | None = None
+    projection: ContentProjection | None = None
+
+
+class OnlineRecommender:
+    """进程内在线推荐服务（线程安全）"""
+
+    def __init__(self, state_dir: Path, reload_interval: float = RELOAD_CHECK_INTERVAL):
+        self.state_dir = Path(state_dir)
+        self.reload_interval = reload_interval
+        self._snapshot = _Snapshot(versions=(None, None))
+        self._checked_at: float | None = None
+        self._lock = threading.Lock()
+
+    def _current_versions(self) -> tuple[str | None, str | None]:
+        return (
+            current_version(self.state_dir, collaborative_filtering.ARTIFACT_NAME),
+            current_version(self.state_dir, content_based.ANN_ARTIFACT_NAME),
+        )
+
+    def _load(self, versions: tuple[str | None, str | None]) -> _Snapshot:
+        cf_version, content_version = versions
+        snapshot = {}
+
+        cf = None
+        if cf_version:
+            cf = load_artifacts(self.state_dir, collaborative_filtering.ARTIFACT_NAME, version=cf_version)
+        if cf is not None:
+            novel_ids = cf.ids('novel_ids')
+            snapshot.update(
+                item_similarity=cf['item_similarity'],
+                cf_novel_ids=novel_ids,
+                cf_novel_idx={nid: i for i, nid in enumerate(novel_ids)},
+                half_life_days=cf.meta.get('half_life_days'),
+            )
+
+        if content_version:
+            loaded = IVFIndex.load(self.state_dir, content_based.ANN_ARTIFACT_NAME, version=content_version)
+            if loaded is not None:
+                index, artifacts = loaded
+                # 没有文本投影（例如由 ALS 因子构建）的索引只能查询已索引的小说
+                projection = ContentProjection.from_artifacts(artifacts) if 'idf' in artifacts else None
+                snapshot.update(content_index=index, projection=projection)
+
+        logger.info(f"Loaded online recommendation artifacts cf={cf_version} content={content_version}")
+        return _Snapshot(versions=versions, **snapshot)
+
+    def snapshot(self) -> _Snapshot:
+        """返回当前快照；距上次检查超过 reload_interval 时检查并热加载新版本产物"""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.reload_interval:
+            return self._snapshot
+
+        with self._lock:
+            if self._checked_at is None or now - self._checked_at >= self.reload_interval:
+                try:
+                    versions = self._current_versions()
+                    if versions != self._snapshot.versions:
+                        self._snapshot = self._load(versions)
+                except Exception:
+                    # 加载失败时继续使用旧快照
+                    logger.exception("Failed to reload online recommendation artifacts")
+                self._checked_at = now
+        return self._snapshot
+
+    def recommend_for_interactions(self, weights: dict[str, float], n: int = 20) -> list[tuple[str, float]]:
+        """根据用户当前的交互实时打分
+
+        Args:
+            weights: {novel_id: 交互权重}
+
+        Returns:
+            List of (novel_id, score)，不含已交互的小说
+        """
+        if not weights:
+            return []
+
+        snapshot = self.snapshot()
+        combined: dict[str, float] = {}
+
+        for novel_id, score in _score_cf(snapshot, weights, n):
+            combined[novel_id] = combined.get(novel_id, 0.0) + CF_WEIGHT * score
+        for novel_id, score in _score_content(snapshot, weights, n):
+            combined[novel_id] = combined.get(novel_id, 0.0) + CONTENT_WEIGHT * score
+
+        return sorted(combined.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def recommend(self, user_id: str, n: int = 20) -> list[tuple[str, float]]:
+        """读取用户当前的交互并实时生成推荐"""
+        interactions = load_interactions(user_ids=[user_id], half_life_days=self.snapshot().half_life_days)
+        weights = {
+            str(interactions.novel_ids[col]): float(score)
+            for col, score in zip(interactions.cols, interactions.scores)
+        }
+        return self.recommend_for_interactions(weights, n)
+
+    def similar_novels(self, novel, n: int = 10) -> list[tuple[str, float]]:
+        """用内容 ANN 索引查询与 novel 相似的小说
+
+        novel 不在索引中（离线任务之后新增）时，现场计算其向量并追加到当前快照的索引
+
+        Returns:
+            List of (novel_id, similarity_score)
+        """
+        snapshot = self.snapshot()
+        index = snapshot.content_index
+        if index is None:
+            return []
+
+        novel_id = str(novel.id)
+        if novel_id not in index:
+            if snapshot.projection is None:
+                return []
+            text = tokenize(build_text(novel.title, novel.category, novel.tags, novel.intro, novel.author))
+            index.add([novel_id], snapshot.projection.transform([text]))
+        return [(nid, score) for nid, score in index.search_id(novel_id, n) if score > 0]
+
+
+def _score_cf(snapshot: _Snapshot, weights: dict[str, float], n: int) -> list[tuple[str, float]]:
+    """用户交互行向量 × 物品相似度矩阵，结果本身就是稀疏的"""
+    if snapshot.item_similarity is None:
+        return []
+
+    known = [(snapshot.cf_novel_idx[nid], w) for nid, w in weights.items() if nid in snapshot.cf_novel_idx]
+    if not known:
+        return []
+
+    cols = np.array([idx for idx, _ in known], dtype=np.int32)
+    data = np.array([w for _, w in known], dtype=np.float32)
+    user_row = csr_matrix((data, cols, np.array([0, cols.size])), shape=(1, snapshot.item_similarity.shape[0]))
+    scores = (user_row @ snapshot.item_similarity).tocsr()
+
+    candidates, values = scores.indices, scores.data
+    keep = ~np.isin(candidates, cols) & (values > 0)
+    candidates, values = candidates[keep], values[keep]
+    if values.size > n:
+        top = np.argpartition(-values, n - 1)[:n]
+        candidates, values = candidates[top], values[top]
+    order = np.argsort(-values, kind='stable')
+    return [(snapshot.cf_novel_ids[candidates[i]], float(values[i])) for i in order]
+
+
+def _score_content(snapshot: _Snapshot, weights: dict[str, float], n: int) -> list[tuple[str, float]]:
+    """交互过的小说向量加权平均作为用户画像，在 ANN 索引中查询"""
+    index = snapshot.content_index
+    if index is None:
+        return []
+
+    profile = np.zeros(index.dim, dtype=np.float32)
+    for novel_id, weight in weights.items():
+        vector = index.vector(novel_id)
+        if vector is not None:
+            profile += weight * vector
+    if not profile.any():
+        return []
+
+    return [(nid, score) for nid, score in index.search(profile, n, exclude=set(weights)) if score > 0]
+
+
+_service: OnlineRecommender | None = None
+_service_lock = threading.Lock()
+
+
+def get_online_recommender() -> OnlineRecommender:
+    """返回当前进程的在线推荐服务（首次调用时创建）"""
+    global _service
+    if _service is None:
+        from django.conf import settings
+
+        with _service_lock:
+            if _service is None:
+                _service = OnlineRecommender(settings.RECOMMENDATION_STATE_DIR)
+    return _service
@@ -0,0 +1,144 @@
+"""
+交互事件驱动的单用户推荐刷新
+
+收藏、评分、阅读历史写入提交后调用 notify_interaction()，由后台队列刷新该用户的推荐缓存，
+不必等待离线全量任务：
+1. 读取用户当前的全部交互权重
+2. 从当前版本的 NovelSimilarity（item_cf）读取这些小说的相似邻居
+3. 按 item-CF 的公式 score(b) = Σ w_i · sim(i, b) 重算分数，排除已交互的小说，取 top-n
+4. 在当前版本中原地替换该用户的 cf 推荐，并删除 content 推荐中已交互的小说
+5. 用更新后的 cf / content 推荐重算该用户的 hybrid 推荐
+
+按全部交互重算而不是在旧分数上累加，因此重复事件（例如同一本小说的多次阅读进度上报）
+和取消收藏都能得到正确结果。队列按用户合并：同一用户在处理前的多次事件只触发一次刷新。
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from recommendations.algorithms.loader import chunked, load_interactions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_N_RECOMMENDATIONS = 20
+# 收到第一个事件后等待的秒数，期间同一用户的后续事件合并为一次刷新
+COALESCE_DELAY = 0.5
+
+
+def refresh_user_recommendations(user_id: str, n: int = DEFAULT_N_RECOMMENDATIONS) -> int:
+    """用已保存的相似度邻居重算单个用户的 cf 推荐
+
+    Returns:
+        写入的推荐条数
+    """
+    from recommendations.algorithms.hybrid import save_hybrid_recommendations
+    from recommendations.algorithms.storage import current_generation_filter, replace_recommendations
+    from recommendations.models import NovelSimilarity, RecommendationCache
+    from recommendations.online import get_online_recommender
+
+    # 与最近一次离线 CF 计算使用相同的时间衰减设置
+    half_life_days = get_online_recommender().snapshot().half_life_days
+    interactions = load_interactions(user_ids=[user_id], half_life_days=half_life_days)
+    weights = {
+        str(interactions.novel_ids[col]): float(score)
+        for col, score in zip(interactions.cols, interactions.scores)
+    }
+
+    scores: dict[str, float] = defaultdict(float)
+    for chunk in chunked(list(weights)):
+        neighbours = NovelSimilarity.objects.filter(
+            current_generation_filter(NovelSimilarity),
+            algorithm='item_cf',
+            novel_a_id__in=chunk,
+            novel_b__status='published',
+        ).values_list('novel_a_id', 'novel_b_id', 'similarity')
+        for novel_a_id, novel_b_id, similarity in neighbours:
+            scores[str(novel_b_id)] += weights[str(novel_a_id)] * similarity
+
+    ranked = sorted(
+        ((novel_id, score) for novel_id, score in scores.items() if novel_id not in weights and score > 0),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:n]
+    saved = replace_recommendations('cf', ((user_id, novel_id, score) for novel_id, score in ranked), [user_id])
+
+    # 内容推荐不能按邻居重算，只去掉已经交互过的小说
+    stale_content = RecommendationCache.objects.filter(
+        current_generation_filter(RecommendationCache),
+        user_id=user_id,
+        algorithm='content',
+    )
+    for chunk in chunked(list(weights)):
+        stale_content.filter(novel_id__in=chunk).delete()
+
+    save_hybrid_recommendations(n, user_ids=[user_id])
+
+    logger.debug(f"Refreshed {saved} cf recommendations for user {user_id}")
+    return saved
+
+
+class RefreshQueue:
+    """按用户合并的后台刷新队列（单个守护线程）"""
+
+    def __init__(self, coalesce_delay: float = COALESCE_DELAY):
+        self.coalesce_delay = coalesce_delay
+        self._pending: set[str] = set()
+        self._condition = threading.Condition()
+        self._worker: threading.Thread | None = None
+
+    def enqueue(self, user_id: str):
+        with self._condition:
+            self._pending.add(user_id)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='recommendation-refresh', daemon=True)
+                self._worker.start()
+            self._condition.notify()
+
+    def _take(self) -> set[str]:
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+        # 等待一小段时间，让同一用户的连续事件合并
+        time.sleep(self.coalesce_delay)
+        with self._condition:
+            pending, self._pending = self._pending, set()
+        return pending
+
+    def process(self, user_ids: set[str]):
+        for user_id in user_ids:
+            try:
+                refresh_user_recommendations(user_id)
+            except Exception:
+                logger.exception(f"Failed to refresh recommendations for user {user_id}")
+
+    def _run(self):
+        while True:
+            self.process(self._take())
+            # 工作线程有自己的数据库连接，处理完一批后按 CONN_MAX_AGE 释放
+            close_old_connections()
+
+
+refresh_queue = RefreshQueue()
+
+
+def notify_interaction(user_id) -> None:
+    """在当前事务提交后刷新该用户的推荐
+
+    RECOMMENDATION_REFRESH_ASYNC 为 False 时在提交回调中同步刷新（测试和单进程调试用）
+    """
+    user_id = str(user_id)
+
+    def _dispatch():
+        if getattr(settings, 'RECOMMENDATION_REFRESH_ASYNC', True):
+            refresh_queue.enqueue(user_id)
+        else:
+            refresh_queue.process({user_id})
+
+    transaction.on_commit(_dispatch)
@@ -0,0 +1,93 @@
+"""
+相似小说列表（similar_novels 接口）
+
+每本小说的相似小说ID列表只构建一次：
+1. 一条 SQL 读取当前版本的 item_cf 与 content 相似度（按算法过滤、在数据库中排除未发布的小说），
+   按与 hybrid 推荐相同的权重合并分数，取前 SIMILAR_LIST_SIZE 个
+2. 没有离线相似度时（离线任务之后新增的小说）用内容 ANN 索引
+3. 仍然没有时取同分类热门
+
+列表缓存两级：进程内 LRU（最热的详情页不需要读取共享缓存）和共享的 'responses' 缓存（工作进程之间共享）。
+缓存键带目录版本号，小说状态变化、离线任务换代后随 invalidate_catalog() 失效。
+接口按 limit 截取列表，再从卡片缓存（novels/cards.py）取出序列化好的小说，命中时不执行任何 SQL。
+"""
+
+from __future__ import annotations
+
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+
+from core.response_cache import SIMILAR_PREFIX, LocalLRU, catalog_key, response_cache
+from novels.models import Novel
+from recommendations.algorithms.hybrid import CF_WEIGHT, CONTENT_WEIGHT
+
+# 接口 limit 的上限，列表按此长度构建，不同 limit 共用同一条缓存
+SIMILAR_LIST_SIZE = 50
+LOCAL_CACHE_SIZE = 4096
+SIMILARITY_WEIGHTS = {'item_cf': CF_WEIGHT, 'content': CONTENT_WEIGHT}
+
+_local_cache = LocalLRU(LOCAL_CACHE_SIZE)
+
+
+def build_similar_ids(novel: Novel, n: int = SIMILAR_LIST_SIZE) -> list[str]:
+    """构建 novel 的相似小说ID列表（已合并、只含已发布的小说），按相似度从高到低"""
+    from recommendations.algorithms.storage import algorithm_generation_filter
+    from recommendations.models import NovelSimilarity
+
+    rows = NovelSimilarity.objects.filter(
+        algorithm_generation_filter(NovelSimilarity, 'item_cf')
+        | algorithm_generation_filter(NovelSimilarity, 'content'),
+        novel_a=novel,
+        novel_b__status='published',
+    ).values_list('novel_b_id', 'algorithm', 'similarity')
+
+    scores: dict[str, float] = defaultdict(float)
+    for novel_id, algorithm, similarity in rows:
+        scores[str(novel_id)] += SIMILARITY_WEIGHTS[algorithm] * similarity
+    if scores:
+        return [novel_id for novel_id, _ in heapq.nlargest(n, scores.items(), key=lambda item: item[1])]
+
+    # 内容 ANN 索引
+    from recommendations.online import get_online_recommender
+
+    neighbour_ids = [novel_id for novel_id, _ in get_online_recommender().similar_novels(novel, n)]
+    published = {
+        str(novel_id)
+        for novel_id in Novel.objects.filter(id__in=neighbour_ids, status='published').values_list('id', flat=True)
+    }
+    ids = [novel_id for novel_id in neighbour_ids if novel_id in published]
+    if ids:
+        return ids
+
+    # Fallback: 同分类热门
+    fallback = Novel.objects.filter(
+        status='published',
+        category=novel.category,
+    ).exclude(id=novel.id).order_by('-favorites_count', '-views').values_list('id', flat=True)[:n]
+    return [str(novel_id) for novel_id in fallback]
+
+
+def similar_ids(novel_id: str) -> list[str] | None:
+    """novel_id 的相似小说ID列表（优先读取缓存）；小说不存在或未发布时返回 None"""
+    ttl = getattr(settings, 'RESPONSE_CACHE_TTL', 0)
+    if ttl <= 0:
+        novel = Novel.objects.filter(id=novel_id, status='published').first()
+        return None if novel is None else build_similar_ids(novel)
+
+    key = catalog_key(SIMILAR_PREFIX, novel_id)
+    ids = _local_cache.get(key)
+    if ids is not None:
+        return ids
+
+    cache = response_cache()
+    ids = cache.get(key)
+    if ids is None:
+        novel = Novel.objects.filter(id=novel_id, status='published').first()
+        if novel is None:
+            return None
+        ids = build_similar_ids(novel)
+        cache.set(key, ids, timeout=ttl)
+    _local_cache.set(key, ids, ttl)
+    return ids
@@ -4,14 +4,24 @@
 
 from __future__ import annotations
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from rest_framework.test import APIClient
 
+from novels.hot import refresh_hot_scores
 from novels.models import Novel
 from users.models import User
 from interactions.models import Favorite, Rating, ReadHistory
 
 
+# 测试使用进程内缓存，不读写开发环境的文件响应缓存
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "responses": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "responses"},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
 class RecommendationsTests(TestCase):
     """推荐API基础测试"""
     
@@ -29,6 +39,7 @@ class RecommendationsTests(TestCase):
                 views=100 - i * 10,
                 avg_rating=float(i % 5),
             )
+        refresh_hot_scores()
 
     def test_hot(self):
         """测试热门推荐"""
@@ -62,6 +73,24 @@ class RecommendationsTests(TestCase):
         expected_title = sorted(scored, key=lambda x: x[0], reverse=True)[0][1]
         self.assertEqual(items[0]["title"], expected_title)
 
+    def test_hot_score_refresh(self):
+        """刷新热度分数：下架小说清零，不修改 updated_at，新的热度在刷新后才生效"""
+        top = Novel.objects.get(title="测试小说0")
+        updated_at = top.updated_at
+        self.assertAlmostEqual(top.hot_score, 0.5 + 0.3 + 0.0, places=5)
+
+        Novel.objects.filter(title="测试小说9").update(favorites_count=100, views=1000)
+        items = self.client.get("/api/recommendations/hot", {"limit": 1}).json()["data"]
+        self.assertEqual(items[0]["title"], "测试小说0")
+
+        Novel.objects.filter(pk=top.pk).update(status="shelved")
+        refresh_hot_scores()
+        top.refresh_from_db()
+        self.assertEqual(top.hot_score, 0)
+        self.assertEqual(top.updated_at, updated_at)
+        items = self.client.get("/api/recommendations/hot", {"limit": 1}).json()["data"]
+        self.assertEqual(items[0]["title"], "测试小说9")
+
     def test_latest(self):
         """测试最新推荐"""
         resp = self.client.get("/api/recommendations/latest", {"limit": 5})
@@ -69,7 +98,31 @@ class RecommendationsTests(TestCase):
         items = resp.json()["data"]
         self.assertEqual(len(items), 5)
 
+    def test_home(self):
+        """首页推荐：一次返回多个栏目，小说卡片去重，匿名栏目走缓存"""
+        data = self.client.get("/api/recommendations/home", {"limit": 5}).json()["data"]
+        self.assertEqual(set(data["sections"]), {"hot", "latest"})
+        hot = self.client.get("/api/recommendations/hot", {"limit": 5}).json()["data"]
+        self.assertEqual(data["sections"]["hot"], [item["id"] for item in hot])
+        self.assertEqual(len(data["sections"]["latest"]), 5)
+        self.assertEqual(
+            set(data["novels"]), set(data["sections"]["hot"]) | set(data["sections"]["latest"])
+        )
+        with self.assertNumQueries(0):
+            self.client.get("/api/recommendations/home", {"limit": 5})
+
+        user = User.objects.create_user(email="home@test.com", password="testpass123", username="home")
+        self.client.force_authenticate(user=user)
+        data = self.client.get("/api/recommendations/home", {"sections": "personalized,hot", "limit": 3}).json()["data"]
+        # 冷启动用户的个性化推荐退回热门
+        self.assertEqual(data["sections"]["personalized"], data["sections"]["hot"])
+        self.assertEqual(len(data["novels"]), 3)
+
+        resp = self.client.get("/api/recommendations/home", {"sections": "hot,unknown"})
+        self.assertEqual(resp.status_code, 400)
 
+
+@override_settings(CACHES=TEST_CACHES)
 class CollaborativeFilteringTests(TestCase):
     """协同过滤算法测试"""
     
@@ -122,6 +175,38 @@ class CollaborativeFilteringTests(TestCase):
         self.assertFalse(df.empty)
         self.assertEqual(len(df), 8)  # 7个收藏记录 + 1条阅读历史
 
+    def test_load_interactions_takes_max(self):
+        """测试同一用户对同一小说的多次交互取最大权重"""
+        from recommendations.algorithms.collaborative_filtering import CollaborativeFilterRecommender
+
+        Rating.objects.create(user=self.user1, novel=self.novels[0], score=5)
+        Rating.objects.create(user=self.user1, novel=self.novels[4], score=5)
+
+        interactions = CollaborativeFilterRecommender(min_interactions=1).load_interactions()
+        matrix = interactions.to_csr()
+        user_idx = interactions.user_ids.index(self.user1.id)
+
+        self.assertEqual(len(interactions), 9)
+        self.assertAlmostEqual(matrix[user_idx, interactions.novel_ids.index(self.novels[0].id)], 0.8, places=5)
+        self.assertAlmostEqual(matrix[user_idx, interactions.novel_ids.index(self.novels[4].id)], 0.2, places=5)
+
+    def test_load_interactions_time_decay(self):
+        """测试交互权重按半衰期指数衰减"""
+        from datetime import timedelta
+
+        from recommendations.algorithms.loader import load_interactions
+
+        Favorite.objects.filter(user=self.user1, novel=self.novels[0]).update(
+            created_at=timezone.now() - timedelta(days=30)
+        )
+
+        interactions = load_interactions(user_ids=[self.user1.id], half_life_days=30)
+        matrix = interactions.to_csr()
+        user_idx = interactions.user_ids.index(self.user1.id)
+
+        self.assertAlmostEqual(matrix[user_idx, interactions.novel_ids.index(self.novels[0].id)], 0.4, places=3)
+        self.assertAlmostEqual(matrix[user_idx, interactions.novel_ids.index(self.novels[1].id)], 0.8, places=3)
+
     def test_build_matrix(self):
         """测试构建用户-物品矩阵"""
         from recommendations.algorithms.collaborative_filtering import CollaborativeFilterRecommender
@@ -149,7 +234,328 @@ class CollaborativeFilteringTests(TestCase):
         if novel0_id in recommender.novel_id_to_idx and novel1_id in recommender.novel_id_to_idx:
             idx0 = recommender.novel_id_to_idx[novel0_id]
             idx1 = recommender.novel_id_to_idx[novel1_id]
-            self.assertGreater(similarity[idx0][idx1], 0)
+            self.assertGreater(similarity[idx0, idx1], 0)
+
+    def test_incremental_update(self):
+        """测试增量更新只处理新交互并刷新受影响的相似度和推荐"""
+        import tempfile
+        from pathlib import Path
+
+        from recommendations.algorithms.collaborative_filtering import CollaborativeFilterRecommender
+        from recommendations.models import NovelSimilarity, RecommendationCache
+
+        with tempfile.TemporaryDirectory() as tmp:
+            state_dir = Path(tmp)
+            CollaborativeFilterRecommender(min_interactions=1).run(state_dir=state_dir)
+            self.assertFalse(
+                NovelSimilarity.objects.filter(novel_a=self.novels[2], novel_b=self.novels[4], algorithm='item_cf').exists()
+            )
+
+            user3 = User.objects.create_user(
+                email="user3@test.com",
+                password="testpass123",
+                username="user3",
+                display_name="User 3"
+            )
+            Favorite.objects.create(user=user3, novel=self.novels[2])
+            Favorite.objects.create(user=user3, novel=self.novels[4])
+
+            recommender = CollaborativeFilterRecommender(min_interactions=1)
+            refreshed = recommender.run_incremental(state_dir)
+
+            self.assertIn(str(user3.id), recommender.user_id_to_idx)
+            self.assertIn(str(user3.id), refreshed)
+            self.assertTrue(
+                NovelSimilarity.objects.filter(novel_a=self.novels[2], novel_b=self.novels[4], algorithm='item_cf').exists()
+            )
+            recommended = set(
+                RecommendationCache.objects.filter(user=user3, algorithm='cf').values_list('novel_id', flat=True)
+            )
+            self.assertTrue(recommended)
+            self.assertNotIn(self.novels[2].id, recommended)
+            self.assertNotIn(self.novels[4].id, recommended)
+
+    def test_incremental_similarity_adds_touched_item_to_untouched_rows(self):
+        """变化的小说与未变化小说的相似度升高后，应进入后者的 top-K"""
+        import numpy as np
+        from scipy.sparse import csr_matrix
+
+        from recommendations.algorithms.collaborative_filtering import CollaborativeFilterRecommender
+
+        # 小说 0 与 2 的相似度 0.5，与 1 的相似度 0.35；用户 2-4 只交互过小说 1
+        rows = [0, 0, 1, 1, 2, 3, 4, 5]
+        cols = [0, 1, 0, 2, 1, 1, 1, 2]
+        recommender = CollaborativeFilterRecommender(min_interactions=1, top_k_similar=1)
+        recommender.user_item_matrix = csr_matrix((np.ones(8, dtype=np.float32), (rows, cols)), shape=(6, 3))
+        recommender.compute_item_similarity()
+        self.assertEqual(recommender.item_similarity[0].indices.tolist(), [2])
+
+        # 用户 2-4 取消交互后小说 1 与 0 的相似度升到 0.71，只有小说 1 的列发生了变化
+        recommender.user_item_matrix = csr_matrix(
+            (np.ones(5, dtype=np.float32), (rows[:4] + [5], cols[:4] + [2])), shape=(6, 3)
+        )
+        affected = recommender.update_item_similarity(np.array([1]))
+
+        self.assertIn(0, affected)
+        self.assertEqual(recommender.item_similarity[0].indices.tolist(), [1])
+
+    def test_incremental_command_reblends_only_refreshed_users(self):
+        """增量计算只为推荐被重写的用户重新混合 hybrid 推荐，不写入新的全量版本"""
+        import tempfile
+        from io import StringIO
+        from pathlib import Path
+
+        from django.core.management import call_command
+        from django.test import override_settings
+
+        from recommendations.algorithms.storage import active_generation
+        from recommendations.models import RecommendationCache
+
+        with tempfile.TemporaryDirectory() as tmp, override_settings(RECOMMENDATION_STATE_DIR=Path(tmp)):
+            options = {'algorithm': 'cf', 'min_interactions': 1, 'stdout': StringIO()}
+            call_command('compute_recommendations', **options)
+            generation = active_generation(RecommendationCache, 'hybrid')
+
+            user3 = User.objects.create_user(email="user3@test.com", password="testpass123", username="user3")
+            Favorite.objects.create(user=user3, novel=self.novels[2])
+            call_command('compute_recommendations', incremental=True, **options)
+
+        self.assertEqual(active_generation(RecommendationCache, 'hybrid'), generation)
+        self.assertTrue(RecommendationCache.objects.filter(user=user3, algorithm='hybrid').exists())
+
+    def test_state_artifacts_are_memory_mapped(self):
+        """测试状态保存为版本化产物，加载时以 mmap 方式打开且只保留最近几个版本"""
+        import tempfile
+        from pathlib import Path
+
+        from recommendations.algorithms import artifacts
+        from recommendations.algorithms.collaborative_filtering import CollaborativeFilterRecommender
+        from recommendations.algorithms.similarity import row_top_items
+
+        with tempfile.TemporaryDirectory() as tmp:
+            state_dir = Path(tmp)
+            recommender = CollaborativeFilterRecommender(min_interactions=1)
+            recommender.run(state_dir=state_dir)
+            for _ in range(artifacts.KEEP_VERSIONS):
+                recommender.save_state(state_dir, timezone.now())
+
+            loaded = CollaborativeFilterRecommender(min_interactions=1)
+            self.assertIsNotNone(loaded.load_state(state_dir))
+            # 只读视图直接映射到文件，没有复制到内存
+            self.assertFalse(loaded.item_similarity.data.flags.writeable)
+            self.assertEqual(loaded.novel_ids, recommender.novel_ids)
+            self.assertEqual(row_top_items(loaded.item_similarity, 0), row_top_items(recommender.item_similarity, 0))
+            self.assertEqual(len(list((state_dir / 'cf').glob('v*'))), artifacts.KEEP_VERSIONS)
+            self.assertEqual(artifacts.current_version(state_dir, 'cf'), f"v{artifacts.KEEP_VERSIONS + 1:06d}")
+
+    def test_online_recommendations_hot_reload(self):
+        """测试没有缓存的新用户由在线服务实时打分，产物出现新版本时自动热加载"""
+        import tempfile
+        from pathlib import Path
+
+        from django.test import override_settings
+
+        from recommendations import online
+        from recommendations.algorithms.collaborative_filtering import CollaborativeFilterRecommender
+
+        with tempfile.TemporaryDirectory() as tmp:
+            state_dir = Path(tmp)
+            recommender = CollaborativeFilterRecommender(min_interactions=1)
+            recommender.run(state_dir=state_dir)
+
+            service = online.OnlineRecommender(state_dir, reload_interval=0)
+            first_version = service.snapshot().versions
+            recommender.save_state(state_dir, timezone.now())
+            self.assertNotEqual(service.snapshot().versions, first_version)
+
+            user3 = User.objects.create_user(
+                email="user3@test.com",
+                password="testpass123",
+                username="user3",
+                display_name="User 3"
+            )
+            Favorite.objects.create(user=user3, novel=self.novels[2])
+
+            self.addCleanup(setattr, online, '_service', None)
+            online._service = None
+            with override_settings(RECOMMENDATION_STATE_DIR=state_dir):
+                client = APIClient()
+                client.force_authenticate(user=user3)
+                items = client.get("/api/recommendations/personalized", {"limit": 3}).json()["data"]
+
+        titles = [item["title"] for item in items]
+        self.assertTrue(titles)
+        self.assertNotIn("CF测试小说2", titles)
+        self.assertIn("CF测试小说0", titles)
+
+    def test_interaction_refreshes_user_cache(self):
+        """测试收藏提交后按已保存的相似度邻居刷新该用户的 cf 推荐"""
+        from django.test import override_settings
+
+        from recommendations.algorithms.collaborative_filtering import CollaborativeFilterRecommender
+        from recommendations.models import RecommendationCache
+
+        CollaborativeFilterRecommender(min_interactions=1).run()
+        user3 = User.objects.create_user(
+            email="user3@test.com",
+            password="testpass123",
+            username="user3",
+            display_name="User 3"
+        )
+        client = APIClient()
+        client.force_authenticate(user=user3)
+
+        with override_settings(RECOMMENDATION_REFRESH_ASYNC=False):
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = client.post(f"/api/novels/{self.novels[2].id}/favorite")
+        self.assertEqual(resp.status_code, 200)
+
+        recommended = set(
+            RecommendationCache.objects.filter(user=user3, algorithm='cf').values_list('novel_id', flat=True)
+        )
+        # 小说2 只和 user1 的收藏（0、1）及阅读（3）共现
+        self.assertEqual(recommended, {self.novels[0].id, self.novels[1].id, self.novels[3].id})
+        # 该用户的 hybrid 推荐随之重算
+        self.assertEqual(
+            set(RecommendationCache.objects.filter(user=user3, algorithm='hybrid').values_list('novel_id', flat=True)),
+            recommended,
+        )
+
+    def test_als_recommendations(self):
+        """测试 ALS 训练并写入 algorithm='als' 的推荐缓存"""
+        import numpy as np
+
+        from recommendations.algorithms.als import ALSRecommender
+        from recommendations.models import RecommendationCache
+
+        recommender = ALSRecommender(factors=4, iterations=5, min_interactions=1, threads=2)
+        recommender.run()
+
+        self.assertEqual(recommender.user_factors.dtype, np.float32)
+        self.assertEqual(recommender.item_factors.shape, (5, 4))
+        recommended = list(
+            RecommendationCache.objects.filter(user=self.user2, algorithm='als').values_list('novel_id', flat=True)
+        )
+        self.assertEqual(recommended, [self.novels[2].id])
+
+
+class SparseSimilarityTests(TestCase):
+    """稀疏 top-k 相似度引擎测试"""
+
+    def test_matches_dense_cosine_top_k(self):
+        """分块稀疏计算结果应与稠密余弦相似度的 top-k 一致"""
+        import numpy as np
+        from scipy.sparse import random as sparse_random
+        from sklearn.metrics.pairwise import cosine_similarity
+
+        from recommendations.algorithms.similarity import topk_cosine_similarity
+
+        matrix = sparse_random(40, 30, density=0.2, format="csr", random_state=7, dtype=np.float32)
+        top_k = 5
+        sparse = topk_cosine_similarity(matrix, top_k, block_size=7)
+
+        dense = cosine_similarity(matrix.toarray())
+        np.fill_diagonal(dense, 0)
+
+        self.assertEqual(sparse.shape, (40, 40))
+        for i in range(40):
+            row = sparse.getrow(i)
+            self.assertLessEqual(row.nnz, top_k)
+            self.assertEqual(row[0, i], 0)
+            expected = np.sort(dense[i][dense[i] > 0])[::-1][:top_k]
+            np.testing.assert_allclose(np.sort(row.data)[::-1], expected, rtol=1e-5)
+
+    def test_memory_budget_spills_tiles(self):
+        """按内存预算分块并暂存到 memmap 的结果应与一次性计算一致，稠密输入与稀疏输入一致"""
+        import numpy as np
+        from scipy.sparse import random as sparse_random
+
+        from recommendations.algorithms.similarity import block_size_for_memory, topk_cosine_similarity
+
+        matrix = sparse_random(50, 30, density=0.2, format="csr", random_state=11, dtype=np.float32)
+        expected = topk_cosine_similarity(matrix, 5)
+
+        max_memory = 50 * 16 * 6
+        self.assertEqual(block_size_for_memory(50, max_memory), 6)
+        for source in (matrix, matrix.toarray()):
+            spilled = topk_cosine_similarity(source, 5, max_memory=max_memory)
+            self.assertEqual(spilled.dtype, np.float32)
+            np.testing.assert_allclose(spilled.toarray(), expected.toarray(), rtol=1e-5, atol=1e-6)
+
+    def test_batched_scoring_masks_interacted(self):
+        """批量打分的 top-n 应与逐用户全量排序一致，且不包含已交互小说"""
+        import numpy as np
+        from scipy.sparse import random as sparse_random
+
+        from recommendations.algorithms.scoring import score_users
+        from recommendations.algorithms.similarity import topk_cosine_similarity
+
+        user_item = sparse_random(30, 25, density=0.15, format="csr", random_state=3, dtype=np.float32)
+        similarity = topk_cosine_similarity(user_item.T.tocsr(), 5)
+
+        for block_users, top_indices, top_scores in score_users(user_item, similarity, 4, block_size=8):
+            for user_idx, indices, scores in zip(block_users, top_indices, top_scores):
+                expected = (user_item[user_idx] @ similarity).toarray().ravel()
+                expected[user_item[user_idx].indices] = -np.inf
+                np.testing.assert_allclose(scores, np.sort(expected)[::-1][:4], rtol=1e-5)
+                self.assertFalse(set(indices[np.isfinite(scores)]) & set(user_item[user_idx].indices))
+
+    def test_ivf_index_search(self):
+        """ANN 索引扫描全部簇时应与暴力 top-k 一致，追加的向量也能被查询到"""
+        import numpy as np
+
+        from recommendations.algorithms.ann import IVFIndex, exact_search
+
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((200, 16)).astype(np.float32)
+        ids = [f"n{i}" for i in range(200)]
+        index = IVFIndex.build(ids, vectors, n_lists=8)
+
+        results = index.search(vectors[3], k=5, nprobe=8)
+        self.assertEqual([nid for nid, _ in results], [ids[i] for i in exact_search(vectors, vectors[3], 5)])
+        self.assertNotIn("n3", [nid for nid, _ in index.search_id("n3", k=5)])
+
+        index.add(["new"], vectors[3] * 2)
+        self.assertIn("new", [nid for nid, _ in index.search_id("n3", k=3, nprobe=1)])
+
+    def test_ivf_index_concurrent_add(self):
+        """并发追加与查询：每个返回的 ID 都与其向量对应，不会越界"""
+        import threading
+
+        import numpy as np
+
+        from recommendations.algorithms.ann import IVFIndex
+
+        rng = np.random.default_rng(1)
+        vectors = rng.standard_normal((64, 8)).astype(np.float32)
+        index = IVFIndex.build([f"n{i}" for i in range(64)], vectors, n_lists=4)
+        extra = rng.standard_normal((200, 8)).astype(np.float32)
+        errors = []
+
+        def writer(offset):
+            for i in range(offset, 200, 4):
+                index.add([f"x{i}"], extra[i])
+
+        def reader():
+            try:
+                for i in range(200):
+                    for nid, score in index.search(extra[i], k=3, nprobe=4):
+                        vector = index.vector(nid)
+                        query = extra[i] / np.linalg.norm(extra[i])
+                        self.assertAlmostEqual(float(vector @ query), score, places=4)
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=writer, args=(k,)) for k in range(4)]
+        threads += [threading.Thread(target=reader) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(index), 264)
+        self.assertEqual([nid for nid, _ in index.search(extra[7], k=1)], ["x7"])
 
 
 class ContentBasedTests(TestCase):
@@ -188,6 +594,91 @@ class ContentBasedTests(TestCase):
         
         self.assertEqual(len(texts), 3)
 
+    def test_token_cache_skips_unchanged_novels(self):
+        """分词缓存命中时不再分词，只有文本变化的小说重新分词"""
+        import tempfile
+        from pathlib import Path
+        from unittest import mock
+
+        from recommendations.algorithms import tokenization
+        from recommendations.algorithms.content_based import ContentBasedRecommender
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = tokenization.TokenCache(Path(tmp) / tokenization.TOKEN_CACHE_FILE)
+            recommender = ContentBasedRecommender()
+            first = recommender.load_novels(cache)
+
+            Novel.objects.filter(title="都市神医").update(intro="神医归来")
+            with mock.patch.object(tokenization, '_tokenize_chunk', wraps=tokenization._tokenize_chunk) as tokenize:
+                second = recommender.load_novels(cache)
+            cache.close()
+
+        tokenized = [text for call in tokenize.call_args_list for text in call.args[0]]
+        self.assertEqual(len(tokenized), 1)
+        self.assertIn("神医归来", tokenized[0])
+        changed = recommender.novel_id_to_idx[str(Novel.objects.get(title="都市神医").id)]
+        self.assertEqual(
+            [text for i, text in enumerate(second) if i != changed],
+            [text for i, text in enumerate(first) if i != changed],
+        )
+
+    def test_jieba_dictionary_cache_is_shared(self):
+        """第一个进程构建并写入指定位置的词典缓存，之后的进程直接加载它，分词结果一致"""
+        import subprocess
+        import sys
+        import tempfile
+        from pathlib import Path
+
+        from recommendations.algorithms.tokenization import jieba_cache_file
+
+        script = (
+            "import sys; from pathlib import Path\n"
+            "from recommendations.algorithms import tokenization\n"
+            "tokenization.load_jieba(Path(sys.argv[1]))\n"
+            "print(tokenization.tokenize('主角踏上修仙之路'))\n"
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_file = jieba_cache_file(Path(tmp))
+            self.assertTrue(cache_file.name.startswith('jieba-'))
+
+            outputs = []
+            for _ in range(2):
+                result = subprocess.run(
+                    [sys.executable, '-c', script, str(cache_file)],
+                    capture_output=True, text=True, check=True,
+                )
+                self.assertTrue(cache_file.exists())
+                outputs.append(result.stdout)
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertIn('修仙', outputs[0])
+
+    def test_build_jieba_cache_after_preload(self):
+        """词典已经加载（例如 JIEBA_PRELOAD）时 build_jieba_cache 仍写出缓存文件"""
+        import marshal
+        import tempfile
+        from io import StringIO
+        from pathlib import Path
+
+        import jieba
+        from django.core.management import call_command
+
+        from recommendations.algorithms.tokenization import jieba_cache_file, load_jieba, tokenize
+
+        with tempfile.TemporaryDirectory() as tmp:
+            load_jieba(Path(tmp) / 'preload.cache')
+            self.assertTrue(jieba.dt.initialized)
+            tokenize('主角踏上修仙之路')
+
+            cache_dir = Path(tmp) / 'built'
+            out = StringIO()
+            call_command('build_jieba_cache', cache_dir=str(cache_dir), force=True, stdout=out)
+
+            cache_file = jieba_cache_file(cache_dir)
+            self.assertIn('Built', out.getvalue())
+            freq, total = marshal.loads(cache_file.read_bytes())
+            self.assertEqual(total, jieba.dt.total)
+            self.assertEqual(list(cache_dir.iterdir()), [cache_file])
+
     def test_tfidf_vectorization(self):
         """测试TF-IDF向量化"""
         from recommendations.algorithms.content_based import ContentBasedRecommender
@@ -212,7 +703,260 @@ class ContentBasedTests(TestCase):
         # 两部玄幻修仙小说应该比都市小说更相似
         # (具体相似度值取决于文本内容)
 
+    def test_incremental_content_update(self):
+        """增量计算只重写变化小说的特征向量，文档频率与全量重新统计一致"""
+        import tempfile
+        from pathlib import Path
+
+        import numpy as np
+
+        from recommendations.algorithms.content_based import ContentBasedRecommender
+        from recommendations.models import NovelFeatureVector, NovelSimilarity
+
+        Novel.objects.create(
+            title="都市兵王",
+            author="都市作者",
+            category="都市",
+            tags=["都市", "爽文"],
+            intro="兵王回归都市，守护家人",
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            state_dir = Path(tmp)
+            ContentBasedRecommender(max_features=100).run(state_dir=state_dir)
+            unchanged = Novel.objects.get(title="修仙大道")
+            unchanged_vector = NovelFeatureVector.objects.get(novel=unchanged)
+
+            Novel.objects.filter(title="都市兵王").update(status="shelved")
+            new_novel = Novel.objects.create(
+                title="修仙归来",
+                author="新作者",
+                category="玄幻",
+                tags=["修仙", "升级"],
+                intro="修仙之路重新开始，修炼升级",
+            )
+
+            recommender = ContentBasedRecommender(max_features=100)
+            recommender.run_incremental(state_dir)
+
+        self.assertEqual(NovelFeatureVector.objects.get(novel=unchanged).id, unchanged_vector.id)
+        self.assertTrue(NovelFeatureVector.objects.filter(novel=new_novel).exists())
+        self.assertFalse(NovelFeatureVector.objects.filter(novel__title="都市兵王").exists())
+        self.assertTrue(NovelSimilarity.objects.filter(algorithm='content', novel_a=new_novel).exists())
+
+        full = ContentBasedRecommender(max_features=100)
+        full.fit_transform(full.load_novels())
+        np.testing.assert_array_equal(recommender.feature_space.df, full.feature_space.df)
+        self.assertEqual(recommender.feature_space.n_docs, full.feature_space.n_docs)
+
+    def test_incremental_skips_views_and_rescores_affected_users(self):
+        """只更新了 updated_at（浏览）的小说不重新处理，只重写交互过变化小说的用户的推荐"""
+        import tempfile
+        from pathlib import Path
+
+        from django.utils import timezone
+
+        from recommendations.algorithms.content_based import ContentBasedRecommender
+        from recommendations.models import NovelFeatureVector, RecommendationCache
+
+        reader = User.objects.create_user(email="reader1@test.com", password="testpass123", username="reader1")
+        other = User.objects.create_user(email="reader2@test.com", password="testpass123", username="reader2")
+        viewed = Novel.objects.get(title="修仙大道")
+        edited = Novel.objects.get(title="仙路漫漫")
+        Favorite.objects.create(user=reader, novel=edited)
+        Favorite.objects.create(user=other, novel=viewed)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            state_dir = Path(tmp)
+            ContentBasedRecommender(max_features=100).run(state_dir=state_dir)
+            viewed_vector = NovelFeatureVector.objects.get(novel=viewed).id
+            other_rows = set(RecommendationCache.objects.filter(user=other, algorithm='content').values_list('id', flat=True))
+
+            Novel.objects.filter(pk=viewed.pk).update(updated_at=timezone.now())
+            Novel.objects.filter(pk=edited.pk).update(intro="修仙世界的全新冒险", updated_at=timezone.now())
+            refreshed = ContentBasedRecommender(max_features=100).run_incremental(state_dir)
+
+        self.assertEqual(refreshed, [str(reader.id)])
+        self.assertEqual(NovelFeatureVector.objects.get(novel=viewed).id, viewed_vector)
+        self.assertEqual(
+            set(RecommendationCache.objects.filter(user=other, algorithm='content').values_list('id', flat=True)),
+            other_rows,
+        )
+
+    def test_incremental_restores_republished_novel(self):
+        """下架后重新上架（只改 status，不更新 updated_at）的小说在下一次增量计算中恢复"""
+        import tempfile
+        from pathlib import Path
+
+        from recommendations.algorithms.content_based import ContentBasedRecommender
+        from recommendations.models import NovelFeatureVector, NovelSimilarity
+
+        novel = Novel.objects.get(title="修仙大道")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            state_dir = Path(tmp)
+            ContentBasedRecommender(max_features=100).run(state_dir=state_dir)
+
+            novel.status = "shelved"
+            novel.save(update_fields=["status"])
+            ContentBasedRecommender(max_features=100).run_incremental(state_dir)
+            self.assertFalse(NovelFeatureVector.objects.filter(novel=novel).exists())
+            self.assertFalse(NovelSimilarity.objects.filter(novel_a=novel, algorithm='content').exists())
+
+            novel.status = "published"
+            novel.save(update_fields=["status"])
+            recommender = ContentBasedRecommender(max_features=100)
+            recommender.run_incremental(state_dir)
+
+        self.assertTrue(recommender.live[recommender.novel_id_to_idx[str(novel.id)]])
+        self.assertTrue(NovelFeatureVector.objects.filter(novel=novel).exists())
+        self.assertTrue(NovelSimilarity.objects.filter(novel_a=novel, algorithm='content').exists())
+
+    def test_feature_vectors_binary_round_trip(self):
+        """特征向量以二进制保存，一次读取即可还原为 CSR 矩阵"""
+        import numpy as np
+
+        from recommendations.algorithms.content_based import ContentBasedRecommender
+        from recommendations.algorithms.storage import load_feature_vectors
+
+        recommender = ContentBasedRecommender(max_features=100)
+        recommender.fit_transform(recommender.load_novels())
+        recommender.save_feature_vectors_to_db()
+
+        with self.assertNumQueries(1):
+            novel_ids, matrix = load_feature_vectors(n_features=recommender.n_features)
+
+        self.assertEqual(sorted(novel_ids), sorted(recommender.novel_ids))
+        self.assertEqual(matrix.dtype, np.float32)
+        for row, novel_id in enumerate(novel_ids):
+            expected = recommender.novel_vectors[recommender.novel_id_to_idx[novel_id]]
+            np.testing.assert_array_equal(matrix[row].toarray(), expected.toarray())
+
+    def test_sparse_user_profile_recommendations(self):
+        """稀疏用户画像的推荐分数应与稠密余弦相似度一致，且不包含已交互小说"""
+        import numpy as np
+        from sklearn.metrics.pairwise import cosine_similarity
+
+        from recommendations.algorithms.content_based import ContentBasedRecommender
+
+        user = User.objects.create_user(
+            email="reader@test.com", password="testpass123", username="reader", display_name="Reader"
+        )
+        favorite = Novel.objects.get(title="修仙大道")
+        Favorite.objects.create(user=user, novel=favorite)
+
+        recommender = ContentBasedRecommender(max_features=100)
+        recommender.fit_transform(recommender.load_novels())
+        self.assertEqual(recommender.novel_vectors.format, 'csr')
 
+        results = recommender.recommend_for_user(str(user.id), n=5)
+        self.assertNotIn(str(favorite.id), [nid for nid, _ in results])
+        self.assertEqual(results[0][0], str(Novel.objects.get(title="仙路漫漫").id))
+
+        dense = recommender.novel_vectors.toarray()
+        expected = cosine_similarity(dense[[recommender.novel_id_to_idx[str(favorite.id)]]], dense)[0]
+        for novel_id, score in results:
+            self.assertAlmostEqual(score, expected[recommender.novel_id_to_idx[novel_id]], places=5)
+
+    def test_bulk_content_recommendations_match_per_user(self):
+        """批量写入的内容推荐应与逐用户计算的结果一致"""
+        from recommendations.algorithms.content_based import ContentBasedRecommender
+        from recommendations.models import RecommendationCache
+
+        readers = []
+        for i, title in enumerate(["修仙大道", "都市神医"]):
+            reader = User.objects.create_user(
+                email=f"bulk{i}@test.com", password="testpass123", username=f"bulk{i}", display_name=f"Bulk {i}"
+            )
+            Favorite.objects.create(user=reader, novel=Novel.objects.get(title=title))
+            readers.append(reader)
+
+        recommender = ContentBasedRecommender(max_features=100)
+        recommender.fit_transform(recommender.load_novels())
+        recommender.save_recommendations_to_db(n_recommendations=5)
+        self.assertTrue(RecommendationCache.objects.filter(user=readers[0], algorithm='content').exists())
+
+        for reader in readers:
+            cached = list(
+                RecommendationCache.objects.filter(user=reader, algorithm='content')
+                .order_by('-score')
+                .values_list('novel_id', 'score')
+            )
+            expected = recommender.recommend_for_user(str(reader.id), n=5)
+            self.assertEqual([str(nid) for nid, _ in cached], [nid for nid, _ in expected])
+            for (_, score), (_, expected_score) in zip(cached, expected):
+                self.assertAlmostEqual(score, expected_score, places=5)
+
+    def test_latent_content_recommendations(self):
+        """潜在空间：向量已归一化，推荐与逐用户计算一致，状态可恢复，参数不同时忽略状态"""
+        import tempfile
+
+        import numpy as np
+
+        from recommendations.algorithms.content_based import ContentBasedRecommender
+        from recommendations.models import RecommendationCache
+
+        reader = User.objects.create_user(
+            email="latent@test.com", password="testpass123", username="latent", display_name="Latent"
+        )
+        Favorite.objects.create(user=reader, novel=Novel.objects.get(title="修仙大道"))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            recommender = ContentBasedRecommender(max_features=100, latent_dim=2)
+            recommender.run(state_dir=tmp, n_recommendations=5)
+
+            self.assertEqual(recommender.latent_vectors.shape, (3, 2))
+            self.assertEqual(recommender.latent_vectors.dtype, np.float32)
+            # 没有保留特征（全部词项被文档频率过滤）的小说投影后为零行
+            has_terms = np.diff(recommender.novel_vectors.indptr) > 0
+            norms = np.linalg.norm(recommender.latent_vectors, axis=1)
+            np.testing.assert_allclose(norms[has_terms], 1, rtol=1e-5)
+
+            cached = list(
+                RecommendationCache.objects.filter(user=reader, algorithm='content')
+                .order_by('-score')
+                .values_list('novel_id', 'score')
+            )
+            expected = recommender.recommend_for_user(str(reader.id), n=5)
+            self.assertEqual([str(nid) for nid, _ in cached], [nid for nid, _ in expected])
+            for (_, score), (_, expected_score) in zip(cached, expected):
+                self.assertAlmostEqual(score, expected_score, places=5)
+
+            restored = ContentBasedRecommender(max_features=100, latent_dim=2)
+            self.assertIsNotNone(restored.load_state(tmp))
+            np.testing.assert_allclose(restored.latent_vectors, recommender.latent_vectors)
+            self.assertIsNone(ContentBasedRecommender(max_features=100).load_state(tmp))
+
+    def test_ann_index_covers_new_novels(self):
+        """ANN 索引保存后可加载，离线之后新增的小说也能查询到相似小说"""
+        import tempfile
+        from pathlib import Path
+
+        from recommendations.algorithms.content_based import ContentBasedRecommender
+        from recommendations.online import OnlineRecommender
+
+        recommender = ContentBasedRecommender(max_features=100)
+        recommender.fit_transform(recommender.load_novels())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            state_dir = Path(tmp)
+            recommender.save_ann_index(state_dir)
+
+            new_novel = Novel.objects.create(
+                title="修仙归来",
+                author="新作者",
+                category="玄幻",
+                tags=["修仙", "升级"],
+                intro="修仙之路重新开始，修炼升级",
+            )
+            similar = OnlineRecommender(state_dir).similar_novels(new_novel, n=2)
+
+        titles = list(Novel.objects.filter(id__in=[nid for nid, _ in similar]).values_list("title", flat=True))
+        self.assertTrue(similar)
+        self.assertNotIn("都市神医", titles)
+
+
+@override_settings(CACHES=TEST_CACHES)
 class RecommendationCacheTests(TestCase):
     """推荐缓存API测试"""
     
@@ -251,7 +995,8 @@ class RecommendationCacheTests(TestCase):
         self.assertGreater(len(items), 0)
 
     def test_personalized_with_cache(self):
-        """测试有缓存时的个性化推荐"""
+        """测试有缓存时的个性化推荐（读取离线混合好的 hybrid 推荐）"""
+        from recommendations.algorithms.hybrid import save_hybrid_recommendations
         from recommendations.models import RecommendationCache
         
         # 添加缓存数据
@@ -267,6 +1012,15 @@ class RecommendationCacheTests(TestCase):
             score=1.0,
             algorithm='content'
         )
+        save_hybrid_recommendations()
+        self.assertEqual(
+            list(
+                RecommendationCache.objects.filter(user=self.user, algorithm='hybrid')
+                .order_by('-score')
+                .values_list('novel_id', 'score')
+            ),
+            [(self.novels[2].id, 0.6), (self.novels[3].id, 0.4)],
+        )
         
         self.client.force_authenticate(user=self.user)
         resp = self.client.get("/api/recommendations/personalized", {"limit": 5})
@@ -276,3 +1030,82 @@ class RecommendationCacheTests(TestCase):
         self.assertGreater(len(items), 0)
         # 混合推荐按加权分数排序
         self.assertEqual(items[0]["title"], "缓存测试小说2")
+
+    def test_generation_swap(self):
+        """全量写入新版本后切换：读取方只看到当前版本，旧版本被回收，增量更新写入当前版本"""
+        from recommendations.algorithms.hybrid import save_hybrid_recommendations
+        from recommendations.algorithms.storage import active_generation, replace_recommendations
+        from recommendations.models import RecommendationCache
+
+        uid = str(self.user.id)
+        replace_recommendations('cf', [(uid, str(self.novels[1].id), 1.0)])
+        replace_recommendations('cf', [(uid, str(self.novels[4].id), 1.0)])
+        save_hybrid_recommendations()
+
+        self.assertEqual(active_generation(RecommendationCache, 'cf'), 2)
+        self.assertEqual(
+            list(RecommendationCache.objects.filter(algorithm='cf').values_list('novel_id', 'generation')),
+            [(self.novels[4].id, 2)],
+        )
+
+        # 未切换的残留版本对读取方不可见
+        RecommendationCache.objects.create(
+            user=self.user, novel=self.novels[0], score=9.0, algorithm='hybrid', generation=3
+        )
+        self.client.force_authenticate(user=self.user)
+        items = self.client.get("/api/recommendations/personalized", {"limit": 5}).json()["data"]
+        self.assertEqual([item["title"] for item in items], ["缓存测试小说4"])
+
+        replace_recommendations('cf', [(uid, str(self.novels[3].id), 1.0)], user_ids=[uid])
+        self.assertEqual(
+            set(RecommendationCache.objects.filter(algorithm='cf', generation=2).values_list('novel_id', flat=True)),
+            {self.novels[3].id},
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SimilarNovelsTests(TestCase):
+    """相似小说接口：合并各算法的相似度、在截取前过滤未发布的小说、缓存ID列表与卡片"""
+
+    def setUp(self):
+        from core.response_cache import invalidate_catalog
+        from recommendations.models import NovelSimilarity
+
+        invalidate_catalog()
+        self.client = APIClient()
+        self.novels = [
+            Novel.objects.create(title=f"相似测试小说{i}", author="作者", category="玄幻") for i in range(5)
+        ]
+        Novel.objects.filter(pk=self.novels[1].pk).update(status="shelved")
+        source = self.novels[0]
+        for target, similarity, algorithm in [
+            (self.novels[1], 0.99, 'item_cf'),
+            (self.novels[2], 0.5, 'item_cf'),
+            (self.novels[3], 0.7, 'item_cf'),
+            (self.novels[2], 0.9, 'content'),
+            (self.novels[4], 0.3, 'content'),
+            (self.novels[4], 0.99, 'als'),
+        ]:
+            NovelSimilarity.objects.create(novel_a=source, novel_b=target, similarity=similarity, algorithm=algorithm)
+
+    def test_merged_and_filtered(self):
+        """按 hybrid 权重合并 item_cf / content，忽略其他算法，截取前过滤下架小说，再次请求不执行 SQL"""
+        url = f"/api/recommendations/similar/{self.novels[0].id}"
+        items = self.client.get(url, {"limit": 2}).json()["data"]
+        # 0.6 * 0.5 + 0.4 * 0.9 = 0.66 > 0.6 * 0.7 = 0.42；下架的小说不占名额
+        self.assertEqual([item["title"] for item in items], ["相似测试小说2", "相似测试小说3"])
+
+        # 相似列表与卡片都来自缓存
+        with self.assertNumQueries(0):
+            self.client.get(url, {"limit": 2})
+        # 不同的 limit 共用同一条相似列表，只读取未缓存的卡片
+        with self.assertNumQueries(1):
+            items = self.client.get(url, {"limit": 3}).json()["data"]
+        self.assertEqual(
+            [item["title"] for item in items], ["相似测试小说2", "相似测试小说3", "相似测试小说4"]
+        )
+
+    def test_unpublished_source(self):
+        """源小说未发布时返回 404"""
+        resp = self.client.get(f"/api/recommendations/similar/{self.novels[1].id}")
+        self.assertEqual(resp.status_code, 404)
@@ -181,6 +181,30 @@ SIMPLE_JWT = {
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Recommendation pipeline: on-disk state for incremental runs
+RECOMMENDATION_STATE_DIR = Path(os.getenv('RECOMMENDATION_STATE_DIR', BASE_DIR / 'var' / 'recommendations'))
+# Refresh a user's cached recommendations on a background thread after each interaction
+RECOMMENDATION_REFRESH_ASYNC = os.getenv('RECOMMENDATION_REFRESH_ASYNC', 'true').lower() in {'1', 'true', 'yes'}
+# Shared location of jieba's serialized prefix dictionary (build it with `manage.py build_jieba_cache`)
+JIEBA_CACHE_DIR = Path(os.getenv('JIEBA_CACHE_DIR', RECOMMENDATION_STATE_DIR / 'jieba'))
+# Load the jieba dictionary on a background thread when the app starts instead of on the first request
+JIEBA_PRELOAD = os.getenv('JIEBA_PRELOAD', 'false').lower() in {'1', 'true', 'yes'}
+
+# Caches: 'responses' holds rendered JSON of the anonymous catalog endpoints (hot/latest/similar/search)
+# and must be shared by all workers; the default file backend works for a single host, point it at
+# memcached/redis (RESPONSE_CACHE_BACKEND/RESPONSE_CACHE_LOCATION) when running on several hosts
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': os.getenv('RESPONSE_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', str(BASE_DIR / 'var' / 'cache' / 'responses')),
+    },
+}
+# Seconds a cached catalog response is served; 0 disables the response cache
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '30'))
+
 # Email Configuration
 EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.qq.com')
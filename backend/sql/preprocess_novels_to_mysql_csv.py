@@ -381,14 +381,14 @@ def read_xls(path: Path) -> Tuple[Dict[int, BookAgg], Dict[Tuple[str, str], int]
                 name_author_count[k] = name_author_count.get(k, 0) + 1
                 # only assign later if unique
 
+    # index by_id once by normalized (title, author); keep the first id, as the old scan did
+    first_id_by_key: Dict[Tuple[str, str], int] = {}
+    for book_id, agg in by_id.items():
+        first_id_by_key.setdefault((_norm_key(agg.title), _norm_key(agg.author)), book_id)
+
     for (t, a), cnt in name_author_count.items():
-        if cnt == 1:
-            # find the id by scanning by_id
-            # (O(n)) but dataset is small enough (~6k)
-            for book_id, agg in by_id.items():
-                if _norm_key(agg.title) == t and _norm_key(agg.author) == a:
-                    name_author_to_id[(t, a)] = book_id
-                    break
+        if cnt == 1 and (t, a) in first_id_by_key:
+            name_author_to_id[(t, a)] = first_id_by_key[(t, a)]
 
     for (t, a), link in name_author_to_link.items():
         book_id = name_author_to_id.get((t, a))